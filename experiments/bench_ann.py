@@ -0,0 +1,39 @@
+"""Recall/latency of the IVF index against exact search.
+
+The three embeddings in mdb.json are scaled up synthetically with
+`common.synthetic_embeddings`: clustered noisy mixtures of the real vectors,
+queried with noisy copies of random nodes.
+
+python experiments/bench_ann.py [n_nodes]
+"""
+import sys
+import time
+
+from common import synthetic_embeddings
+from ann_index import IVFIndex, recall_at_k
+from vector_search import VectorSearchEngine
+
+N_NODES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+N_QUERIES = 200
+TOP_K = 4
+
+nodes, queries, ids = synthetic_embeddings(N_NODES, N_QUERIES)
+dim = nodes.shape[1]
+
+exact = VectorSearchEngine(nodes, ids)
+start = time.perf_counter()
+truth = [exact.search(q, TOP_K)[1] for q in queries]
+exact_ms = (time.perf_counter() - start) / N_QUERIES * 1000
+print(f"{N_NODES} nodes x {dim} dims, top {TOP_K}")
+print(f"exact       {exact_ms:8.3f} ms/query  recall 1.000")
+
+start = time.perf_counter()
+ivf = IVFIndex.build(exact.matrix, ids)
+print(f"IVF build   {time.perf_counter() - start:8.2f} s ({ivf.n_lists} lists)")
+
+for nprobe in (1, 2, 4, 8, 16, 32, 64):
+    engine = VectorSearchEngine(exact.matrix, ids, ann=ivf, nprobe=nprobe)
+    start = time.perf_counter()
+    found = [engine.search(q, TOP_K)[1] for q in queries]
+    ms = (time.perf_counter() - start) / N_QUERIES * 1000
+    print(f"nprobe={nprobe:<4} {ms:8.3f} ms/query  recall {recall_at_k(truth, found):.3f}")
@@ -0,0 +1,99 @@
+"""Sequential ReadMe crawl against the concurrent aiohttp crawl.
+
+Serves a synthetic ReadMe site from a local aiohttp server: a root page
+linking to N doc pages, each answered after a fixed latency. Every 10th page
+fails with a 503 on its first request to exercise the retries. Pages carry
+an ETag and answer a matching If-None-Match with a 304. Checks that the
+crawls extract the same text and prints their wall time, including a second
+crawl revalidated against a warm `HttpCache`.
+
+python experiments/bench_crawler.py [n_pages] [latency_ms] [concurrency]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiohttp import web
+
+import common  # noqa: F401
+from custom_reader import BeautifulSoupWebReader
+from http_cache import HttpCache
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+requests_seen: Counter = Counter()
+not_modified: Counter = Counter()
+
+
+async def root(request):
+    links = "".join(f'<a href="/docs/page-{i}">Page {i}</a>' for i in range(N_PAGES))
+    return web.Response(text=f"<html><body>{links}</body></html>", content_type="text/html")
+
+
+async def page(request):
+    name = request.match_info["name"]
+    requests_seen[name] += 1
+    await asyncio.sleep(LATENCY)
+    if int(name.split("-")[1]) % 10 == 0 and requests_seen[name] == 1:
+        return web.Response(status=503)
+    etag = f'"{name}-v1"'
+    if request.headers.get("If-None-Match") == etag:
+        not_modified[name] += 1
+        return web.Response(status=304, headers={"ETag": etag})
+    body = " ".join(f"<p>Paragraph {j} of {name}.</p>" for j in range(20))
+    return web.Response(
+        text=(
+            f"<html><head><title>{name}</title></head><body>"
+            f'<main class="layout__main"><h1>{name}</h1>{body}'
+            f'<a href="https://example.com/edit/{name}">Edit</a></main></body></html>'
+        ),
+        content_type="text/html",
+        headers={"ETag": etag},
+    )
+
+
+base = serve_in_thread([web.get("/", root), web.get("/docs/{name}", page)])
+url = f"{base}/"
+reader = BeautifulSoupWebReader()
+
+requests_seen.clear()
+start = time.perf_counter()
+concurrent_text = reader.load_data(
+    [url],
+    custom_hostname="readme.com",
+    concurrency=CONCURRENCY,
+    per_host=CONCURRENCY,
+    backoff=0.05,
+)[0].text
+concurrent_s = time.perf_counter() - start
+
+# the sequential crawl has no retries, let the flaky pages succeed first time
+start = time.perf_counter()
+sequential_text = reader.load_data([url], custom_hostname="readme.com")[0].text
+sequential_s = time.perf_counter() - start
+
+cache = HttpCache(tempfile.mkdtemp(prefix="bench_crawler_"))
+cached_reader = BeautifulSoupWebReader(http_cache=cache)
+crawl_kwargs = dict(concurrency=CONCURRENCY, per_host=CONCURRENCY, backoff=0.05)
+cached_reader.load_data([url], custom_hostname="readme.com", **crawl_kwargs)
+changed_first = len(cache.changed)
+not_modified.clear()
+start = time.perf_counter()
+cached_text = cached_reader.load_data([url], custom_hostname="readme.com", **crawl_kwargs)[0].text
+cached_s = time.perf_counter() - start
+
+assert concurrent_text == sequential_text, "the crawls extracted different text"
+assert cached_text == sequential_text, "the cached crawl extracted different text"
+assert sum(not_modified.values()) == N_PAGES and not cache.changed
+print(f"{N_PAGES} pages, {LATENCY * 1000:.0f} ms latency")
+print(f"sequential          {sequential_s:7.2f} s")
+print(f"concurrent ({CONCURRENCY:>3})   {concurrent_s:7.2f} s")
+print(
+    f"revalidated ({CONCURRENCY:>3})  {cached_s:7.2f} s  "
+    f"({changed_first} changed on the cold crawl, {len(cache.unchanged)} unchanged on the warm one)"
+)
@@ -0,0 +1,62 @@
+"""DatabaseReader row loop against the pandas columnar path.
+
+Builds a synthetic SQLite table shaped like files.mdb (id, title, page_link,
+text) and times load_data and load_data_columnar in both the joined-row and
+the row-per-document mode.
+
+python experiments/bench_dbreader.py [n_rows]
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401
+from dbreader import DatabaseReader
+
+N_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+QUERY = "SELECT id, title, page_link, text FROM mdb"
+STRUCTURED = dict(
+    text_column="text",
+    extra_info_columns=["id", "title", "page_link"],
+    doc_id_column="id",
+)
+
+path = os.path.join(tempfile.gettempdir(), f"bench_dbreader_{N_ROWS}.db")
+if not os.path.exists(path):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE mdb (id INTEGER PRIMARY KEY, title TEXT, page_link TEXT, text TEXT)"
+    )
+    connection.executemany(
+        "INSERT INTO mdb VALUES (?, ?, ?, ?)",
+        (
+            (
+                i,
+                f"Page {i}",
+                f"https://docs.mindsdb.com/page/{i}",
+                f"Paragraph {i} of the documentation. " * 8,
+            )
+            for i in range(1, N_ROWS + 1)
+        ),
+    )
+    connection.commit()
+    connection.close()
+
+reader = DatabaseReader(uri=f"sqlite:///{path}")
+print(f"{N_ROWS} rows")
+for name, load, kwargs in (
+    ("load_data (joined)", reader.load_data, {}),
+    ("load_data_columnar (joined)", reader.load_data_columnar, {}),
+    ("load_data (row per doc)", reader.load_data, STRUCTURED),
+    ("load_data_columnar (row per doc)", reader.load_data_columnar, STRUCTURED),
+):
+    start = time.perf_counter()
+    documents = load(QUERY, **kwargs)
+    seconds = time.perf_counter() - start
+    print(f"{name:<34} {seconds:7.2f} s  {N_ROWS / seconds:10.0f} rows/s")
+    # extra_info must stay JSON serializable for save_to_disk
+    json.dumps(documents[-1].extra_info)
+    del documents
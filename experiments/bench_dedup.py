@@ -0,0 +1,73 @@
+"""Tokens saved and run time of dedup.dedup_documents.
+
+Runs the dedup stage on the documents stored in mdb.json, then on synthetic
+doc sites of growing size: every page repeats its navigation entries, has
+its paragraphs extracted twice and ends with the site footer, with one word
+changed per page. The time per page should stay flat as the corpus grows.
+
+python experiments/bench_dedup.py [max_pages]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+from common import HERE, ROOT
+from dedup import dedup_documents
+from llama_index import Document
+
+MAX_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+WORDS = (
+    "index query table model predict database column row train deploy embedding "
+    "vector chunk document node token prompt answer agent integration handler "
+    "engine connection schema select insert update forecast feature"
+).split()
+FOOTER = (
+    "MindsDB enables you to use your data and make forecasts. It speeds up the "
+    "ML development process by bringing machine learning into the database. "
+    "Join our community on Slack and star us on GitHub to stay up to date with "
+    "the latest releases, tutorials and integrations."
+)
+
+try:
+    from llama_index.utils import globals_helper
+
+    globals_helper.tokenizer("warm up")
+    tokenizer, tokenizer_name = None, "the index tokenizer"
+except Exception:
+    # tiktoken needs to download its encoding the first time
+    tokenizer, tokenizer_name = str.split, "whitespace words"
+
+
+def sentence(generator, n=16):
+    return " ".join(generator.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def page(generator, i):
+    nav = " ".join(" ".join([word.title()] * 3) for word in WORDS[:12])
+    paragraphs = [" ".join(sentence(generator) for _ in range(4)) for _ in range(6)]
+    footer = FOOTER.split()
+    footer[generator.randrange(len(footer))] = generator.choice(WORDS)
+    return "\n\n".join([nav] + paragraphs + paragraphs[:3] + [" ".join(footer)])
+
+
+with open(os.path.join(ROOT, "mdb.json"), "r") as f:
+    docs = json.load(f)["docstore"]["docs"]
+documents = [Document(doc["text"], doc_id=doc_id) for doc_id, doc in docs.items()]
+_, report = dedup_documents(documents, tokenizer=tokenizer)
+print(f"tokens counted as {tokenizer_name}")
+print(f"mdb.json: {report}")
+
+n_pages = 250
+while n_pages <= MAX_PAGES:
+    generator = random.Random(21)
+    documents = [Document(page(generator, i), doc_id=str(i)) for i in range(n_pages)]
+    start = time.perf_counter()
+    _, report = dedup_documents(documents, tokenizer=tokenizer)
+    seconds = time.perf_counter() - start
+    print(
+        f"{n_pages:>5} pages {seconds:7.2f} s  {seconds / n_pages * 1000:6.2f} ms/page  "
+        f"{report.tokens_saved / report.tokens_before:5.1%} of {report.tokens_before} tokens saved"
+    )
+    n_pages *= 2
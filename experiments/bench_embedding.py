@@ -0,0 +1,205 @@
+"""Embedding round trips: llama_index's batches vs batch_embedding.embed_texts.
+
+Serves an OpenAI compatible embeddings endpoint from a local aiohttp server:
+deterministic vectors, a latency growing with the tokens of the request, and
+per-minute request and token limits enforced over one second windows, with
+429 and Retry-After: 1 above them. Inputs containing POISON are rejected
+with a 400, like texts over the model's context length. Tokens are counted
+as whitespace separated words on both sides, so this runs offline.
+
+Embeds N chunks:
+
+- ten at a time, one request after the other, as OpenAIEmbedding does
+- with embed_texts and no rate budget
+- with embed_texts and a budget set to the server's limits
+- with two poisoned chunks, which fail alone while their batches succeed
+- through BatchedOpenAIEmbedding and GPTSimpleVectorIndex, if tiktoken has
+  its encodings
+
+python experiments/bench_embedding.py [n_chunks] [tokens_per_minute] [requests_per_minute]
+"""
+import asyncio
+import base64
+import random
+import sys
+import time
+import zlib
+
+import numpy as np
+from aiohttp import web
+
+import common  # noqa: F401
+from batch_embedding import RateBudget, embed_texts
+from testing import serve_in_thread
+
+N_CHUNKS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+TPM = int(sys.argv[2]) if len(sys.argv) > 2 else 1800000
+RPM = int(sys.argv[3]) if len(sys.argv) > 3 else 1200
+DIM = 64
+MODEL = "text-embedding-ada-002"
+WORDS = "index query table model predict database column row train deploy vector".split()
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def vector(text):
+    return np.random.default_rng(zlib.crc32(text.encode())).standard_normal(DIM, dtype=np.float32)
+
+
+class Stub:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tokens, self.requests = TPM / 60, RPM / 60
+        self.updated = time.monotonic()
+        self.served = self.throttled = self.rejected = 0
+
+    async def embeddings(self, request):
+        payload = await request.json()
+        texts = payload["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        tokens = sum(count_tokens(text) for text in texts)
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.tokens = min(TPM / 60, self.tokens + elapsed * TPM / 60)
+        self.requests = min(RPM / 60, self.requests + elapsed * RPM / 60)
+        if self.requests < 1 or self.tokens < min(tokens, TPM / 60):
+            self.throttled += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+        self.requests -= 1
+        self.tokens -= tokens
+        if len(texts) > 2048 or any("POISON" in text for text in texts):
+            self.rejected += 1
+            return web.json_response(
+                {"error": {"message": "Invalid input", "type": "invalid_request_error"}},
+                status=400,
+            )
+        await asyncio.sleep(0.1 + tokens / 50000)
+        self.served += len(texts)
+        data = []
+        for i, text in enumerate(texts):
+            embedding = vector(text)
+            if payload.get("encoding_format") == "base64":
+                embedding = base64.b64encode(embedding.tobytes()).decode()
+            else:
+                embedding = embedding.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return web.json_response(
+            {
+                "object": "list",
+                "data": data,
+                "model": MODEL,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+
+def run(name, stub, embed):
+    time.sleep(1.5)  # let the limits recover
+    stub.reset()
+    start = time.perf_counter()
+    embeddings = embed()
+    seconds = time.perf_counter() - start
+    print(
+        f"{name:<34} {seconds:6.2f} s  {stub.served:>5} embedded  "
+        f"{stub.throttled:>4} x 429  {stub.rejected:>3} x 400"
+    )
+    return embeddings
+
+
+def check(texts, embeddings):
+    for text, embedding in zip(texts, embeddings):
+        if "POISON" in text:
+            assert embedding is None
+        else:
+            assert np.allclose(embedding, vector(text)), text
+
+
+if __name__ == "__main__":
+    stub = Stub()
+    base = serve_in_thread(
+        [
+            web.post("/v1/embeddings", stub.embeddings),
+            web.post("/v1/engines/{engine}/embeddings", stub.embeddings),
+        ],
+        client_max_size=64 * 1024 * 1024,
+    )
+    api_base = f"{base}/v1"
+    generator = random.Random(25)
+    texts = [
+        " ".join(generator.choice(WORDS) for _ in range(generator.randint(100, 140)))
+        for _ in range(N_CHUNKS)
+    ]
+    kwargs = dict(model=MODEL, count_tokens=count_tokens, api_base=api_base, api_key="stub")
+    print(
+        f"{N_CHUNKS} chunks, {sum(map(count_tokens, texts))} tokens, "
+        f"server allows {TPM} tokens and {RPM} requests per minute"
+    )
+
+    import openai
+    from llama_index.embeddings.openai import get_embeddings
+
+    openai.api_base, openai.api_key = api_base, "stub"
+    embeddings = run(
+        "batches of 10, sequential",
+        stub,
+        lambda: [
+            embedding
+            for start in range(0, len(texts), 10)
+            for embedding in get_embeddings(texts[start : start + 10], engine=MODEL)
+        ],
+    )
+    check(texts, embeddings)
+
+    unlimited = RateBudget(tokens_per_minute=10**12, requests_per_minute=10**9)
+    embeddings, stats = run(
+        "embed_texts, no budget", stub, lambda: embed_texts(texts, budget=unlimited, **kwargs)
+    )
+    check(texts, embeddings)
+    print(f"  {stats}")
+
+    budget = RateBudget(tokens_per_minute=TPM, requests_per_minute=RPM)
+    embeddings, stats = run(
+        "embed_texts, server's budget", stub, lambda: embed_texts(texts, budget=budget, **kwargs)
+    )
+    check(texts, embeddings)
+    print(f"  {stats}")
+
+    poisoned = list(texts)
+    for i in (N_CHUNKS // 3, 2 * N_CHUNKS // 3):
+        poisoned[i] = "POISON " + poisoned[i]
+    embeddings, stats = run(
+        "embed_texts, 2 poisoned chunks",
+        stub,
+        lambda: embed_texts(poisoned, budget=budget, retries=1, backoff=0.1, **kwargs),
+    )
+    print(f"  {stats}")
+    check(poisoned, embeddings)
+    assert stats.failed == 2
+
+    try:
+        from llama_index.utils import globals_helper
+
+        globals_helper.tokenizer("warm up")
+        from batch_embedding import BatchedOpenAIEmbedding
+        from llama_index import Document, GPTSimpleVectorIndex, ServiceContext
+
+        embed_model = BatchedOpenAIEmbedding(api_base=api_base, api_key="stub", budget=budget)
+        service_context = ServiceContext.from_defaults(embed_model=embed_model)
+        documents = [Document(text) for text in texts]
+        run(
+            "GPTSimpleVectorIndex",
+            stub,
+            lambda: GPTSimpleVectorIndex.from_documents(documents, service_context=service_context),
+        )
+        print(f"  {embed_model.last_stats}")
+    except Exception as e:
+        # tiktoken needs to download its encodings the first time
+        print(f"GPTSimpleVectorIndex skipped: {e!r}"[:120])
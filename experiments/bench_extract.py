@@ -0,0 +1,95 @@
+"""Per-page parse time of the BeautifulSoup extractors against html_extract.
+
+Times the current page extractors (html.parser soup plus descendant walk),
+the same extractors on an lxml soup restricted to the content container with
+a SoupStrainer, and html_extract.HtmlExtractor on the saved pages in
+experiments/fixtures. Checks that the fast extractor keeps every word of the
+page the current one keeps.
+
+python experiments/bench_extract.py [repeat]
+"""
+import os
+import re
+import sys
+import timeit
+
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer
+
+from common import HERE
+from custom_reader import _readmedocs_page, _readthedocs_page
+from html_extract import DEFAULT_HTML_EXTRACTOR
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+MINDSDB_CLASS = "flex flex-row pt-9 gap-12 items-stretch"
+
+
+def mindsdb_page(soup, doc_link, url, include_url_in_text=True):
+    """The page loop of mdbup.scrape before the lxml extractor."""
+    text = ""
+    for element in soup.find("div", class_=MINDSDB_CLASS):
+        for child in element.descendants:
+            if child.name == "a" and child.has_attr("href"):
+                url = child.get("href")
+                if url is not None and "edit" in url:
+                    text += child.get_text()
+                else:
+                    if url.startswith("/") or "#" in url:
+                        if child.get_text() not in text:
+                            text += f"{child.get_text()} (Reference url: {doc_link}{url}) "
+                    else:
+                        if child.get_text() not in text:
+                            text += f"{child.get_text()} "
+            elif child.name == "div" and "gray-frame" in child.get("class", []):
+                codeblock = child.find("code")
+                text += f"```{codeblock['class'][0]}{os.linesep}{codeblock.text}{os.linesep}```"
+            elif child.string and child.string.strip():
+                text += child.string.strip() + " "
+    return text
+
+
+FIXTURES = (
+    ("readme.html", "readme.com", _readmedocs_page, SoupStrainer("main", class_="layout__main")),
+    ("readthedocs.html", "readthedocs.io", _readthedocs_page, SoupStrainer(attrs={"role": "main"})),
+    ("mindsdb.html", "docs.mindsdb.com", mindsdb_page, SoupStrainer("div", class_=MINDSDB_CLASS)),
+)
+DOC_LINK = "https://docs.example.com/docs/page"
+
+
+def text_of(page):
+    return page["text"] if isinstance(page, dict) else page
+
+
+def words(text):
+    return set(re.findall(r"\w+", text))
+
+
+for name, hostname, extract_page, strainer in FIXTURES:
+    with open(os.path.join(HERE, "fixtures", name), "rb") as f:
+        html = f.read()
+    fast = DEFAULT_HTML_EXTRACTOR[hostname]
+
+    def current():
+        return extract_page(BeautifulSoup(html, "html.parser"), DOC_LINK, DOC_LINK)
+
+    def strained():
+        soup = BeautifulSoup(html, "lxml", parse_only=strainer)
+        return extract_page(soup, DOC_LINK, DOC_LINK)
+
+    def lxml_direct():
+        return fast(html, DOC_LINK, DOC_LINK)
+
+    old_text, new_text = text_of(current()), text_of(lxml_direct())
+    # the current extractors glue some strings together and keep class
+    # names, ignore words that are not in the text of the page
+    page_words = words(" ".join(lxml.html.document_fromstring(html).itertext()))
+    missing = (words(old_text) - words(new_text)) & page_words
+    assert not missing, f"{name}: the lxml extractor lost {sorted(missing)[:10]}"
+    print(f"{name} ({len(html) / 1024:.0f} KiB): {len(old_text)} -> {len(new_text)} chars of text")
+    for label, function in (
+        ("html.parser soup", current),
+        ("lxml soup + SoupStrainer", strained),
+        ("HtmlExtractor (lxml)", lxml_direct),
+    ):
+        seconds = min(timeit.repeat(function, number=1, repeat=REPEAT))
+        print(f"  {label:<26} {seconds * 1000:8.2f} ms/page")
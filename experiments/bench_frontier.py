@@ -0,0 +1,86 @@
+"""Interrupted and resumed crawl through the SQLite crawl frontier.
+
+Serves a synthetic ReadMe site from a local aiohttp server: N doc pages, each
+linking to a few others with relative, absolute and fragment links. A crawl
+runs in a child process that is killed once about half of the pages were
+fetched; the crawl is then resumed from the same frontier file. Checks that
+every page ends up crawled once and prints how many fetches the resume saved
+against starting over.
+
+python experiments/bench_frontier.py [n_pages] [latency_ms]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiohttp import web
+
+import common  # noqa: F401
+from custom_reader import BeautifulSoupWebReader
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+CRAWL = dict(custom_hostname="readme.com", batch_size=32, concurrency=16, per_host=16)
+
+requests_seen: Counter = Counter()
+
+
+async def page(request):
+    i = int(request.match_info["name"].split("-")[1])
+    requests_seen[i] += 1
+    await asyncio.sleep(LATENCY)
+    children = [n for n in (2 * i + 1, 2 * i + 2) if n < N_PAGES]
+    links = "".join(
+        f'<a href="page-{n}#intro">child {n}</a><a href="/docs/page-{n}">again {n}</a>'
+        for n in children
+    )
+    return web.Response(
+        text=(
+            f"<html><head><title>Page {i}</title></head><body>"
+            f'<a href="/docs/page-0">Home</a><a href="mailto:docs@example.com">Mail</a>'
+            f'<main class="layout__main"><h1>Page {i}</h1><p>Body of page {i}.</p>{links}'
+            f'<a href="http://127.0.0.1:{request.url.port}/docs/page-{i}">self</a></main>'
+            "</body></html>"
+        ),
+        content_type="text/html",
+    )
+
+
+def crawl(seed, path):
+    BeautifulSoupWebReader().load_frontier([seed], path, **CRAWL)
+
+
+if __name__ == "__main__":
+    base = serve_in_thread([web.get("/docs/{name}", page)])
+    seed = f"{base}/docs/page-0"
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_frontier_"), "frontier.db")
+
+    start = time.perf_counter()
+    child = multiprocessing.get_context("fork").Process(target=crawl, args=(seed, path))
+    child.start()
+    while sum(requests_seen.values()) < N_PAGES // 2:
+        time.sleep(0.01)
+    child.kill()
+    child.join()
+    before = sum(requests_seen.values())
+
+    documents = BeautifulSoupWebReader().load_frontier([seed], path, **CRAWL)
+    seconds = time.perf_counter() - start
+    total = sum(requests_seen.values())
+
+    assert len(documents) == N_PAGES, f"{len(documents)} documents"
+    assert len({doc.doc_id for doc in documents}) == N_PAGES
+    assert set(requests_seen) == set(range(N_PAGES))
+    resumed = total - before
+    print(f"{N_PAGES} pages, {LATENCY * 1000:.0f} ms latency")
+    print(f"killed after {before} fetches, resumed with {resumed} more")
+    print(
+        f"{total - N_PAGES} pages fetched twice (in flight when killed), "
+        f"{N_PAGES - resumed} fetches saved against starting over"
+    )
+    print(f"total {seconds:.2f} s")
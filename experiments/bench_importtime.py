@@ -0,0 +1,63 @@
+"""Cold-start import time of the Django bot, from `python -X importtime`.
+
+Sets Django up and imports the URL configuration the way a worker does at
+boot, then reports the slowest top-level packages and any package that only
+the query paths need (bot/tests.py fails if one is imported at boot).
+
+python experiments/bench_importtime.py [repeats]
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+LAZY = ("llama_index", "gpt_index", "langchain", "guardrails", "openai", "tiktoken")
+BOOT = (
+    "import os, django\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slackbot.settings')\n"
+    "django.setup()\n"
+    "import bot.urls\n"
+)
+# placeholders so the Bolt app can be constructed without a .env file
+ENV = dict(
+    os.environ,
+    SLACK_CLIENT_ID=os.getenv("SLACK_CLIENT_ID", "bench"),
+    SLACK_CLIENT_SECRET=os.getenv("SLACK_CLIENT_SECRET", "bench"),
+    SLACK_SIGNING_SECRET=os.getenv("SLACK_SIGNING_SECRET", "bench"),
+)
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def run():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=os.path.join(ROOT, "slackbot"),
+        env=ENV,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        lines = result.stderr.splitlines()
+        sys.exit("\n".join(l for l in lines if not l.startswith("import time:")))
+    per_package = defaultdict(int)
+    total = 0
+    for match in LINE.finditer(result.stderr):
+        self_us, cumulative_us, indent, name = match.groups()
+        per_package[name.split(".")[0]] += int(self_us)
+        if not indent:
+            total += int(cumulative_us)
+    return total, per_package
+
+
+runs = [run() for _ in range(REPEATS)]
+total, per_package = min(runs, key=lambda r: r[0])
+print(f"boot imports: {total / 1000:.0f} ms (best of {REPEATS})")
+for name, us in sorted(per_package.items(), key=lambda item: -item[1])[:15]:
+    print(f"  {name:<24} {us / 1000:8.1f} ms")
+
+eager = sorted(name for name in per_package if name in LAZY)
+if eager:
+    print(f"imported at boot but only needed by queries: {', '.join(eager)}")
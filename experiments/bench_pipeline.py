@@ -0,0 +1,64 @@
+"""In-process page extraction against the process-pool pipeline.
+
+Serves N copies of experiments/fixtures/readme.html from a local aiohttp
+server and crawls them with BeautifulSoupWebReader, extracting the pages on
+the event loop thread and then in 1, 2, 4, ... worker processes up to the
+CPU count. Checks that every run extracts the same text.
+
+python experiments/bench_pipeline.py [n_pages] [latency_ms]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+from common import HERE
+from custom_reader import BeautifulSoupWebReader
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+with open(os.path.join(HERE, "fixtures", "readme.html"), "rb") as f:
+    FIXTURE = f.read()
+
+
+async def root(request):
+    links = "".join(f'<a href="/docs/page-{i}">Page {i}</a>' for i in range(N_PAGES))
+    return web.Response(text=f"<html><body>{links}</body></html>", content_type="text/html")
+
+
+async def page(request):
+    await asyncio.sleep(LATENCY)
+    name = request.match_info["name"].encode()
+    return web.Response(body=FIXTURE.replace(b"Paystack API", name), content_type="text/html")
+
+
+if __name__ == "__main__":
+    base = serve_in_thread([web.get("/", root), web.get("/docs/{name}", page)])
+    url = f"{base}/"
+    reader = BeautifulSoupWebReader()
+    cpus = os.cpu_count() or 1
+    runs = [None] + [n for n in (1, 2, 4, 8, 16, 32) if n <= cpus]
+    if cpus not in runs:
+        runs.append(cpus)
+
+    print(f"{N_PAGES} pages of {len(FIXTURE) / 1024:.0f} KiB, {LATENCY * 1000:.0f} ms latency, {cpus} CPUs")
+    texts, baseline = set(), None
+    for processes in runs:
+        start = time.perf_counter()
+        documents = reader.load_data(
+            [url],
+            custom_hostname="readme.com",
+            concurrency=32,
+            per_host=32,
+            processes=processes,
+        )
+        seconds = time.perf_counter() - start
+        texts.add(documents[0].text)
+        baseline = baseline or seconds
+        label = "in process" if processes is None else f"{processes:>2} processes"
+        print(f"{label:<14} {seconds:7.2f} s  {N_PAGES / seconds:7.1f} pages/s  x{baseline / seconds:.2f}")
+    assert len(texts) == 1, "the runs extracted different text"
@@ -0,0 +1,65 @@
+"""Recall loss, memory and latency of quantized embedding storage.
+
+Synthetic embeddings are derived from the ones in mdb.json with
+`common.synthetic_embeddings`, written to a memory-mapped vectors file and
+searched through QuantizedVectorStore in both int8 and float16 mode, then in
+int8 mode behind an IVF index.
+
+python experiments/bench_quantization.py [n_nodes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from common import synthetic_embeddings
+from ann_index import IVFIndex
+from embedding_store import open_embeddings, save_embeddings
+from quantization import QuantizedVectorStore, measure_recall
+from vector_search import VectorSearchEngine
+
+N_NODES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+N_QUERIES = 200
+TOP_K = 4
+
+nodes, queries, ids = synthetic_embeddings(N_NODES, N_QUERIES)
+dim = nodes.shape[1]
+
+with tempfile.TemporaryDirectory() as tmp:
+    vectors_path = os.path.join(tmp, "bench.vectors.npy")
+    save_embeddings(vectors_path, ids, nodes, {i: "doc" for i in ids})
+    del nodes
+
+    print(f"{N_NODES} nodes x {dim} dims, top {TOP_K}")
+    exact = VectorSearchEngine(open_embeddings(vectors_path)[0], ids, copy=False)
+    start = time.perf_counter()
+    exact.search_batch(queries, TOP_K)
+    ms = (time.perf_counter() - start) / N_QUERIES * 1000
+    print(f"float32  {N_NODES * dim * 4 / 2**20:8.1f} MiB  {ms:7.3f} ms/query  recall 1.000")
+
+    for mode in ("float16", "int8"):
+        QuantizedVectorStore(vectors_path, mode).write_codes()
+        for rescore in (1, 4, 16):
+            engine = QuantizedVectorStore(vectors_path, mode, rescore).engine
+            start = time.perf_counter()
+            engine.search_batch(queries, TOP_K)
+            ms = (time.perf_counter() - start) / N_QUERIES * 1000
+            report = measure_recall(engine, queries, TOP_K)
+            print(
+                f"{mode:<7}  {engine.nbytes / 2**20:8.1f} MiB  {ms:7.3f} ms/query  "
+                f"recall {report['recall']:.3f} (loss {report['recall_loss']:.3f}, "
+                f"rescore={rescore})"
+            )
+
+    ivf = IVFIndex.build(exact.matrix, ids)
+    for nprobe in (8, 32):
+        engine = QuantizedVectorStore(vectors_path, "int8", ann=ivf, nprobe=nprobe).engine
+        start = time.perf_counter()
+        engine.search_batch(queries, TOP_K)
+        ms = (time.perf_counter() - start) / N_QUERIES * 1000
+        report = measure_recall(engine, queries, TOP_K)
+        print(
+            f"int8+IVF {engine.nbytes / 2**20:8.1f} MiB  {ms:7.3f} ms/query  "
+            f"recall {report['recall']:.3f} (loss {report['recall_loss']:.3f}, "
+            f"nprobe={nprobe}, {ivf.n_lists} lists)"
+        )
@@ -0,0 +1,94 @@
+"""Throttled doc host: bare requests vs aiohttp crawl vs scheduler.PoliteScheduler.
+
+Serves N pages from a local aiohttp server that allows LIMIT requests per
+second (a token bucket with one second of burst) and answers anything above
+it with 429 and Retry-After: 1, like the doc hosts that throttle our crawls.
+Fetches every page three ways and prints the time, the 429s and the TCP
+connections opened:
+
+- one `requests.get` per page, one after the other (what custom_reader did)
+- `crawler.crawl` with 16 concurrent connections and no rate limit
+- `PoliteScheduler` with the host's rate as its policy
+- `PoliteScheduler` allowed twice the host's rate, which has to back off
+  on the 429s
+
+python experiments/bench_scheduler.py [n_pages] [limit_rps] [latency_ms]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+from aiohttp import web
+
+import common  # noqa: F401
+from crawler import crawl
+from scheduler import HostPolicy, PoliteScheduler
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+LIMIT = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+LATENCY = (int(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+BODY = "<html><body><main>" + "Lorem ipsum dolor sit amet. " * 400 + "</main></body></html>"
+
+
+class Server:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tokens = LIMIT
+        self.refilled = time.monotonic()
+        self.throttled = 0
+        self.served = 0
+        self.connections = set()
+
+    async def page(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        now = time.monotonic()
+        self.tokens = min(LIMIT, self.tokens + (now - self.refilled) * LIMIT)
+        self.refilled = now
+        if self.tokens < 1:
+            self.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        self.tokens -= 1
+        await asyncio.sleep(LATENCY)
+        self.served += 1
+        return web.Response(text=BODY, content_type="text/html")
+
+
+def bare(urls):
+    import requests
+
+    return [requests.get(url, timeout=30) for url in urls]
+
+
+def run(name, server, fetch, urls):
+    time.sleep(1.5)  # let the bucket fill up again
+    server.reset()
+    start = time.perf_counter()
+    fetch(urls)
+    seconds = time.perf_counter() - start
+    print(
+        f"{name:<28} {seconds:6.2f} s  {server.served:>4} pages  "
+        f"{server.throttled:>5} x 429  {len(server.connections):>4} connections"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.CRITICAL)
+    server = Server()
+    base = serve_in_thread([web.get("/docs/{name}", server.page)])
+    urls = [f"{base}/docs/page-{i}" for i in range(N_PAGES)]
+    print(f"{N_PAGES} pages, host allows {LIMIT:.0f} req/s, {LATENCY * 1000:.0f} ms latency")
+
+    run("requests.get, sequential", server, bare, urls)
+    run("crawler.crawl, 16 conns", server, lambda urls: crawl(urls, concurrency=16, per_host=16), urls)
+    scheduler = PoliteScheduler(default_policy=HostPolicy(rps=LIMIT * 0.95, concurrency=4))
+    run("PoliteScheduler", server, lambda urls: scheduler.fetch_all(urls), urls)
+    print(f"scheduler stats: {scheduler.stats()['127.0.0.1']}")
+    scheduler.close()
+    scheduler = PoliteScheduler(default_policy=HostPolicy(rps=LIMIT * 2, concurrency=8))
+    run("PoliteScheduler, 2x rate", server, lambda urls: scheduler.fetch_all(urls), urls)
+    print(f"scheduler stats: {scheduler.stats()['127.0.0.1']}")
+    scheduler.close()
@@ -0,0 +1,108 @@
+"""Full sitemap crawl against the lastmod-driven incremental crawl.
+
+Serves a sitemap index over two child sitemaps (one gzipped) listing N pages
+from a local aiohttp server. Crawls everything once, then bumps the lastmod
+of a few pages, drops one from the sitemap and crawls again, checking that
+only the bumped pages are fetched.
+
+python experiments/bench_sitemap.py [n_pages] [n_changed] [latency_ms]
+"""
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiohttp import web
+
+import common  # noqa: F401
+from custom_reader import BeautifulSoupWebReader, SitemapState
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+N_CHANGED = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+LATENCY = (int(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+lastmods = {i: "2023-04-01" for i in range(N_PAGES)}
+hidden = set()
+requests_seen: Counter = Counter()
+
+
+def urlset(pages):
+    urls = "".join(
+        f"<url><loc>{base}docs/page-{i}</loc><lastmod>{lastmods[i]}</lastmod></url>"
+        for i in pages
+        if i not in hidden
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{NS}">{urls}</urlset>'
+
+
+async def sitemap_index(request):
+    sitemaps = (
+        f"<sitemap><loc>{base}sitemap-1.xml</loc></sitemap>"
+        f"<sitemap><loc>{base}sitemap-2.xml.gz</loc></sitemap>"
+    )
+    body = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{NS}">{sitemaps}</sitemapindex>'
+    return web.Response(text=body, content_type="application/xml")
+
+
+async def sitemap_1(request):
+    return web.Response(text=urlset(range(N_PAGES // 2)), content_type="application/xml")
+
+
+async def sitemap_2(request):
+    body = gzip.compress(urlset(range(N_PAGES // 2, N_PAGES)).encode())
+    return web.Response(body=body, content_type="application/gzip")
+
+
+async def page(request):
+    name = request.match_info["name"]
+    requests_seen[name] += 1
+    await asyncio.sleep(LATENCY)
+    i = int(name.split("-")[1])
+    return web.Response(
+        text=(
+            f"<html><head><title>{name}</title></head><body>"
+            f'<main class="layout__main"><h1>{name}</h1><p>Revision {lastmods[i]}.</p>'
+            "</main></body></html>"
+        ),
+        content_type="text/html",
+    )
+
+
+base = serve_in_thread(
+    [
+        web.get("/sitemap.xml", sitemap_index),
+        web.get("/sitemap-1.xml", sitemap_1),
+        web.get("/sitemap-2.xml.gz", sitemap_2),
+        web.get("/docs/{name}", page),
+    ]
+) + "/"
+reader = BeautifulSoupWebReader()
+state = SitemapState(os.path.join(tempfile.mkdtemp(prefix="bench_sitemap_"), "state.json"))
+kwargs = dict(custom_hostname="readme.com", concurrency=32, per_host=32)
+
+start = time.perf_counter()
+documents, removed = reader.load_sitemap(f"{base}sitemap.xml", state, **kwargs)
+full_s = time.perf_counter() - start
+assert len(documents) == N_PAGES and not removed
+
+changed = set(range(0, N_PAGES, N_PAGES // N_CHANGED))
+for i in changed:
+    lastmods[i] = "2023-04-02T09:30:00+00:00"
+hidden.add(N_PAGES - 1)
+requests_seen.clear()
+start = time.perf_counter()
+documents, removed = reader.load_sitemap(f"{base}sitemap.xml", state, **kwargs)
+incremental_s = time.perf_counter() - start
+
+assert {doc.doc_id.rsplit("-", 1)[1] for doc in documents} == {str(i) for i in changed}
+assert sum(requests_seen.values()) == len(changed)
+assert removed == [f"{base}docs/page-{N_PAGES - 1}"]
+assert all("2023-04-02" in doc.text for doc in documents)
+print(f"{N_PAGES} pages, {len(changed)} changed, {LATENCY * 1000:.0f} ms latency")
+print(f"full crawl          {full_s:7.2f} s")
+print(f"incremental crawl   {incremental_s:7.2f} s")
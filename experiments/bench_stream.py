@@ -0,0 +1,91 @@
+"""Time to the first Document: BeautifulSoupWebReader.load_data vs lazy_load_pages.
+
+Serves a synthetic ReadMe site from a local aiohttp server: an index page
+linking to N doc pages. `load_data` returns the whole site as one Document
+once every page is fetched; `lazy_load_pages` yields one Document per page,
+crawling the next pages while the consumer (a sleep standing in for
+embedding the page) works on the last one.
+
+python experiments/bench_stream.py [n_pages] [latency_ms] [index_ms_per_page]
+"""
+import asyncio
+import sys
+import time
+
+from aiohttp import web
+
+import common  # noqa: F401
+from custom_reader import BeautifulSoupWebReader
+from testing import serve_in_thread
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+INDEX = (int(sys.argv[3]) if len(sys.argv) > 3 else 5) / 1000
+
+
+async def index(request):
+    links = "".join(f'<a href="/docs/page-{i}">Page {i}</a>' for i in range(N_PAGES))
+    return web.Response(text=f"<html><body>{links}</body></html>", content_type="text/html")
+
+
+async def page(request):
+    i = int(request.match_info["name"].split("-")[1])
+    await asyncio.sleep(LATENCY)
+    return web.Response(
+        text=(
+            f"<html><head><title>Page {i}</title></head><body>"
+            f'<main class="layout__main"><h1>Page {i}</h1>'
+            + f"<p>Paragraph of page {i}.</p>" * 20
+            + "</main></body></html>"
+        ),
+        content_type="text/html",
+    )
+
+
+def consume(load):
+    start = time.perf_counter()
+    documents = load()
+    first, count, sizes = None, 0, []
+    for document in documents:
+        if first is None:
+            first = time.perf_counter() - start
+        time.sleep(INDEX * max(1, len(document.text) // 500))
+        count += 1
+        sizes.append(len(document.text))
+    return first, time.perf_counter() - start, count, sizes
+
+
+if __name__ == "__main__":
+    base = serve_in_thread([web.get("/", index), web.get("/docs/{name}", page)])
+    url = f"{base}/"
+    print(f"{N_PAGES} pages, {LATENCY * 1000:.0f} ms latency, {INDEX * 1000:.0f} ms to index a page")
+
+    reader = BeautifulSoupWebReader()
+    first, total, count, sizes = consume(
+        lambda: reader.load_data([url], custom_hostname="readme.com", concurrency=16, per_host=16)
+    )
+    print(f"load_data        first after {first:6.2f} s, total {total:6.2f} s, {count} Document of {sizes[0]} chars")
+
+    first, total, count, sizes = consume(
+        lambda: reader.lazy_load_pages([url], custom_hostname="readme.com", per_host=16)
+    )
+    print(
+        f"lazy_load_pages  first after {first:6.2f} s, total {total:6.2f} s, "
+        f"{count} Documents of {min(sizes)}-{max(sizes)} chars"
+    )
+    assert count == N_PAGES
+
+    documents = list(reader.lazy_load_pages([url], custom_hostname="readme.com", per_host=16))
+    assert len({document.doc_id for document in documents}) == N_PAGES
+    assert all(
+        document.extra_info["title"].startswith("Page ")
+        and document.extra_info["doc_link"] == document.doc_id
+        for document in documents
+    )
+
+    # stopping early cancels the requests in flight
+    stream = reader.lazy_load_pages([url], custom_hostname="readme.com", per_host=16)
+    next(stream)
+    start = time.perf_counter()
+    stream.close()
+    print(f"closed after the first page in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,47 @@
+"""Shared setup for the scripts in experiments/.
+
+Importing this module puts slackbot/bot on sys.path, so the bot modules can
+be imported the way the bot imports them (`from custom_reader import ...`).
+"""
+import json
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BOT = os.path.join(ROOT, "slackbot", "bot")
+if BOT not in sys.path:
+    sys.path.append(BOT)
+
+
+def synthetic_embeddings(
+    n_nodes: int,
+    n_queries: int = 200,
+    n_centres: int = 1000,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Scale the embeddings in mdb.json up to `n_nodes` clustered nodes.
+
+    Cluster centres are random mixtures of the real vectors plus noise, and
+    every node is a noisy copy of a centre. Queries are noisy copies of
+    random nodes.
+
+    Returns:
+        Tuple: the node matrix, the query matrix and the node ids.
+    """
+    with open(os.path.join(ROOT, "mdb.json"), "r") as f:
+        store = json.load(f)["vector_store"]["__data__"]["simple_vector_store_data_dict"]
+    seeds = np.asarray(list(store["embedding_dict"].values()), dtype=np.float32)
+    dim = seeds.shape[1]
+
+    rng = np.random.default_rng(seed)
+    mix = rng.dirichlet(np.ones(len(seeds)), size=n_centres).astype(np.float32)
+    centres = mix @ seeds + rng.normal(0, 0.02, (n_centres, dim)).astype(np.float32)
+    nodes = centres[rng.integers(0, n_centres, n_nodes)]
+    nodes += rng.normal(0, 0.01, nodes.shape).astype(np.float32)
+    queries = nodes[rng.integers(0, n_nodes, n_queries)]
+    queries += rng.normal(0, 0.01, queries.shape).astype(np.float32)
+    return nodes, queries, [str(i) for i in range(n_nodes)]
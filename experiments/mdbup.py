@@ -1,56 +1,206 @@
+"""Scrape the MindsDB docs into do_text.json and bulk-load it into a SQL table.
+
+python experiments/mdbup.py scrape [--limit N]
+python experiments/mdbup.py load do_text.json mysql+pymysql://user:pw@host:3306/db \
+    [--table my_table] [--batch-size 1000] [--transaction-size 10000]
+"""
 from bs4 import BeautifulSoup
 import requests
+import argparse
 import logging
 import json
-import os
-
-url = 'https://docs.mindsdb.com/sitemap.xml'
-response = requests.get(url)
-soup = BeautifulSoup(response.text, 'xml')
-
-docs_links = []
-for url in soup.find_all('url'):
-    loc = url.find('loc').text
-    docs_links.append(loc)
-docs_text = []
-for i, doc_link in enumerate(docs_links[:2]):
-    try:
-        page_link = requests.get(doc_link)
-        soup = BeautifulSoup(page_link.text, "html.parser")
-        title = soup.title.string.strip() if soup.title else "No title available" #page title
-        text = ""
-        source_links=[]
-        # div = soup.find('div', class_='flex flex-row pt-9 gap-12 items-stretch')
-        for element in soup.find('div', class_='flex flex-row pt-9 gap-12 items-stretch'):
-            
-            for child in element.descendants:
-                if child.name == "a" and child.has_attr("href"):
-                    url = child.get("href")
-                    if url is not None and "edit" in url:
-                        text += child.get_text()
-                    else:
-                        if url.startswith("/") or "#" in url:
-                            # check if text has already been added
-                            if child.get_text() not in text:
-                                text += f"{child.get_text()} (Reference url: {doc_link}{url}) "
-                                source_links.append(url)
-                        else:
-                            # check if text has already been added
-                            if child.get_text() not in text:
-                                text += f"{child.get_text()} "
-
-                elif child.name == "div" and "gray-frame" in child.get("class", []):
-                    codeblock = child.find('code')
-                    markdown = f"```{codeblock['class'][0]}{os.linesep}{codeblock.text}{os.linesep}```"
-                    text += markdown
-                elif child.string and child.string.strip():
-                    text += child.string.strip() + " "
-
-        docs_text.append({'id': i+1, 'page_link': doc_link, 'title': title, 'text': text, 'source_links': source_links})
-    except Exception as e:
-        logging.error(f"Could not extract text from {doc_link}: {e}")
-        continue
-
-# write docs_text to a JSON file
-with open('do_text.json', 'w') as f:
-    json.dump(docs_text, f)
\ No newline at end of file
+import re
+import time
+from itertools import chain, islice
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+)
+
+import common  # noqa: F401
+from html_extract import DEFAULT_HTML_EXTRACTOR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+extract_mindsdb_page = DEFAULT_HTML_EXTRACTOR["docs.mindsdb.com"]
+
+
+def scrape(limit=None, output_path="do_text.json"):
+    url = 'https://docs.mindsdb.com/sitemap.xml'
+    response = requests.get(url)
+    soup = BeautifulSoup(response.text, 'xml')
+
+    docs_links = []
+    for url in soup.find_all('url'):
+        loc = url.find('loc').text
+        docs_links.append(loc)
+    docs_text = []
+    for i, doc_link in enumerate(docs_links[:limit]):
+        try:
+            page_link = requests.get(doc_link)
+            page = extract_mindsdb_page(page_link.content, doc_link)
+            docs_text.append({'id': i+1, 'page_link': doc_link, 'title': page['title'], 'text': page['text'], 'source_links': page['source_links']})
+        except Exception as e:
+            logging.error(f"Could not extract text from {doc_link}: {e}")
+            continue
+
+    # write docs_text to a JSON file
+    with open(output_path, 'w') as f:
+        json.dump(docs_text, f)
+
+
+def iter_json_array(path, chunk_size=1 << 20):
+    """Yield the objects of a top-level JSON array without loading the file."""
+    decoder = json.JSONDecoder()
+    separator = re.compile(r"[\s,]*")
+    with open(path, "r") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        position, eof = 1, False
+        while True:
+            position = separator.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # the object continues past the buffer, drop what was
+                # consumed and read more
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield item
+            position = end
+
+
+def infer_columns(sample):
+    """Infer SQL column types from a sample of rows.
+
+    Columns appear in the order they are first seen. A column is Boolean,
+    Integer (BigInteger beyond 32 bits) or Float only if every non-null value
+    in the sample fits; everything else, including lists and objects, which
+    are stored as JSON text, becomes Text.
+    """
+    values = {}
+    for row in sample:
+        for name, value in row.items():
+            values.setdefault(name, [])
+            if value is not None:
+                values[name].append(value)
+
+    columns = []
+    for name, column_values in values.items():
+        if column_values and all(isinstance(v, bool) for v in column_values):
+            column_type = Boolean
+        elif column_values and all(
+            isinstance(v, int) and not isinstance(v, bool) for v in column_values
+        ):
+            big = any(abs(v) >= 2**31 for v in column_values)
+            column_type = BigInteger if big else Integer
+        elif column_values and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool)
+            for v in column_values
+        ):
+            column_type = Float
+        else:
+            column_type = Text
+        columns.append(Column(name, column_type))
+    return columns
+
+
+def _to_row(item, names):
+    row = {}
+    for name in names:
+        value = item.get(name)
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        row[name] = value
+    return row
+
+
+def bulk_load(
+    json_path,
+    url,
+    table_name="my_table",
+    batch_size=1000,
+    transaction_size=10000,
+    sample_size=1000,
+):
+    """Stream a JSON array of objects into a SQL table with batched inserts.
+
+    The table is created from types inferred over the first `sample_size`
+    rows if it doesn't exist. Rows are inserted `batch_size` at a time with
+    executemany and committed every `transaction_size` rows.
+    """
+    engine = create_engine(url)
+    items = iter_json_array(json_path)
+    sample = list(islice(items, sample_size))
+    if not sample:
+        logger.info(f"{json_path} is empty, nothing to load")
+        return 0
+
+    metadata = MetaData()
+    table = Table(table_name, metadata, *infer_columns(sample))
+    metadata.create_all(engine)
+    names = [column.name for column in table.columns]
+
+    start = time.perf_counter()
+    loaded = 0
+    rows = (_to_row(item, names) for item in chain(sample, items))
+    with engine.connect() as connection:
+        while True:
+            with connection.begin():
+                in_transaction = 0
+                while in_transaction < transaction_size:
+                    size = min(batch_size, transaction_size - in_transaction)
+                    batch = list(islice(rows, size))
+                    if not batch:
+                        break
+                    connection.execute(table.insert(), batch)
+                    in_transaction += len(batch)
+            loaded += in_transaction
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded {loaded} rows ({loaded / elapsed:.0f} rows/s)")
+            if in_transaction < transaction_size:
+                return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    scrape_parser = commands.add_parser("scrape", help="scrape the docs into do_text.json")
+    scrape_parser.add_argument("--limit", type=int, default=None)
+    scrape_parser.add_argument("--output", default="do_text.json")
+    load_parser = commands.add_parser("load", help="bulk-load a JSON array into a table")
+    load_parser.add_argument("json_path")
+    load_parser.add_argument("url", help="SQLAlchemy database URL")
+    load_parser.add_argument("--table", default="my_table")
+    load_parser.add_argument("--batch-size", type=int, default=1000)
+    load_parser.add_argument("--transaction-size", type=int, default=10000)
+    load_parser.add_argument("--sample-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "scrape":
+        scrape(args.limit, args.output)
+    else:
+        bulk_load(
+            args.json_path,
+            args.url,
+            args.table,
+            args.batch_size,
+            args.transaction_size,
+            args.sample_size,
+        )
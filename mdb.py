@@ -1,10 +1,14 @@
 import os
+import sys
 import json
 from dotenv import load_dotenv
 from llama_index.indices.struct_store import SQLContextContainerBuilder
 from dbreader import DatabaseReader
 from sqlalchemy import create_engine
 from llama_index import GPTSimpleVectorIndex
+# the dedup module lives with the bot
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "slackbot", "bot"))
+from dedup import dedup_documents
 from langchain.chains.question_answering import load_qa_chain
 load_dotenv()
 
@@ -14,18 +18,35 @@ password = os.getenv("password")
 host = os.getenv("host")
 port = os.getenv("port")
 database = os.getenv("database") #database can be anything
-engine = create_engine(f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
-reader = DatabaseReader(engine=engine)
 
 query = f"""
-SELECT CONCAT('[', GROUP_CONCAT(JSON_OBJECT('id', id, 'title', title, 'page_link', page_link, 'text', text)), ']')
+SELECT id, title, page_link, text
 FROM files.mdb;
 """
-documents = reader.load_data(query=query)
-# index = GPTSimpleVectorIndex.from_documents(documents)
-# index.save_to_disk('mdb.json')
-#  load from disk
-index = GPTSimpleVectorIndex.load_from_disk('mdb.json')
-response=index.query('what is mindsdb? provide references and sources')
-print(response)
 
+
+def load_documents(reader, query=query, **dedup_kwargs):
+    """Load one document per page, with its id, title and link as metadata."""
+    documents = reader.load_data(
+        query=query,
+        text_column="text",
+        extra_info_columns=["id", "title", "page_link"],
+        doc_id_column="id",
+    )
+    # drop duplicated pages, but keep the text of each row verbatim
+    documents, _ = dedup_documents(
+        documents, within_documents=False, **dedup_kwargs
+    )
+    return documents
+
+
+if __name__ == "__main__":
+    engine = create_engine(f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
+    reader = DatabaseReader(engine=engine)
+    documents = load_documents(reader)
+    # index = GPTSimpleVectorIndex.from_documents(documents)
+    # index.save_to_disk('mdb.json')
+    #  load from disk
+    index = GPTSimpleVectorIndex.load_from_disk('mdb.json')
+    response=index.query('what is mindsdb? provide references and sources')
+    print(response)
@@ -1,9 +1,10 @@
 from django.contrib import admin
 
-from .models import SlackBot, SlackInstallation
+from .models import SlackBot, SlackInstallation, TenantIndex
 
 # Register your models here.
 
 
 admin.site.register(SlackBot)
 admin.site.register(SlackInstallation)
+admin.site.register(TenantIndex)
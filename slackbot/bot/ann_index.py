@@ -0,0 +1,205 @@
+"""Approximate nearest neighbour (IVF) index over node embeddings.
+
+The embeddings are clustered with spherical k-means; each node is filed under
+its closest centroid. A query only scores the nodes filed under the `nprobe`
+centroids closest to it, trading a little recall for a large speed-up on big
+corpora. The index only stores row numbers, the vectors themselves stay in
+the vector store.
+"""
+import logging
+import math
+import os
+import time
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NPROBE = 8
+
+
+def ann_path(index_path: str) -> str:
+    """Return the path of the IVF file stored alongside a persisted index."""
+    return os.path.splitext(index_path)[0] + ".ivf.npz"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign(matrix: Any, centroids: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+    """Return the closest centroid of each row, reading `matrix` in chunks."""
+    labels = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), chunk_size):
+        chunk = _normalize(matrix[start : start + chunk_size])
+        labels[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """Inverted file index with k-means centroids.
+
+    Args:
+        centroids (np.ndarray): normalized centroids, shape (n_lists, dim).
+        order (np.ndarray): row numbers grouped by list.
+        offsets (np.ndarray): list `i` holds `order[offsets[i]:offsets[i + 1]]`.
+        ids (Sequence[str]): node id of each row when the index was built, used
+            to detect an index that no longer matches its vector store.
+        nprobe (Optional[int]): number of lists to search per query when the
+            index is loaded without an explicit nprobe.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        ids: Sequence[str],
+        nprobe: Optional[int] = None,
+    ) -> None:
+        """Initialize with parameters."""
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.ids = list(ids)
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: Any,
+        ids: Sequence[str],
+        n_lists: Optional[int] = None,
+        n_iter: int = 10,
+        sample_size: Optional[int] = None,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Cluster `embeddings` and build the inverted lists.
+
+        Args:
+            embeddings (Any): matrix of shape (n, dim); may be a memory map.
+            ids (Sequence[str]): node id of each row.
+            n_lists (Optional[int]): number of clusters, 4 * sqrt(n) by default.
+            n_iter (int): k-means iterations.
+            sample_size (Optional[int]): number of rows k-means is trained on,
+                32 per cluster by default.
+            seed (int): random seed.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        start = time.perf_counter()
+        n = len(ids)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index without embeddings")
+        n_lists = n_lists or int(4 * math.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        sample_size = min(n, sample_size or n_lists * 32)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = _normalize(embeddings[sample_rows])
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)]
+        for _ in range(n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            sorted_rows = sample[np.argsort(labels, kind="stable")]
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty]
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sorted_rows, starts, axis=0)
+            # reseed empty clusters with random sample rows
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        labels = _assign(embeddings, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=n_lists))
+        logger.info(
+            f"Built IVF index with {n_lists} lists over {n} embeddings "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return cls(centroids, order, offsets, ids)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Return the rows filed under the `nprobe` lists closest to `query`."""
+        nprobe = max(1, min(nprobe, self.n_lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            lists = np.arange(self.n_lists)
+        return np.concatenate(
+            [self.order[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        )
+
+    def save(self, path: str) -> None:
+        """Save the index to an `.npz` file."""
+        tmp_path = path + ".tmp.npz"
+        extra = {} if self.nprobe is None else {"nprobe": np.int64(self.nprobe)}
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+            ids=np.asarray(self.ids, dtype=str),
+            **extra,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """Load an index saved with `save`."""
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["order"],
+                data["offsets"],
+                data["ids"].tolist(),
+                nprobe=int(data["nprobe"]) if "nprobe" in data else None,
+            )
+
+
+def build_ann_index(
+    index_path: str,
+    n_lists: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    **build_kwargs: Any,
+) -> IVFIndex:
+    """Build the IVF index of a persisted index and save it alongside it.
+
+    `vector_search.load_index` picks the file up automatically.
+
+    Args:
+        index_path (str): path of the JSON written by `save_to_disk`.
+        n_lists (Optional[int]): number of clusters.
+        nprobe (Optional[int]): number of lists searched per query, saved
+            with the index as the default for `load_index`.
+        build_kwargs: passed on to `IVFIndex.build`.
+
+    Returns:
+        IVFIndex: The built index.
+    """
+    from vector_search import load_vector_store
+
+    engine = load_vector_store(index_path).engine
+    ivf = IVFIndex.build(engine.matrix, engine.ids, n_lists=n_lists, **build_kwargs)
+    ivf.nprobe = nprobe
+    ivf.save(ann_path(index_path))
+    return ivf
+
+
+def recall_at_k(exact: List[List[str]], approximate: List[List[str]]) -> float:
+    """Fraction of the exact top-k ids that the approximate search also found."""
+    found = sum(len(set(e) & set(a)) for e, a in zip(exact, approximate))
+    total = sum(len(e) for e in exact)
+    return found / total if total else 1.0
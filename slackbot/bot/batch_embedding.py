@@ -0,0 +1,436 @@
+"""Batched, concurrent embedding of chunks under a rate-limit budget.
+
+Chunks are packed in order into requests of at most `max_batch_tokens`
+tokens (counted with tiktoken) and `max_batch_items` inputs, and several
+requests run at once over one keep-alive connection pool. Every request
+first takes its tokens from a shared per-minute budget, so concurrency
+doesn't turn into 429s. A 429 pauses the budget for its Retry-After. A batch
+that still fails after its retries is sent again one chunk per request, so
+a single bad chunk doesn't lose the embeddings of the rest.
+
+`BatchedOpenAIEmbedding` plugs this into index construction, which parses
+every chunk before it asks for their embeddings:
+
+    service_context = ServiceContext.from_defaults(embed_model=BatchedOpenAIEmbedding())
+    index = GPTSimpleVectorIndex.from_documents(documents, service_context=service_context)
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from llama_index.embeddings.openai import _TEXT_MODE_MODEL_DICT, OpenAIEmbedding
+
+from crawler import RETRY_STATUSES, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+DEFAULT_MAX_BATCH_TOKENS = 16000
+DEFAULT_MAX_BATCH_ITEMS = 256
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TOKENS_PER_MINUTE = 1000000
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+# seconds of budget that can be spent at once: the per-minute limits are
+# enforced over much shorter windows than a minute
+DEFAULT_BURST = 1.0
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+
+
+def tiktoken_counter(model: str) -> Callable[[str], int]:
+    """Get a function counting the tokens of a text as `model` does."""
+    import tiktoken
+
+    encoding = tiktoken.encoding_for_model(model)
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def pack_batches(
+    token_counts: Sequence[int], max_tokens: int, max_items: int
+) -> List[List[int]]:
+    """Group consecutive items into batches within the token and item limits.
+
+    An item with more than `max_tokens` tokens gets a batch of its own.
+
+    Args:
+        token_counts (Sequence[int]): tokens of every item.
+        max_tokens (int): maximum tokens per batch.
+        max_items (int): maximum items per batch.
+
+    Returns:
+        List[List[int]]: the positions of the items of every batch.
+    """
+    if max_tokens < 1 or max_items < 1:
+        raise ValueError("max_tokens and max_items must be positive")
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    tokens = 0
+    for i, count in enumerate(token_counts):
+        if batch and (tokens + count > max_tokens or len(batch) == max_items):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += count
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class RateBudget:
+    """Requests and tokens allowed per minute, shared by concurrent requests.
+
+    Both are token buckets holding `burst` seconds of budget; `acquire`
+    waits, first come first served, until there is enough of both.
+
+    Args:
+        tokens_per_minute (int): tokens the API accepts per minute.
+        requests_per_minute (int): requests the API accepts per minute.
+        burst (float): seconds of budget that can be spent at once.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        burst: float = DEFAULT_BURST,
+    ) -> None:
+        """Initialize with parameters."""
+        if tokens_per_minute <= 0 or requests_per_minute <= 0 or burst <= 0:
+            raise ValueError("The rate limits must be positive")
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        # always room for at least one request
+        self._max_tokens = tokens_per_minute * burst / 60
+        self._max_requests = max(requests_per_minute * burst / 60, 1.0)
+        self._tokens = self._max_tokens
+        self._requests = self._max_requests
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waited = 0.0
+
+    def _refill(self, now: float) -> None:
+        minutes = (now - self._updated) / 60
+        self._tokens = min(self._max_tokens, self._tokens + minutes * self.tokens_per_minute)
+        self._requests = min(
+            self._max_requests, self._requests + minutes * self.requests_per_minute
+        )
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a request of `tokens` tokens fits the budget, and spend it."""
+        # a budget outlives the event loop of one `embed_texts` call
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        # a batch larger than the bucket would wait forever
+        tokens = min(tokens, self._max_tokens)
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(
+                    self._paused_until - now,
+                    (tokens - self._tokens) / self.tokens_per_minute * 60,
+                    (1 - self._requests) / self.requests_per_minute * 60,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._tokens -= tokens
+            self._requests -= 1
+        self.waited += time.monotonic() - start
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for `seconds`, e.g. after a 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+@dataclass
+class EmbeddingStats:
+    """What an embedding run did."""
+
+    texts: int = 0
+    tokens: int = 0
+    batches: int = 0
+    requests: int = 0
+    throttled: int = 0
+    retries: int = 0
+    split: int = 0
+    failed: int = 0
+    waited: float = 0.0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.texts} texts ({self.tokens} tokens) in {self.batches} batches, "
+            f"{self.requests} requests in {self.seconds:.2f}s, {self.throttled} throttled, "
+            f"{self.retries} retries, {self.split} batches retried item by item, "
+            f"{self.failed} failed, {self.waited:.2f}s waiting for the rate limit"
+        )
+
+
+async def _embed_batch(
+    session: Any,
+    url: str,
+    model: str,
+    texts: List[str],
+    tokens: int,
+    budget: RateBudget,
+    retries: int,
+    backoff: float,
+    stats: EmbeddingStats,
+) -> Optional[List[List[float]]]:
+    """Embed one batch, retrying throttled and failed requests.
+
+    Returns:
+        Optional[List[List[float]]]: the embeddings in the order of `texts`,
+            or None if the batch could not be embedded.
+    """
+    import aiohttp
+
+    error = None
+    for attempt in range(retries + 1):
+        await budget.acquire(tokens)
+        retry_after = None
+        try:
+            async with session.post(url, json={"input": texts, "model": model}) as response:
+                stats.requests += 1
+                if response.status == 200:
+                    rows = sorted((await response.json())["data"], key=lambda row: row["index"])
+                    if len(rows) == len(texts):
+                        return [row["embedding"] for row in rows]
+                    error = f"{len(rows)} embeddings for {len(texts)} texts"
+                else:
+                    error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    if response.status not in RETRY_STATUSES:
+                        # the request itself was rejected, retrying won't help
+                        break
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if response.status == 429:
+                        stats.throttled += 1
+                        budget.pause(retry_after or backoff * 2**attempt)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+            error = repr(e)
+        if attempt < retries:
+            stats.retries += 1
+            delay = random.uniform(0, backoff * 2**attempt)
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+    logger.warning(f"Could not embed a batch of {len(texts)} texts: {error}")
+    return None
+
+
+async def embed_all(
+    texts: Sequence[str],
+    model: str,
+    count_tokens: Callable[[str], int],
+    api_base: str = DEFAULT_API_BASE,
+    api_key: Optional[str] = None,
+    max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+    max_batch_items: int = DEFAULT_MAX_BATCH_ITEMS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    budget: Optional[RateBudget] = None,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Tuple[List[Optional[List[float]]], EmbeddingStats]:
+    """Embed `texts` with concurrent, token-packed requests.
+
+    Args:
+        texts (Sequence[str]): texts to embed.
+        model (str): embedding model, e.g. text-embedding-ada-002.
+        count_tokens (Callable[[str], int]): counts the tokens of a text,
+            see `tiktoken_counter`.
+        api_base (str): base URL of an OpenAI compatible API; `embeddings`
+            is posted to under it.
+        api_key (Optional[str]): sent as a bearer token if given.
+        max_batch_tokens (int): maximum tokens per request.
+        max_batch_items (int): maximum texts per request.
+        concurrency (int): maximum requests in flight.
+        budget (Optional[RateBudget]): rate limits to stay within; share one
+            between runs against the same API key.
+        retries (int): retries of a failed request or a 429/5xx response.
+        backoff (float): base delay in seconds, doubled on every retry.
+        timeout (float): seconds allowed per request.
+
+    Returns:
+        Tuple[List[Optional[List[float]]], EmbeddingStats]: one embedding per
+            text, None for the texts that could not be embedded, and what the
+            run did.
+    """
+    import aiohttp
+
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be positive, got {concurrency}")
+    start = time.perf_counter()
+    budget = budget or RateBudget()
+    waited = budget.waited
+    token_counts = [count_tokens(text) for text in texts]
+    batches = pack_batches(token_counts, max_batch_tokens, max_batch_items)
+    stats = EmbeddingStats(texts=len(texts), tokens=sum(token_counts), batches=len(batches))
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+    queue: "asyncio.Queue[List[int]]" = asyncio.Queue()
+    for batch in batches:
+        queue.put_nowait(batch)
+    url = api_base.rstrip("/") + "/embeddings"
+    headers = {} if api_key is None else {"Authorization": f"Bearer {api_key}"}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+
+        async def worker() -> None:
+            while True:
+                batch = await queue.get()
+                try:
+                    result = await _embed_batch(
+                        session,
+                        url,
+                        model,
+                        [texts[i] for i in batch],
+                        sum(token_counts[i] for i in batch),
+                        budget,
+                        retries,
+                        backoff,
+                        stats,
+                    )
+                    if result is not None:
+                        for i, embedding in zip(batch, result):
+                            embeddings[i] = embedding
+                    elif len(batch) > 1:
+                        # don't lose the whole batch to one bad text
+                        stats.split += 1
+                        for i in batch:
+                            queue.put_nowait([i])
+                    else:
+                        stats.failed += 1
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        joined = asyncio.ensure_future(queue.join())
+        try:
+            await asyncio.wait([joined, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in workers:
+                if task.done():
+                    # workers only stop on an unexpected error, raise it
+                    task.result()
+        finally:
+            for task in [joined, *workers]:
+                task.cancel()
+            await asyncio.gather(joined, *workers, return_exceptions=True)
+
+    stats.waited = budget.waited - waited
+    stats.seconds = time.perf_counter() - start
+    logger.info(f"Embedded {stats}")
+    return embeddings, stats
+
+
+def embed_texts(
+    texts: Sequence[str], **kwargs: Any
+) -> Tuple[List[Optional[List[float]]], EmbeddingStats]:
+    """Synchronous wrapper around `embed_all`; see it for the arguments."""
+    return asyncio.run(embed_all(texts, **kwargs))
+
+
+class BatchedOpenAIEmbedding(OpenAIEmbedding):
+    """OpenAI embeddings of the queued chunks through `embed_all`.
+
+    Index construction queues every chunk and then asks for all their
+    embeddings at once; they are embedded with concurrent, token-packed
+    requests instead of one batch of `embed_batch_size` after the other.
+    Queries are embedded as by `OpenAIEmbedding`.
+
+    Chunks that still cannot be embedded after their retries are left out,
+    so the index is built without them instead of not at all. Their node
+    ids are logged and kept in `failed_ids` until the next call.
+
+    Args:
+        api_base (Optional[str]): base URL of the API; openai.api_base by
+            default.
+        api_key (Optional[str]): openai.api_key or OPENAI_API_KEY by default.
+        count_tokens (Optional[Callable[[str], int]]): token counter; the
+            model's tiktoken encoding by default.
+        budget (Optional[RateBudget]): rate limits of the API key.
+        embed_kwargs: passed on to `embed_all` (max_batch_tokens,
+            max_batch_items, concurrency, retries, backoff, timeout).
+        kwargs: passed on to `OpenAIEmbedding` (mode, model).
+    """
+
+    def __init__(
+        self,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        budget: Optional[RateBudget] = None,
+        embed_kwargs: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize with parameters."""
+        super().__init__(**kwargs)
+        self.api_base = api_base
+        self.api_key = api_key
+        self.count_tokens = count_tokens
+        self.budget = budget or RateBudget()
+        self.embed_kwargs = embed_kwargs or {}
+        self.last_stats: Optional[EmbeddingStats] = None
+        self.failed_ids: List[str] = []
+
+    def _text_engine(self) -> str:
+        if self.deployment_name is not None:
+            return self.deployment_name
+        key = (self.mode, self.model)
+        if key not in _TEXT_MODE_MODEL_DICT:
+            raise ValueError(f"Invalid mode, model combination: {key}")
+        return _TEXT_MODE_MODEL_DICT[key].value
+
+    def get_queued_text_embeddings(self) -> Tuple[List[str], List[List[float]]]:
+        """Embed the queued texts, see `embed_all`.
+
+        Returns:
+            Tuple[List[str], List[List[float]]]: the ids and embeddings of the
+                texts that were embedded; the others are in `failed_ids`.
+        """
+        import openai
+
+        text_queue, self._text_queue = self._text_queue, []
+        self.failed_ids = []
+        if not text_queue:
+            return [], []
+        engine = self._text_engine()
+        # newlines replaced as by OpenAIEmbedding, so that reused embeddings
+        # of unchanged chunks (see reindex) match
+        embeddings, stats = embed_texts(
+            [text.replace("\n", " ") for _, text in text_queue],
+            model=engine,
+            count_tokens=self.count_tokens or tiktoken_counter(engine),
+            api_base=self.api_base or openai.api_base or DEFAULT_API_BASE,
+            api_key=self.api_key or openai.api_key or os.getenv("OPENAI_API_KEY"),
+            budget=self.budget,
+            **self.embed_kwargs,
+        )
+        self.last_stats = stats
+        self._total_tokens_used += stats.tokens
+        ids, embedded = [], []
+        for (text_id, _), embedding in zip(text_queue, embeddings):
+            if embedding is None:
+                self.failed_ids.append(text_id)
+            else:
+                ids.append(text_id)
+                embedded.append(embedding)
+        if self.failed_ids:
+            logger.error(
+                f"Could not embed {len(self.failed_ids)} of {stats.texts} chunks, "
+                f"left out of the index: {self.failed_ids}"
+            )
+        return ids, embedded
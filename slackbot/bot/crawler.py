@@ -0,0 +1,394 @@
+"""Concurrent page fetching with asyncio and aiohttp.
+
+All requests of a crawl share one connector, so connections are kept alive
+and reused; the connector bounds the total number of open connections and
+the number per host. A fixed pool of worker tasks takes URLs one at a time,
+so only `concurrency` requests are ever in flight. Failed requests and
+429/5xx responses are retried with exponential backoff, waiting at least as
+long as their Retry-After header.
+With an `http_cache.HttpCache`, requests are conditional and unchanged pages
+are served from disk.
+
+`crawl_pages` adds a second, CPU-bound stage: fetched pages go through a
+bounded queue to a process pool that extracts them, so parsing runs on all
+cores and fetching pauses when the pool falls behind. `iter_extract` yields
+the extracted pages as they come, for callers that consume them while the
+crawl goes on.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 8
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+MAX_RETRY_AFTER = 60.0
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one URL."""
+
+    url: str
+    status: Optional[int] = None
+    body: Optional[bytes] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    changed: bool = True
+
+    @property
+    def ok(self) -> bool:
+        # a 304 only carries a body when it was answered from the cache
+        status = self.status or 0
+        return self.body is not None and (200 <= status < 300 or status == 304)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header, in seconds or as an HTTP date.
+
+    Returns:
+        Optional[float]: seconds to wait, capped at MAX_RETRY_AFTER, or None
+            if the header is missing or invalid.
+    """
+    from email.utils import parsedate_to_datetime
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def _session(concurrency: int, per_host: int, timeout: float) -> Any:
+    """Return a ClientSession over a bounded keep-alive connection pool."""
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    # socket timeouts rather than a total one, which would also count the
+    # time a request spends waiting for a connection of the pool
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(
+            total=None, sock_connect=timeout, sock_read=timeout
+        ),
+    )
+
+
+async def _fetch(
+    session: Any,
+    url: str,
+    retries: int,
+    backoff: float,
+    cache: Optional[Any] = None,
+) -> FetchResult:
+    import aiohttp
+
+    start = time.perf_counter()
+    result = FetchResult(url)
+    headers = cache.request_headers(url) if cache is not None else {}
+    for attempt in range(retries + 1):
+        retry_after = None
+        try:
+            response = await session.get(url, headers=headers)
+            try:
+                if response.status == 304 and cache is not None:
+                    result.body = cache.not_modified(url)
+                    if result.body is not None:
+                        result.status, result.error = 304, None
+                        result.changed = False
+                        break
+                    # the cache entry vanished, fetch it unconditionally
+                    response.release()
+                    headers = {}
+                    response = await session.get(url)
+                result.status = response.status
+                if response.status not in RETRY_STATUSES or attempt == retries:
+                    result.body = await response.read()
+                    result.error = None
+                    if cache is not None and response.status == 200:
+                        result.changed = cache.store(
+                            url, response.headers, result.body
+                        )
+                    break
+                result.error = f"HTTP {response.status}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            finally:
+                response.release()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result.error = repr(e)
+        if attempt < retries:
+            # full jitter, so throttled requests don't all come back at once,
+            # but never before the server said so
+            delay = random.uniform(0, backoff * 2**attempt)
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+    if result.error is not None:
+        logger.error(f"Could not fetch {url}: {result.error}")
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def fetch_all(
+    urls: Sequence[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: int = DEFAULT_PER_HOST,
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    cache: Optional[Any] = None,
+) -> List[FetchResult]:
+    """Fetch `urls` concurrently over one keep-alive connection pool.
+
+    `concurrency` worker tasks share the URLs, so a URL's timeout only starts
+    once a worker picks it up, however long the list is.
+
+    Args:
+        urls (Sequence[str]): URLs to fetch.
+        concurrency (int): maximum number of requests in flight and of open
+            connections.
+        per_host (int): maximum number of open connections per host.
+        timeout (float): seconds allowed to connect and between reads of a
+            response. Time spent waiting for a free connection does not count.
+        retries (int): retries after a failed request or a 429/5xx response.
+        backoff (float): base delay in seconds, doubled on every retry.
+        cache (Optional[HttpCache]): revalidate pages against this cache and
+            store the fetched ones in it.
+
+    Returns:
+        List[FetchResult]: one result per URL, in the order of `urls`.
+    """
+    results: List[Optional[FetchResult]] = [None] * len(urls)
+    pending = iter(enumerate(urls))
+
+    async def worker(session: Any) -> None:
+        for i, url in pending:
+            results[i] = await _fetch(session, url, retries, backoff, cache)
+
+    async with _session(concurrency, per_host, timeout) as session:
+        await asyncio.gather(
+            *(worker(session) for _ in range(min(concurrency, len(urls))))
+        )
+    return results  # type: ignore
+
+
+def crawl(urls: Sequence[str], **kwargs: Any) -> List[FetchResult]:
+    """Synchronous wrapper around `fetch_all`; see it for the arguments."""
+    start = time.perf_counter()
+    results = asyncio.run(fetch_all(urls, **kwargs))
+    failed = sum(1 for result in results if not result.ok)
+    unchanged = sum(1 for result in results if result.ok and not result.changed)
+    logger.info(
+        f"Fetched {len(results)} pages ({failed} failed, {unchanged} unchanged) "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return results
+
+
+@dataclass
+class PageRecord:
+    """A fetched page after extraction."""
+
+    url: str
+    page: Any = None
+    error: Optional[str] = None
+    changed: bool = True
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def iter_extract(
+    urls: Sequence[str],
+    extract: Callable[[bytes, str], Any],
+    pool: Optional[Executor] = None,
+    processes: int = 1,
+    queue_size: Optional[int] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: int = DEFAULT_PER_HOST,
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    cache: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+) -> AsyncIterator[Tuple[int, PageRecord]]:
+    """Fetch `urls` concurrently and extract them in `pool` as they arrive.
+
+    `concurrency` fetch tasks put the pages into a queue of `queue_size`
+    pages, from which `processes` tasks hand them to the pool, so at most
+    `processes` pages are being extracted and `queue_size` are waiting.
+    With a `scheduler`, the pages are fetched through it, in `concurrency`
+    threads, within its per-host limits.
+
+    The records are yielded as soon as they are extracted. While the caller
+    holds on to one, the queues fill up and the fetching pauses.
+
+    Args:
+        urls (Sequence[str]): URLs to fetch.
+        extract (Callable[[bytes, str], Any]): picklable function of the page
+            body and URL, run in the pool.
+        pool (Optional[Executor]): pool running `extract`, the event loop's
+            default thread pool if None.
+        processes (int): number of pages extracted at once.
+        queue_size (Optional[int]): fetched pages waiting for extraction,
+            2 * processes by default.
+        concurrency, per_host, timeout, retries, backoff, cache: see
+            `fetch_all`. The scheduler has its own timeout and retries.
+        scheduler (Optional[PoliteScheduler]): fetch through this scheduler
+            rather than with aiohttp.
+
+    Returns:
+        AsyncIterator[Tuple[int, PageRecord]]: the index of the URL in `urls`
+            and its record, in the order the pages are extracted.
+    """
+    loop = asyncio.get_running_loop()
+    pending = iter(enumerate(urls))
+    fetched: asyncio.Queue = asyncio.Queue(maxsize=queue_size or 2 * processes)
+    extracted: asyncio.Queue = asyncio.Queue(maxsize=processes)
+
+    async def fetch_worker(fetch: Callable[[str], Awaitable[FetchResult]]) -> None:
+        for i, url in pending:
+            result = await fetch(url)
+            # blocks while the queue is full, which throttles the fetching
+            await fetched.put((i, result))
+
+    async def fetch_all_workers(fetch: Callable[[str], Awaitable[FetchResult]]) -> None:
+        workers = min(concurrency, len(urls))
+        await asyncio.gather(*(fetch_worker(fetch) for _ in range(workers)))
+
+    async def stop_extract_workers() -> None:
+        for _ in range(processes):
+            await fetched.put(None)
+
+    async def fetch_everything() -> None:
+        try:
+            if scheduler is not None:
+                # the scheduler blocks, and waits for its per-host limits itself
+                with ThreadPoolExecutor(max_workers=concurrency) as threads:
+                    await fetch_all_workers(
+                        lambda url: loop.run_in_executor(
+                            threads, scheduler.fetch, url, cache
+                        )
+                    )
+            else:
+                async with _session(concurrency, per_host, timeout) as session:
+                    await fetch_all_workers(
+                        lambda url: _fetch(session, url, retries, backoff, cache)
+                    )
+        except Exception:
+            # the extract workers would wait for pages forever otherwise
+            await stop_extract_workers()
+            raise
+        await stop_extract_workers()
+
+    async def extract_worker() -> None:
+        while True:
+            item = await fetched.get()
+            if item is None:
+                await extracted.put(None)
+                return
+            i, result = item
+            record = PageRecord(result.url, error=result.error, changed=result.changed)
+            if result.ok:
+                try:
+                    record.page = await loop.run_in_executor(
+                        pool, extract, result.body, result.url
+                    )
+                except Exception as e:
+                    logger.error(f"Could not extract text from {result.url}: {e}")
+                    record.error = repr(e)
+            elif record.error is None:
+                record.error = f"HTTP {result.status}"
+            await extracted.put((i, record))
+
+    tasks = [asyncio.create_task(fetch_everything())]
+    tasks += [asyncio.create_task(extract_worker()) for _ in range(processes)]
+    try:
+        running = processes
+        while running:
+            item = await extracted.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+        # raise what went wrong in the fetching, if anything
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def extract_all(
+    urls: Sequence[str],
+    extract: Callable[[bytes, str], Any],
+    pool: Optional[Executor] = None,
+    processes: int = 1,
+    **kwargs: Any,
+) -> List[PageRecord]:
+    """Fetch `urls` concurrently and extract them in `pool` as they arrive.
+
+    See `iter_extract` for the arguments.
+
+    Returns:
+        List[PageRecord]: one record per URL, in the order of `urls`.
+    """
+    records: List[Optional[PageRecord]] = [None] * len(urls)
+    async for i, record in iter_extract(urls, extract, pool, processes, **kwargs):
+        records[i] = record
+    return records  # type: ignore
+
+
+def crawl_pages(
+    urls: Sequence[str],
+    extract: Callable[[bytes, str], Any],
+    processes: Optional[int] = None,
+    **kwargs: Any,
+) -> List[PageRecord]:
+    """Fetch and extract `urls` with a process pool; see `extract_all`.
+
+    Args:
+        urls (Sequence[str]): URLs to fetch.
+        extract (Callable[[bytes, str], Any]): picklable function of the page
+            body and URL.
+        processes (Optional[int]): size of the process pool, one per CPU by
+            default.
+        kwargs: passed on to `extract_all`.
+
+    Returns:
+        List[PageRecord]: one record per URL, in the order of `urls`.
+    """
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        records = asyncio.run(extract_all(urls, extract, pool, processes, **kwargs))
+    failed = sum(1 for record in records if not record.ok)
+    logger.info(
+        f"Fetched and extracted {len(records)} pages ({failed} failed) with "
+        f"{processes} processes in {time.perf_counter() - start:.2f}s"
+    )
+    return records
@@ -1,12 +1,24 @@
 """Beautiful Soup Web scraper."""
+import gzip
+import inspect
+import io
+import json
 import logging
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin
 
-from gpt_index.readers.base import BaseReader
-from gpt_index.readers.schema.base import Document
+from llama_index.readers.base import BaseReader
+from llama_index.readers.schema.base import Document
 
 logger = logging.getLogger(__name__)
+
+
 def _substack_reader(soup: Any) -> Tuple[str, Dict[str, Any]]:
     """Extract text from Substack blog post."""
     extra_info = {
@@ -18,8 +30,8 @@ def _substack_reader(soup: Any) -> Tuple[str, Dict[str, Any]]:
     return text, extra_info
 
 
-def _readthedocs_reader(soup: Any, url: str) -> Tuple[str, Dict[str, Any]]:
-    """Extract text from a ReadTheDocs documentation site"""
+def _readthedocs_links(soup: Any, url: str) -> List[str]:
+    """Collect the doc page links of a ReadTheDocs site."""
     links = soup.find_all("a", {"class": "reference internal"})
     rtd_links = []
 
@@ -28,62 +40,110 @@ def _readthedocs_reader(soup: Any, url: str) -> Tuple[str, Dict[str, Any]]:
     for i in range(len(rtd_links)):
         if not rtd_links[i].startswith("http"):
             rtd_links[i] = urljoin(url, rtd_links[i])
-    texts = []
-    import requests
-    from bs4 import BeautifulSoup
+    return rtd_links
 
-    for doc_link in rtd_links:
-        page_link = requests.get(doc_link)
-        soup = BeautifulSoup(page_link.text, "html.parser")
-        try:
-            text = soup.find(attrs={"role": "main"}).get_text()
 
-        except IndexError:
-            text = None
-        if text:
-            texts.append("\n".join([t for t in text.split("\n") if t]))
-    return "\n".join(texts), {}
+def _readthedocs_page(soup: Any, doc_link: str, url: str, **kwargs: Any) -> Optional[str]:
+    """Extract the text of a ReadTheDocs page"""
+    try:
+        text = soup.find(attrs={"role": "main"}).get_text()
 
+    except IndexError:
+        text = None
+    if text:
+        return "\n".join([t for t in text.split("\n") if t])
+    return None
 
-def _readmedocs_reader(soup: Any, url: str,include_url_in_text: bool = True) -> Tuple[str, Dict[str, Any]]:
-    """Extract text from a ReadMe documentation site"""
-    import requests
-    import json
-    import logging
+
+def _readthedocs_join(pages: List[Optional[str]]) -> str:
+    return "\n".join(page for page in pages if page)
+
+
+def _readthedocs_reader(
+    soup: Any, url: str, cache: Optional[Any] = None, session: Optional[Any] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """Extract text from a ReadTheDocs documentation site"""
     from bs4 import BeautifulSoup
-    links = soup.find_all("a")
+
+    from http_cache import cached_get
+
+    texts = []
+    for doc_link in _readthedocs_links(soup, url):
+        soup = BeautifulSoup(cached_get(doc_link, cache, session), "html.parser")
+        texts.append(_readthedocs_page(soup, doc_link, url))
+    return _readthedocs_join(texts), {}
+
+
+def _readmedocs_links(soup: Any, url: str) -> List[str]:
+    """Collect the doc page links of a ReadMe site."""
+    links = soup.find_all("a", href=True)
     docs_links = [link["href"] for link in links if "/docs/" in link["href"]]
     docs_links = list(set(docs_links))
     for i in range(len(docs_links)):
         if not docs_links[i].startswith("http"):
             docs_links[i] = urljoin(url, docs_links[i])
-    docs_text = []
-    for i, doc_link in enumerate(docs_links):
+    return docs_links
+
+
+def _readmedocs_page(
+    soup: Any, doc_link: str, url: str, include_url_in_text: bool = True
+) -> Dict[str, Any]:
+    """Extract the title and text of a ReadMe page"""
+    title = soup.title.string.strip() if soup.title else "No title available"
+    text = ""
+    for element in soup.find_all("main", {"class": "layout__main"}):
+        for child in element.descendants:
+            if child.name == "a" and child.has_attr("href"):
+                if include_url_in_text:
+                    url = child.get("href")
+                    if url is not None and "edit" in url:
+                        text += child.text
+                else:
+                    text += f"{child.text} (Reference url: {doc_link}{url}) "
+            elif child.string and child.string.strip():
+                text += child.string.strip() + " "
+    return {'doc_link': doc_link, 'title': title, 'text': text}
+
+
+def _readmedocs_join(pages: List[Optional[Dict[str, Any]]]) -> str:
+    docs_text = [
+        {'id': i+1, **page} for i, page in enumerate(pages) if page is not None
+    ]
+    return f"{docs_text}"
+
+
+def _readmedocs_reader(
+    soup: Any,
+    url: str,
+    include_url_in_text: bool = True,
+    cache: Optional[Any] = None,
+    session: Optional[Any] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Extract text from a ReadMe documentation site"""
+    from bs4 import BeautifulSoup
+
+    from http_cache import cached_get
+
+    pages = []
+    for doc_link in _readmedocs_links(soup, url):
 
         try:
-            page_link = requests.get(doc_link)
-            soup = BeautifulSoup(page_link.text, "html.parser")
-            title = soup.title.string.strip() if soup.title else "No title available"
-            text = ""
-            for element in soup.find_all("main", {"class": "layout__main"}):
-                for child in element.descendants:
-                    if child.name == "a" and child.has_attr("href"):
-                        if include_url_in_text:
-                            url = child.get("href")
-                            if url is not None and "edit" in url:
-                                text += child.text
-                        else:
-                            text += f"{child.text} (Reference url: {doc_link}{url}) "
-                    elif child.string and child.string.strip():
-                        text += child.string.strip() + " "
-            docs_text.append({'id': i+1, 'doc_link': doc_link, 'title': title, 'text': text})
+            soup = BeautifulSoup(cached_get(doc_link, cache, session), "html.parser")
+            pages.append(_readmedocs_page(soup, doc_link, url, include_url_in_text))
         except Exception as e:
             logging.error(f"Could not extract text from {doc_link}: {e}")
+            pages.append(None)
             continue
-    return f"{docs_text}", {}
-    
+    return _readmedocs_join(pages), {}
 
 
+def _call_extractor(extractor: Callable, soup: Any, **kwargs: Any) -> Any:
+    """Call a website extractor with the keyword arguments it accepts."""
+    parameters = inspect.signature(extractor).parameters
+    if not any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        kwargs = {name: value for name, value in kwargs.items() if name in parameters}
+    return extractor(soup, **kwargs)
+
 
 DEFAULT_WEBSITE_EXTRACTOR: Dict[
     str, Callable[[Any, str], Tuple[str, Dict[str, Any]]]
@@ -93,6 +153,232 @@ DEFAULT_WEBSITE_EXTRACTOR: Dict[
     "readme.com": _readmedocs_reader,
 }
 
+# hostname -> (link discovery, page extraction, combination of the pages) for
+# sites whose pages can be fetched concurrently by `BeautifulSoupWebReader`
+DEFAULT_SITE_CRAWLER: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "readthedocs.io": (_readthedocs_links, _readthedocs_page, _readthedocs_join),
+    "readme.com": (_readmedocs_links, _readmedocs_page, _readmedocs_join),
+}
+
+
+@dataclass
+class SitemapEntry:
+    """A page listed in a sitemap."""
+
+    loc: str
+    lastmod: Optional[str] = None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_sitemap(
+    url: str, cache: Optional[Any] = None, session: Optional[Any] = None
+) -> Iterator[SitemapEntry]:
+    """Yield the pages of a sitemap, following sitemap indexes.
+
+    The XML is parsed incrementally and every element is cleared once read,
+    so sitemaps with tens of thousands of URLs stay cheap. Gzipped sitemaps
+    are supported.
+
+    Args:
+        url (str): URL of the sitemap or sitemap index.
+        cache (Optional[HttpCache]): revalidate the sitemaps against this cache.
+        session (Optional[Any]): fetch the sitemaps with this session or
+            scheduler, see `http_cache.cached_get`.
+    """
+    from xml.etree.ElementTree import iterparse
+
+    from http_cache import cached_get
+
+    content = cached_get(url, cache, session)
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+
+    child_sitemaps = []
+    loc, lastmod = None, None
+    for event, element in iterparse(io.BytesIO(content), events=("end",)):
+        name = _local_name(element.tag)
+        if name == "loc":
+            loc = (element.text or "").strip()
+        elif name == "lastmod":
+            lastmod = (element.text or "").strip() or None
+        elif name in ("url", "sitemap"):
+            if loc:
+                if name == "url":
+                    yield SitemapEntry(loc, lastmod)
+                else:
+                    child_sitemaps.append(loc)
+            loc, lastmod = None, None
+            element.clear()
+
+    for child in child_sitemaps:
+        try:
+            yield from iter_sitemap(child, cache, session)
+        except Exception as e:
+            logger.error(f"Could not read sitemap {child}: {e}")
+
+
+def _parse_lastmod(lastmod: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime; dates without a timezone are taken as UTC."""
+    if not lastmod:
+        return None
+    try:
+        parsed = datetime.fromisoformat(lastmod)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class SitemapState:
+    """JSON file of the lastmod of every page seen by the last crawl.
+
+    Args:
+        path (str): path of the JSON state file; created on first save.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize with parameters."""
+        self.path = path
+        self._state: Dict[str, Optional[str]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._state = json.load(f)
+
+    def is_stale(self, entry: SitemapEntry) -> bool:
+        """Whether the page is new or was modified after the last crawl.
+
+        Pages without a usable lastmod are always crawled again.
+        """
+        from http_cache import normalize_url
+
+        key = normalize_url(entry.loc)
+        if key not in self._state:
+            return True
+        new, old = _parse_lastmod(entry.lastmod), _parse_lastmod(self._state[key])
+        if new is None or old is None:
+            return True
+        return new > old
+
+    def set(self, url: str, lastmod: Optional[str]) -> None:
+        """Record a crawled page; call `save` to persist it."""
+        from http_cache import normalize_url
+
+        self._state[normalize_url(url)] = lastmod
+
+    def remove(self, url: str) -> None:
+        """Forget a page that is no longer listed."""
+        from http_cache import normalize_url
+
+        self._state.pop(normalize_url(url), None)
+
+    def urls(self) -> List[str]:
+        """Get the normalized URLs of all known pages."""
+        return list(self._state)
+
+    def save(self) -> None:
+        """Write the state file."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class CrawlPlan:
+    """Pages of a sitemap split by what the next crawl has to do."""
+
+    scheduled: List[SitemapEntry] = field(default_factory=list)
+    unchanged: List[SitemapEntry] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+def plan_sitemap_crawl(
+    sitemap_url: str,
+    state: SitemapState,
+    cache: Optional[Any] = None,
+    session: Optional[Any] = None,
+) -> CrawlPlan:
+    """Compare a sitemap with the last crawl and schedule the stale pages.
+
+    Args:
+        sitemap_url (str): URL of the sitemap or sitemap index.
+        state (SitemapState): lastmods recorded by the previous crawl.
+        cache (Optional[HttpCache]): revalidate the sitemaps against this cache.
+        session (Optional[Any]): fetch the sitemaps with this session or
+            scheduler.
+
+    Returns:
+        CrawlPlan: new or updated pages to crawl, pages to skip, and the
+            normalized URLs of pages no longer listed.
+    """
+    from http_cache import normalize_url
+
+    plan = CrawlPlan()
+    listed = set()
+    for entry in iter_sitemap(sitemap_url, cache, session):
+        key = normalize_url(entry.loc)
+        if key in listed:
+            continue
+        listed.add(key)
+        (plan.scheduled if state.is_stale(entry) else plan.unchanged).append(entry)
+    plan.removed = [url for url in state.urls() if url not in listed]
+    logger.info(
+        f"{sitemap_url}: {len(plan.scheduled)} pages to crawl, "
+        f"{len(plan.unchanged)} unchanged, {len(plan.removed)} removed"
+    )
+    return plan
+
+
+def _parse_page(
+    extract_page: Optional[Callable],
+    from_soup: bool,
+    url: str,
+    include_url_in_text: Optional[bool],
+    body: bytes,
+    doc_link: str,
+) -> Any:
+    """Extract a fetched page; module level so worker processes can run it.
+
+    Args:
+        extract_page (Optional[Callable]): page extractor, the whole page
+            text if None.
+        from_soup (bool): `extract_page` takes a BeautifulSoup object rather
+            than the page bytes.
+        url (str): URL of the site the page belongs to.
+        include_url_in_text (Optional[bool]): passed on to `extract_page`.
+        body (bytes): the page.
+        doc_link (str): URL of the page.
+    """
+    if extract_page is not None and not from_soup:
+        return extract_page(body, doc_link, url, include_url_in_text=include_url_in_text)
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, "html.parser")
+    if extract_page is None:
+        return soup.getText()
+    return extract_page(soup, doc_link, url, include_url_in_text=include_url_in_text)
+
+
+def _page_document(url: str, page: Any, **extra_info: Any) -> Document:
+    """Make the Document of an extracted page, with the page URL as doc_id.
+
+    A page extracted as a dict keeps everything but its text (title,
+    doc_link, source_links) in extra_info.
+    """
+    if isinstance(page, dict):
+        text = page.get("text", "")
+        info = {k: v for k, v in page.items() if k != "text"}
+    else:
+        text, info = page or "", {}
+    info.setdefault("doc_link", url)
+    info.update(URL=url, **extra_info)
+    return Document(text, doc_id=url, extra_info=info)
+
 
 class BeautifulSoupWebReader(BaseReader):
     """BeautifulSoup web page reader.
@@ -104,19 +390,218 @@ class BeautifulSoupWebReader(BaseReader):
         website_extractor (Optional[Dict[str, Callable]]): A mapping of website
             hostname (e.g. google.com) to a function that specifies how to
             extract text from the BeautifulSoup obj. See DEFAULT_WEBSITE_EXTRACTOR.
+        site_crawler (Optional[Dict[str, Tuple[Callable, Callable, Callable]]]):
+            A mapping of website hostname to the functions used to crawl it
+            concurrently. See DEFAULT_SITE_CRAWLER.
+        http_cache (Optional[HttpCache]): revalidate every fetched page against
+            this on-disk cache instead of downloading it again. After
+            `load_data`, `http_cache.changed` holds the pages that changed.
+        html_extractor (Optional[Dict[str, Callable]]): A mapping of website
+            hostname to a function extracting a page from its bytes, used
+            instead of the BeautifulSoup page extractor of `site_crawler`.
+            See html_extract.DEFAULT_HTML_EXTRACTOR.
+        scheduler (Optional[PoliteScheduler]): fetch every page through this
+            per-host rate limited scheduler. Sites in `site_crawler` are then
+            crawled concurrently within its limits, also with `processes`.
     """
 
     def __init__(
         self,
         website_extractor: Optional[Dict[str, Callable]] = None,
-
+        site_crawler: Optional[Dict[str, Tuple[Callable, Callable, Callable]]] = None,
+        http_cache: Optional[Any] = None,
+        html_extractor: Optional[Dict[str, Callable]] = None,
+        scheduler: Optional[Any] = None,
     ) -> None:
         """Initialize with parameters."""
         self.website_extractor = website_extractor or DEFAULT_WEBSITE_EXTRACTOR
- 
+        self.site_crawler = site_crawler or DEFAULT_SITE_CRAWLER
+        self.http_cache = http_cache
+        self.html_extractor = html_extractor or {}
+        self.scheduler = scheduler
+
+    def _fetch(self, links: List[str], **crawl_kwargs: Any) -> List[Any]:
+        """Fetch pages concurrently through the scheduler, or with aiohttp if
+        there is none (`crawl_kwargs` are for `crawler.fetch_all`)."""
+        if self.scheduler is not None:
+            return self.scheduler.fetch_all(links, cache=self.http_cache)
+
+        from crawler import crawl
+
+        return crawl(links, cache=self.http_cache, **crawl_kwargs)
+
+    def _page_extractor(
+        self, hostname: str, url: str, include_url_in_text: Optional[bool]
+    ) -> Callable[[bytes, str], Any]:
+        """Get the extractor of the pages of `hostname`, a function of the page
+        bytes and URL."""
+        if hostname in self.html_extractor:
+            return partial(
+                _parse_page, self.html_extractor[hostname], False, url, include_url_in_text
+            )
+        extract_page = self.site_crawler[hostname][1] if hostname in self.site_crawler else None
+        return partial(_parse_page, extract_page, True, url, include_url_in_text)
+
+    def _fetch_pages(
+        self,
+        links: List[str],
+        hostname: str,
+        url: str,
+        include_url_in_text: Optional[bool],
+        processes: Optional[int] = None,
+        **crawl_kwargs: Any,
+    ) -> List[Any]:
+        """Fetch pages concurrently and extract them.
+
+        Extraction runs in this process, or in a pool of `processes` worker
+        processes fed while the pages are being fetched.
+
+        Returns:
+            List[PageRecord]: one record per link, in order.
+        """
+        from crawler import PageRecord, crawl_pages
+
+        extract = self._page_extractor(hostname, url, include_url_in_text)
+        if processes:
+            return crawl_pages(
+                links,
+                extract,
+                processes=processes,
+                cache=self.http_cache,
+                scheduler=self.scheduler,
+                **crawl_kwargs,
+            )
+
+        records = []
+        for result in self._fetch(links, **crawl_kwargs):
+            record = PageRecord(result.url, error=result.error, changed=result.changed)
+            if result.ok:
+                try:
+                    record.page = extract(result.body, result.url)
+                except Exception as e:
+                    logging.error(f"Could not extract text from {result.url}: {e}")
+                    record.error = repr(e)
+            elif record.error is None:
+                record.error = f"HTTP {result.status}"
+            records.append(record)
+        return records
+
+    def _crawl_site(
+        self,
+        soup: Any,
+        url: str,
+        hostname: str,
+        include_url_in_text: Optional[bool],
+        **crawl_kwargs: Any,
+    ) -> str:
+        """Fetch every page of a site concurrently and extract its text."""
+        find_links, _, join_pages = self.site_crawler[hostname]
+        records = self._fetch_pages(
+            find_links(soup, url), hostname, url, include_url_in_text, **crawl_kwargs
+        )
+        return join_pages([record.page if record.ok else None for record in records])
+
+    def _stream_pages(
+        self,
+        links: List[str],
+        hostname: str,
+        url: str,
+        include_url_in_text: Optional[bool],
+        batch_size: int,
+        processes: Optional[int] = None,
+        **crawl_kwargs: Any,
+    ) -> Iterator[Any]:
+        """Fetch and extract `links` in a background thread, so the next pages
+        are crawled while the caller works on the last ones.
+
+        One event loop, connection pool and, with `processes`, process pool
+        serve the whole site. Once `batch_size` extracted pages are waiting
+        for the caller, the crawl pauses.
+
+        Returns:
+            Iterator[PageRecord]: one record per link, in the order they are
+                extracted.
+        """
+        import asyncio
+        from concurrent.futures import ProcessPoolExecutor
+
+        from crawler import iter_extract
+
+        extract = self._page_extractor(hostname, url, include_url_in_text)
+        records: "queue.Queue[Any]" = queue.Queue(maxsize=batch_size)
+        stop = threading.Event()
+
+        async def crawl(pool: Optional[Any]) -> None:
+            loop = asyncio.get_running_loop()
+            pages = iter_extract(
+                links,
+                extract,
+                pool,
+                processes or 1,
+                cache=self.http_cache,
+                scheduler=self.scheduler,
+                **crawl_kwargs,
+            )
+            try:
+                async for _, record in pages:
+                    if stop.is_set():
+                        break
+                    # wait for room in a thread, so in-flight requests go on
+                    await loop.run_in_executor(None, records.put, record)
+            finally:
+                await pages.aclose()
+
+        def produce() -> None:
+            try:
+                if processes:
+                    with ProcessPoolExecutor(max_workers=processes) as pool:
+                        asyncio.run(crawl(pool))
+                else:
+                    asyncio.run(crawl(None))
+            except Exception as e:
+                records.put(e)
+            finally:
+                records.put(None)
+
+        thread = threading.Thread(target=produce, name=f"crawl {hostname}", daemon=True)
+        thread.start()
+        record: Any = []
+        try:
+            while True:
+                record = records.get()
+                if record is None:
+                    break
+                if isinstance(record, Exception):
+                    raise record
+                yield record
+        finally:
+            # the caller may stop early; let the pages in flight end
+            stop.set()
+            while record is not None:
+                record = records.get()
+            thread.join()
+
+    def _extract_site(
+        self, soup: Any, url: str, hostname: str, include_url_in_text: Optional[bool]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Extract a page with the extractor of its site, one by one."""
+        if hostname not in self.website_extractor:
+            return soup.getText(), {}
+        kwargs: Dict[str, Any] = {
+            "url": url,
+            "include_url_in_text": include_url_in_text,
+        }
+        # only the crawling extractors know about the cache
+        if self.http_cache is not None:
+            kwargs["cache"] = self.http_cache
+        if self.scheduler is not None:
+            kwargs["session"] = self.scheduler
+        return _call_extractor(self.website_extractor[hostname], soup, **kwargs)
 
     def load_data(
-        self, urls: List[str], custom_hostname: Optional[str] = None,include_url_in_text: Optional[bool] = True
+        self, urls: List[str], custom_hostname: Optional[str] = None,include_url_in_text: Optional[bool] = True,
+        concurrency: Optional[int] = None, processes: Optional[int] = None,
+        **crawl_kwargs: Any,
     ) -> List[Document]:
         """Load data from the urls.
 
@@ -124,6 +609,13 @@ class BeautifulSoupWebReader(BaseReader):
             urls (List[str]): List of URLs to scrape.
             custom_hostname (Optional[str]): Force a certain hostname in the case
                 a website is displayed under custom URLs (e.g. Substack blogs)
+            concurrency (Optional[int]): fetch the pages of sites listed in
+                `site_crawler` with up to this many concurrent connections
+                instead of one by one.
+            processes (Optional[int]): with `concurrency`, extract the pages
+                in this many worker processes while they are being fetched.
+            crawl_kwargs: passed on to `crawler.fetch_all` (per_host, timeout,
+                retries, backoff) or `crawler.extract_all` (queue_size).
 
         Returns:
             List[Document]: List of documents.
@@ -131,30 +623,253 @@ class BeautifulSoupWebReader(BaseReader):
         """
         from urllib.parse import urlparse
 
-        import requests
         from bs4 import BeautifulSoup
 
+        from http_cache import cached_get
+
+        if self.http_cache is not None:
+            self.http_cache.reset_report()
+
         documents = []
         for url in urls:
             try:
-                page = requests.get(url)
+                content = cached_get(url, self.http_cache, self.scheduler)
             except Exception:
                 raise ValueError(f"One of the inputs is not a valid url: {url}")
 
             hostname = custom_hostname or urlparse(url).hostname or ""
 
-            soup = BeautifulSoup(page.content, "html.parser")
+            soup = BeautifulSoup(content, "html.parser")
 
             data = ""
             extra_info = {"URL": url}
-            if hostname in self.website_extractor:
-                data, metadata = self.website_extractor[hostname](soup, url,include_url_in_text)
-                print(metadata)
-                extra_info.update(metadata)
-
+            if (concurrency or self.scheduler is not None) and hostname in self.site_crawler:
+                data = self._crawl_site(
+                    soup,
+                    url,
+                    hostname,
+                    include_url_in_text,
+                    concurrency=concurrency,
+                    processes=processes,
+                    **crawl_kwargs,
+                )
             else:
-                data = soup.getText()
+                data, metadata = self._extract_site(soup, url, hostname, include_url_in_text)
+                extra_info.update(metadata)
 
             documents.append(Document(data, extra_info=extra_info))
 
+        if self.http_cache is not None:
+            logger.info(
+                f"{len(self.http_cache.changed)} pages changed, "
+                f"{len(self.http_cache.unchanged)} unchanged since the last crawl"
+            )
         return documents
+
+    def lazy_load_pages(
+        self,
+        urls: List[str],
+        custom_hostname: Optional[str] = None,
+        include_url_in_text: Optional[bool] = True,
+        batch_size: int = 32,
+        concurrency: int = 16,
+        **crawl_kwargs: Any,
+    ) -> Iterator[Document]:
+        """Crawl the sites of `urls` and yield a Document per page as it is
+        extracted.
+
+        Unlike `load_data`, the pages of a site listed in `site_crawler` are
+        not joined into one Document: each gets its own, with the page URL as
+        doc_id and its `title` and `doc_link` in extra_info, so chunks never
+        span two pages. Pages keep being crawled while the caller indexes the
+        ones yielded before. Other sites yield one Document each, as with
+        `load_data`.
+
+        Args:
+            urls (List[str]): List of URLs to scrape.
+            custom_hostname (Optional[str]): Force a certain hostname in the case
+                a website is displayed under custom URLs (e.g. Substack blogs)
+            batch_size (int): extracted pages that may wait for the caller
+                before the crawl pauses.
+            concurrency (int): maximum number of concurrent connections.
+            crawl_kwargs: passed on to `crawler.iter_extract` (processes,
+                queue_size, per_host, timeout, retries, backoff).
+
+        Returns:
+            Iterator[Document]: Document objects, one per page.
+        """
+        from urllib.parse import urlparse
+
+        from bs4 import BeautifulSoup
+
+        from http_cache import cached_get
+
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        for url in urls:
+            try:
+                content = cached_get(url, self.http_cache, self.scheduler)
+            except Exception:
+                raise ValueError(f"One of the inputs is not a valid url: {url}")
+
+            hostname = custom_hostname or urlparse(url).hostname or ""
+            soup = BeautifulSoup(content, "html.parser")
+            if hostname not in self.site_crawler:
+                data, metadata = self._extract_site(soup, url, hostname, include_url_in_text)
+                yield Document(data, extra_info={"URL": url, **metadata})
+                continue
+
+            links = self.site_crawler[hostname][0](soup, url)
+            logger.info(f"{url}: crawling {len(links)} pages")
+            for record in self._stream_pages(
+                links,
+                hostname,
+                url,
+                include_url_in_text,
+                batch_size,
+                concurrency=concurrency,
+                **crawl_kwargs,
+            ):
+                if record.ok:
+                    yield _page_document(record.url, record.page)
+
+    def load_sitemap(
+        self,
+        sitemap_url: str,
+        state: SitemapState,
+        custom_hostname: Optional[str] = None,
+        include_url_in_text: Optional[bool] = True,
+        concurrency: int = 16,
+        processes: Optional[int] = None,
+        commit: bool = True,
+        **crawl_kwargs: Any,
+    ) -> Tuple[List[Document], List[str]]:
+        """Load only the pages of a sitemap that changed since the last call.
+
+        Args:
+            sitemap_url (str): URL of the sitemap or sitemap index.
+            state (SitemapState): lastmods of the last crawl, updated with the
+                pages loaded now.
+            custom_hostname (Optional[str]): hostname whose page extractor in
+                `html_extractor` or `site_crawler` is used; the whole page
+                text otherwise.
+            concurrency (int): maximum number of concurrent connections.
+            processes (Optional[int]): extract the pages in this many worker
+                processes while they are being fetched.
+            commit (bool): save `state`; pass False to save it yourself once
+                the documents are indexed.
+            crawl_kwargs: passed on to `crawler.fetch_all`.
+
+        Returns:
+            Tuple[List[Document], List[str]]: one Document per new or updated
+                page, with the page URL as doc_id, and the URLs of the pages
+                removed from the sitemap.
+        """
+        from urllib.parse import urlparse
+
+        plan = plan_sitemap_crawl(sitemap_url, state, self.http_cache, self.scheduler)
+        hostname = custom_hostname or urlparse(sitemap_url).hostname or ""
+
+        lastmods = {entry.loc: entry.lastmod for entry in plan.scheduled}
+        records = self._fetch_pages(
+            list(lastmods),
+            hostname,
+            sitemap_url,
+            include_url_in_text,
+            processes=processes,
+            concurrency=concurrency,
+            **crawl_kwargs,
+        )
+        documents = []
+        for record in records:
+            if not record.ok:
+                # not recorded, so the page is scheduled again next time
+                continue
+            documents.append(
+                _page_document(record.url, record.page, lastmod=lastmods[record.url])
+            )
+            state.set(record.url, lastmods[record.url])
+
+        for url in plan.removed:
+            state.remove(url)
+        if commit:
+            state.save()
+        return documents, plan.removed
+
+    def _page_links(self, hostname: str, body: bytes, doc_link: str) -> List[str]:
+        """Find the links to follow on a page: the site's doc links for sites
+        in `site_crawler`, every link otherwise."""
+        if hostname in self.site_crawler:
+            from bs4 import BeautifulSoup
+
+            soup = BeautifulSoup(body, "html.parser")
+            return self.site_crawler[hostname][0](soup, doc_link)
+
+        import lxml.html
+
+        document = lxml.html.document_fromstring(body)
+        return [link for _, attribute, link, _ in document.iterlinks() if attribute == "href"]
+
+    def load_frontier(
+        self,
+        urls: List[str],
+        frontier_path: str,
+        custom_hostname: Optional[str] = None,
+        include_url_in_text: Optional[bool] = True,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        batch_size: int = 64,
+        concurrency: int = 16,
+        **crawl_kwargs: Any,
+    ) -> List[Document]:
+        """Crawl sites breadth-first from `urls` through a persistent frontier.
+
+        Links are followed on the hosts of `urls` only. Calling this again
+        with the same `frontier_path` after the process died resumes the
+        crawl; once it is complete, the stored pages are returned without
+        fetching anything. Delete the file to crawl from scratch.
+
+        Args:
+            urls (List[str]): seed URLs.
+            frontier_path (str): SQLite file of the frontier.
+            custom_hostname (Optional[str]): hostname whose link and page
+                extractors are used.
+            max_depth (Optional[int]): maximum number of hops from the seeds.
+            max_pages (Optional[int]): maximum number of URLs crawled.
+            batch_size (int): URLs fetched, then committed, at once.
+            concurrency (int): maximum number of concurrent connections.
+            crawl_kwargs: passed on to `crawler.fetch_all`.
+
+        Returns:
+            List[Document]: one Document per crawled page, with the page URL
+                as doc_id.
+        """
+        from urllib.parse import urlparse
+
+        from frontier import CrawlFrontier, crawl_frontier
+
+        hosts = {urlparse(url).hostname for url in urls}
+        frontier = CrawlFrontier(frontier_path, max_depth=max_depth, max_pages=max_pages)
+        try:
+            frontier.add(urls)
+
+            def fetch(batch: List[str]) -> List[Any]:
+                return self._fetch(batch, concurrency=concurrency, **crawl_kwargs)
+
+            def process(result: Any) -> Tuple[Any, List[str]]:
+                hostname = custom_hostname or urlparse(result.url).hostname or ""
+                extract = self._page_extractor(hostname, result.url, include_url_in_text)
+                links = [
+                    urljoin(result.url, link)
+                    for link in self._page_links(hostname, result.body, result.url)
+                ]
+                return extract(result.body, result.url), [
+                    link for link in links if urlparse(link).hostname in hosts
+                ]
+
+            crawl_frontier(frontier, fetch, process, batch_size)
+            pages = frontier.pages()
+        finally:
+            frontier.close()
+
+        return [_page_document(url, page) for url, page in pages]
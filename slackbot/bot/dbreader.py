@@ -1,17 +1,95 @@
-from typing import Any, List, Optional
+import hashlib
+import json
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from sqlalchemy import create_engine
+from sqlalchemy import column, create_engine, func, select, table, text
 from sqlalchemy.engine import Engine
 
 from llama_index.langchain_helpers.sql_wrapper import SQLDatabase
 from llama_index.readers.base import BaseReader
 from llama_index.readers.schema.base import Document
 
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_POOL_SIZE = 4
+# pages of a table range fetched ahead of the consumer
+RANGE_BUFFER_PAGES = 2
+
+_engines: Dict[Tuple[str, str], Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(url: str, **engine_args: Any) -> Engine:
+    """Return a shared engine for `url`, creating it on first use.
+
+    Readers created for the same database reuse one bounded connection pool
+    instead of opening a new engine each time.
+
+    Args:
+        url (str): database URL.
+        engine_args: passed on to `create_engine`. Unless given, network
+            databases get a pool of DEFAULT_POOL_SIZE connections that are
+            checked before use and recycled hourly.
+
+    Returns:
+        Engine: The shared engine.
+    """
+    if not url.startswith("sqlite"):
+        engine_args.setdefault("pool_size", DEFAULT_POOL_SIZE)
+        engine_args.setdefault("max_overflow", 0)
+        engine_args.setdefault("pool_pre_ping", True)
+        engine_args.setdefault("pool_recycle", 3600)
+    key = (url, repr(sorted(engine_args.items())))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = create_engine(url, **engine_args)
+        return _engines[key]
+
+
+class WatermarkStore:
+    """JSON file of per-query watermarks used by `load_incremental`.
+
+    Each entry holds the highest watermark value seen so far and, when
+    tombstones are detected, the ids present at the last run.
+
+    Args:
+        path (str): path of the JSON state file; created on first save.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize with parameters."""
+        self.path = path
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._state = json.load(f)
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """Get the state of a query, empty if it never ran."""
+        return self._state.get(key, {})
+
+    def set(self, key: str, watermark: Any, ids: Optional[List[str]]) -> None:
+        """Set the state of a query; call `save` to persist it."""
+        self._state[key] = {"watermark": watermark, "ids": ids}
+
+    def save(self) -> None:
+        """Write the state file."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
+
 
 class DatabaseReader(BaseReader):
     """Simple Database reader.
 
-    Concatenates each row into Document used by LlamaIndex.
+    Concatenates each row into Document used by LlamaIndex. With a
+    `text_column`, each row instead becomes a Document whose text is that
+    column and whose extra_info holds the `extra_info_columns`.
 
     Args:
         engine (Optional[Engine]): SQLAlchemy Engine object of the database connection.
@@ -45,34 +123,455 @@ class DatabaseReader(BaseReader):
             self.sql_database = SQLDatabase(engine, *args, **kwargs)
         elif uri is not None:
             self.uri = uri
-            self.sql_database = SQLDatabase.from_uri(uri, *args, **kwargs)
+            engine_args = kwargs.pop("engine_args", None) or {}
+            self.sql_database = SQLDatabase(
+                get_engine(uri, **engine_args), *args, **kwargs
+            )
         elif all(param is not None for param in [host, user, password]):
             url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{dbname}"
-            self.sql_database = SQLDatabase(create_engine(url), *args, **kwargs)
+            engine_args = kwargs.pop("engine_args", None) or {}
+            self.sql_database = SQLDatabase(
+                get_engine(url, **engine_args), *args, **kwargs
+            )
         else:
             raise ValueError(
                 "You must provide either a SQL Alchemy Engine, a valid connection URI, or a valid "
                 "set of credentials."
             )
 
-    def load_data(self, query: str) -> List[Document]:
+    def _row_to_document(
+        self,
+        row: Any,
+        text_column: Optional[str] = None,
+        extra_info_columns: Optional[Sequence[str]] = None,
+        doc_id_column: Optional[str] = None,
+    ) -> Document:
+        """Turn a result row into a Document."""
+        if text_column is None:
+            doc_str = ", ".join([str(entry) for entry in row])
+            return Document(doc_str)
+
+        mapping = row._mapping
+        extra_info: Dict[str, Any] = {
+            column: mapping[column] for column in extra_info_columns or []
+        }
+        doc_id = None if doc_id_column is None else str(mapping[doc_id_column])
+        return Document(
+            str(mapping[text_column] or ""),
+            doc_id=doc_id,
+            extra_info=extra_info or None,
+        )
+
+    def lazy_load_data(
+        self,
+        query: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        text_column: Optional[str] = None,
+        extra_info_columns: Optional[Sequence[str]] = None,
+        doc_id_column: Optional[str] = None,
+    ) -> Iterator[Document]:
+        """Query the Database and yield a Document per row as rows arrive.
+
+        The query runs on a server-side cursor, so only `batch_size` rows are
+        held in memory at a time and consumers can start on the first
+        Documents before the query has finished.
+
+        Args:
+            query (str): Query parameter to filter tables and rows.
+            batch_size (int): number of rows fetched from the cursor at a time.
+            text_column (Optional[str]): column holding the Document text.
+                Without it all columns are joined into the text.
+            extra_info_columns (Optional[Sequence[str]]): columns copied into
+                the Document's extra_info, e.g. ["id", "title", "page_link"].
+            doc_id_column (Optional[str]): column used as the Document id.
+
+        Returns:
+            Iterator[Document]: Document objects, one per row.
+        """
+        if query is None:
+            raise ValueError("A query parameter is necessary to filter the data")
+        with self.sql_database.engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True, max_row_buffer=batch_size
+            ).execute(query)
+            if text_column is not None:
+                columns = [text_column, *(extra_info_columns or [])]
+                if doc_id_column is not None:
+                    columns.append(doc_id_column)
+                missing = set(columns) - set(result.keys())
+                if missing:
+                    raise ValueError(
+                        f"Columns {sorted(missing)} are not in the query result"
+                    )
+            for rows in result.partitions(batch_size):
+                for item in rows:
+                    yield self._row_to_document(
+                        item, text_column, extra_info_columns, doc_id_column
+                    )
+
+    def load_data(self, query: str, **kwargs: Any) -> List[Document]:
         """Query and load data from the Database, returning a list of Documents.
 
         Args:
             query (str): Query parameter to filter tables and rows.
+            kwargs: see `lazy_load_data` (text_column, extra_info_columns,
+                doc_id_column).
 
         Returns:
             List[Document]: A list of Document objects.
         """
+        return list(self.lazy_load_data(query, **kwargs))
+
+    def _key_ranges(
+        self, source: Any, id_column: str, n_ranges: int
+    ) -> List[Tuple[Any, Any]]:
+        """Split the ids of `source` into `n_ranges` (exclusive, inclusive] ranges."""
+        key = column(id_column)
+        with self.sql_database.engine.connect() as connection:
+            low, high = connection.execute(
+                select(func.min(key), func.max(key)).select_from(source)
+            ).one()
+        if low is None:
+            return []
+        if not isinstance(low, int) or not isinstance(high, int):
+            # non-integer keys can't be split arithmetically, page through them
+            # in a single range
+            return [(None, high)]
+        step = max(1, -(-(high - low + 1) // n_ranges))
+        return [
+            (start - 1, min(start + step - 1, high))
+            for start in range(low, high + 1, step)
+        ]
+
+    def _fetch_range(
+        self,
+        source: Any,
+        columns: Sequence[str],
+        id_column: str,
+        key_range: Tuple[Any, Any],
+        page_size: int,
+    ) -> Iterator[List[Any]]:
+        """Yield the rows of one id range a page at a time (keyset pagination)."""
+        after, last = key_range
+        key = column(id_column)
+        with self.sql_database.engine.connect() as connection:
+            while True:
+                query = select(*[column(c) for c in columns]).select_from(source)
+                query = query.where(key <= last)
+                if after is not None:
+                    query = query.where(key > after)
+                page = connection.execute(
+                    query.order_by(key).limit(page_size)
+                ).fetchall()
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    return
+                after = page[-1]._mapping[id_column]
+
+    def _queue_range(
+        self, pages: queue.Queue, stop: threading.Event, *fetch_args: Any
+    ) -> None:
+        """Put the pages of one range on `pages`, followed by None."""
+
+        def put(item: Any) -> bool:
+            # wait for the consumer, unless it stopped reading
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        range_pages = self._fetch_range(*fetch_args)
+        try:
+            for page in range_pages:
+                if not put(page):
+                    return
+        finally:
+            range_pages.close()
+            put(None)
+
+    def _drain_range(
+        self, pages: queue.Queue, future: Future, **kwargs: Any
+    ) -> Iterator[Document]:
+        """Yield the Documents of a range queued by `_queue_range`."""
+        for page in iter(pages.get, None):
+            for row in page:
+                yield self._row_to_document(row, **kwargs)
+        # raise the error that ended the range early, if any
+        future.result()
+
+    def lazy_load_table(
+        self,
+        table_name: str,
+        columns: Sequence[str],
+        id_column: str = "id",
+        page_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = DEFAULT_POOL_SIZE,
+        **kwargs: Any,
+    ) -> Iterator[Document]:
+        """Fetch a whole table in parallel and yield a Document per row.
+
+        The table is split into ranges of `id_column`; each range is paged
+        through with keyset pagination (`WHERE id > last ORDER BY id LIMIT n`)
+        on its own pooled connection. Ranges are fetched concurrently but
+        yielded in id order. A range waits for the consumer once
+        RANGE_BUFFER_PAGES of its pages are waiting, so only about
+        `max_workers * (RANGE_BUFFER_PAGES + 1)` pages are held in memory.
+
+        Args:
+            table_name (str): table to read, optionally schema-qualified
+                (e.g. "files.mdb").
+            columns (Sequence[str]): columns to select; must include
+                `id_column`.
+            id_column (str): unique, indexed column to paginate on.
+            page_size (int): number of rows per page.
+            max_workers (int): number of concurrent connections; keep it
+                within the engine's pool size.
+            kwargs: see `lazy_load_data` (text_column, extra_info_columns,
+                doc_id_column).
+
+        Returns:
+            Iterator[Document]: Document objects, in id order.
+        """
+        if id_column not in columns:
+            raise ValueError(f"columns must include the id column {id_column}")
+        schema, _, name = table_name.rpartition(".")
+        source = table(name, schema=schema or None)
+        ranges = self._key_ranges(source, id_column, max_workers * 4)
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                pending: deque = deque()
+                for key_range in ranges:
+                    pages: queue.Queue = queue.Queue(maxsize=RANGE_BUFFER_PAGES)
+                    future = executor.submit(
+                        self._queue_range,
+                        pages,
+                        stop,
+                        source,
+                        columns,
+                        id_column,
+                        key_range,
+                        page_size,
+                    )
+                    pending.append((pages, future))
+                    if len(pending) >= 2 * max_workers:
+                        yield from self._drain_range(*pending.popleft(), **kwargs)
+                while pending:
+                    yield from self._drain_range(*pending.popleft(), **kwargs)
+            finally:
+                # let the workers finish if the consumer stops early
+                stop.set()
+
+    def load_table(self, table_name: str, **kwargs: Any) -> List[Document]:
+        """Fetch a whole table in parallel, returning a list of Documents.
+
+        Args:
+            table_name (str): table to read.
+            kwargs: see `lazy_load_table`.
+
+        Returns:
+            List[Document]: A list of Document objects, in id order.
+        """
+        return list(self.lazy_load_table(table_name, **kwargs))
+
+    def load_incremental(
+        self,
+        query: str,
+        watermarks: WatermarkStore,
+        watermark_column: str = "id",
+        id_column: Optional[str] = None,
+        key: Optional[str] = None,
+        commit: bool = True,
+        **kwargs: Any,
+    ) -> Tuple[List[Document], List[str]]:
+        """Load only the rows of `query` beyond its last watermark.
+
+        The first run loads every row. Later runs only fetch rows whose
+        `watermark_column` (e.g. an auto-increment id or an `updated_at`
+        timestamp) is greater than the highest value seen before. With an
+        `id_column`, the ids of all rows are also compared with the previous
+        run to report deleted rows.
+
+        The documents are only the delta, not the complete table. Apply them
+        with `reindex.refresh_index_file(path, documents, partial=True,
+        deleted_doc_ids=deleted)`, using the id column as `doc_id_column` so
+        both refer to the same ids. A plain (non-partial) refresh treats its
+        documents as everything the index should hold and would drop every
+        row that did not change.
+
+        Args:
+            query (str): Query selecting the rows, including the watermark
+                and id columns.
+            watermarks (WatermarkStore): where the watermarks are kept.
+            watermark_column (str): column whose values only grow for new or
+                changed rows.
+            id_column (Optional[str]): column identifying a row; enables
+                tombstone detection.
+            key (Optional[str]): name of the query in the store. Defaults to
+                a hash of the query.
+            commit (bool): save the new watermark right away. With False,
+                call `watermarks.save()` once the documents are indexed.
+            kwargs: see `lazy_load_data` (text_column, extra_info_columns,
+                doc_id_column, batch_size).
+
+        Returns:
+            Tuple[List[Document], List[str]]: the new or changed rows and the
+                ids of the rows deleted since the last run.
+        """
+        if query is None:
+            raise ValueError("A query parameter is necessary to filter the data")
+        key = key or hashlib.sha256(query.encode()).hexdigest()
+        state = watermarks.get(key)
+        batch_size = kwargs.pop("batch_size", DEFAULT_BATCH_SIZE)
+        quote = self.sql_database.engine.dialect.identifier_preparer.quote
+        source = f"({query.strip().rstrip(';')}) AS incremental_source"
+
+        where, params = "", {}
+        if state.get("watermark") is not None:
+            where = f" WHERE {quote(watermark_column)} > :watermark"
+            params = {"watermark": state["watermark"]}
+        delta_query = text(
+            f"SELECT * FROM {source}{where} ORDER BY {quote(watermark_column)}"
+        ).bindparams(**params)
         documents = []
+        watermark = state.get("watermark")
         with self.sql_database.engine.connect() as connection:
-            if query is None:
-                raise ValueError("A query parameter is necessary to filter the data")
+            result = connection.execution_options(stream_results=True).execute(
+                delta_query
+            )
+            for rows in result.partitions(batch_size):
+                for row in rows:
+                    documents.append(self._row_to_document(row, **kwargs))
+                    watermark = row._mapping[watermark_column]
+
+            ids = None
+            deleted: List[str] = []
+            if id_column is not None:
+                ids = [
+                    str(row[0])
+                    for row in connection.execute(
+                        text(f"SELECT {quote(id_column)} FROM {source}")
+                    )
+                ]
+                if state.get("ids") is not None:
+                    deleted = sorted(set(state["ids"]) - set(ids))
+
+        if watermark is not None and not isinstance(watermark, (int, float)):
+            # datetimes and decimals are stored as their SQL literal text
+            watermark = str(watermark)
+        watermarks.set(key, watermark, ids)
+        if commit:
+            watermarks.save()
+        return documents, deleted
+
+    def load_dataframe(
+        self,
+        query: str,
+        chunksize: int = DEFAULT_BATCH_SIZE * 10,
+        dtype: Optional[Any] = None,
+    ) -> Iterator[Any]:
+        """Query the Database and yield the result as pandas DataFrames.
+
+        Rows are read from a server-side cursor `chunksize` at a time.
+
+        Args:
+            query (str): Query parameter to filter tables and rows.
+            chunksize (int): number of rows per DataFrame.
+            dtype (Optional[Any]): dtype of every column; `object` keeps the
+                values as the driver returned them. Inferred by default.
+
+        Returns:
+            Iterator[pandas.DataFrame]: columnar batches of the result.
+        """
+        import pandas as pd
+
+        if query is None:
+            raise ValueError("A query parameter is necessary to filter the data")
+        with self.sql_database.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            columns = list(result.keys())
+            # read the DBAPI cursor directly, skipping SQLAlchemy's Row objects
+            cursor = result.cursor
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                if dtype is None:
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+                else:
+                    yield pd.DataFrame(rows, columns=columns, dtype=dtype)
+
+    def lazy_load_data_columnar(
+        self,
+        query: str,
+        chunksize: int = DEFAULT_BATCH_SIZE * 10,
+        text_column: Optional[str] = None,
+        extra_info_columns: Optional[Sequence[str]] = None,
+        doc_id_column: Optional[str] = None,
+    ) -> Iterator[Document]:
+        """Like `lazy_load_data`, but builds Documents from DataFrame batches.
+
+        Text, ids and extra_info are built with pandas operations per batch
+        instead of per-row Document conversion. The columns keep the values
+        the driver returned, so the Documents are the same as `load_data`'s.
+
+        Args:
+            query (str): Query parameter to filter tables and rows.
+            chunksize (int): number of rows per batch.
+            text_column (Optional[str]): column holding the Document text.
+                Without it all columns are joined into the text.
+            extra_info_columns (Optional[Sequence[str]]): columns copied into
+                the Document's extra_info.
+            doc_id_column (Optional[str]): column used as the Document id.
+
+        Returns:
+            Iterator[Document]: Document objects, one per row.
+        """
+        for frame in self.load_dataframe(query, chunksize=chunksize, dtype=object):
+            if text_column is None:
+                columns = [frame[c].astype(str) for c in frame.columns]
+                texts = columns[0]
+                for column_values in columns[1:]:
+                    texts = texts + ", " + column_values
             else:
-                result = connection.execute(query)
+                # like `str(value or "")`
+                values = frame[text_column]
+                texts = values.where(values.astype(bool), "").astype(str)
+            if extra_info_columns:
+                # the object columns already hold the driver's values
+                values = [frame[c].tolist() for c in extra_info_columns]
+                extra_infos = [
+                    dict(zip(extra_info_columns, row)) for row in zip(*values)
+                ]
+            else:
+                extra_infos = [None] * len(frame)
+            if doc_id_column is not None:
+                doc_ids = frame[doc_id_column].astype(str).tolist()
+            else:
+                # random 128-bit ids generated in bulk; uuid4() per row costs
+                # more than building the Document itself
+                random_hex = os.urandom(16 * len(frame)).hex()
+                doc_ids = [
+                    random_hex[i : i + 32] for i in range(0, len(random_hex), 32)
+                ]
+            for doc_text, doc_id, extra_info in zip(
+                texts.tolist(), doc_ids, extra_infos
+            ):
+                yield Document(doc_text, doc_id=doc_id, extra_info=extra_info)
+
+    def load_data_columnar(self, query: str, **kwargs: Any) -> List[Document]:
+        """Query and load data through pandas, returning a list of Documents.
 
-            for item in result.fetchall():
-                # fetch each item
-                doc_str = ", ".join([str(entry) for entry in item])
-                documents.append(Document(doc_str))
-        return documents
+        Args:
+            query (str): Query parameter to filter tables and rows.
+            kwargs: see `lazy_load_data_columnar`.
+
+        Returns:
+            List[Document]: A list of Document objects.
+        """
+        return list(self.lazy_load_data_columnar(query, **kwargs))
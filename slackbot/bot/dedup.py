@@ -0,0 +1,334 @@
+"""Boilerplate and near-duplicate removal for documents before indexing.
+
+Scraped pages repeat themselves: navigation entries show up several times in
+a row, paragraphs are extracted twice, and every page of a site carries the
+same banners. `dedup_documents` runs between a reader and the index:
+
+1. within a page, runs of a repeated phrase of words are collapsed and
+   sentences that already appeared on the page are dropped (unless the
+   documents are data, e.g. database rows);
+2. across pages, the text is cut into blocks, each block is reduced to a
+   MinHash signature of its hashed word shingles, and blocks whose
+   signatures collide in an LSH band and agree on enough of their minhashes
+   are dropped after their first occurrence.
+
+Everything is a single pass over the text, so the cost grows linearly with
+the corpus.
+"""
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_BLOCK_WORDS = 60
+DEFAULT_MAX_PHRASE = 8
+
+# Mersenne prime larger than the 32-bit shingle hashes
+_PRIME = np.uint64((1 << 61) - 1)
+SENTENCE_END = re.compile(r"((?<=[.!?])\s+|\n{2,})")
+CODE_FENCE = re.compile(r"(```.*?```)", re.S)
+TOKEN = re.compile(r"\s*\S+\s*")
+
+
+@dataclass
+class DedupReport:
+    """What `dedup_documents` removed."""
+
+    documents: int = 0
+    repeats_collapsed: int = 0
+    sentences_removed: int = 0
+    blocks_removed: int = 0
+    documents_removed: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def __str__(self) -> str:
+        saved = self.tokens_saved / self.tokens_before if self.tokens_before else 0.0
+        return (
+            f"{self.documents} documents: collapsed {self.repeats_collapsed} "
+            f"repeated phrases, removed {self.sentences_removed} repeated "
+            f"sentences, {self.blocks_removed} near-duplicate blocks and "
+            f"{self.documents_removed} empty documents; {self.tokens_before} -> "
+            f"{self.tokens_after} tokens ({self.tokens_saved} saved, {saved:.1%})"
+        )
+
+
+def collapse_repeats(
+    tokens: List[str], max_phrase: int = DEFAULT_MAX_PHRASE
+) -> Tuple[List[str], int]:
+    """Collapse immediate repetitions of phrases of up to `max_phrase` words.
+
+    "Quickstart Quickstart Quickstart What is MindsDB? What is MindsDB?"
+    becomes "Quickstart What is MindsDB?". Tokens are compared without their
+    surrounding whitespace. Only phrases of words, tokens starting with a
+    letter, are collapsed, like navigation entries: repeated numbers or
+    symbols are usually data ("0 0 0") and are kept.
+
+    Returns:
+        Tuple[List[str], int]: the tokens and the number of repeats removed.
+    """
+    out: List[str] = []
+    keys: List[str] = []
+    removed = 0
+    for token in tokens:
+        out.append(token)
+        keys.append(token.strip())
+        if not keys[-1][:1].isalpha():
+            continue
+        # check whether the tail ends with two copies of the same phrase of
+        # words and drop the second one
+        for n in range(1, min(max_phrase, len(keys) // 2) + 1):
+            if not keys[-n][:1].isalpha():
+                break
+            if keys[-n:] == keys[-2 * n : -n]:
+                # the kept copy takes over the whitespace after the repeat,
+                # which may be a paragraph break
+                trailing = token[len(token.rstrip()) :]
+                del out[-n:], keys[-n:]
+                out[-1] = out[-1].rstrip() + trailing
+                removed += 1
+                break
+    return out, removed
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+def _sentences(text: str) -> List[Tuple[str, str]]:
+    """Split a text into (sentence, following whitespace) pairs."""
+    parts = SENTENCE_END.split(text)
+    return list(zip(parts[0::2], parts[1::2] + [""]))
+
+
+def dedup_sentences(text: str, max_phrase: int = DEFAULT_MAX_PHRASE) -> Tuple[str, int, int]:
+    """Drop repeated phrases and sentences within one text.
+
+    Fenced code blocks are kept verbatim, except for exact repeats.
+
+    Returns:
+        Tuple[str, int, int]: the text, the number of collapsed phrases and
+            the number of removed sentences and code blocks.
+    """
+    seen: Set[bytes] = set()
+    kept: List[str] = []
+    collapsed = removed = 0
+
+    def first_time(key: str) -> bool:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        if digest in seen:
+            return False
+        seen.add(digest)
+        return True
+
+    # the odd parts are the code blocks
+    for i, part in enumerate(CODE_FENCE.split(text)):
+        if i % 2:
+            if first_time(part):
+                kept.append(part + "\n")
+            else:
+                removed += 1
+            continue
+        tokens, repeats = collapse_repeats(TOKEN.findall(part), max_phrase)
+        collapsed += repeats
+        for sentence, separator in _sentences("".join(tokens)):
+            if not sentence.strip():
+                continue
+            if first_time(_normalize(sentence)):
+                kept.append(sentence + separator)
+            else:
+                removed += 1
+    return "".join(kept).strip(), collapsed, removed
+
+
+def split_blocks(text: str, block_words: int = DEFAULT_BLOCK_WORDS) -> List[str]:
+    """Cut a text into blocks of whole sentences of up to about `block_words`
+    words, ending at paragraph breaks.
+
+    The blocks keep the whitespace after their last sentence, so joining them
+    gives back the text.
+    """
+    blocks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for sentence, separator in _sentences(text):
+        current.append(sentence + separator)
+        size += len(sentence.split())
+        if size >= block_words or "\n\n" in separator:
+            blocks.append("".join(current))
+            current, size = [], 0
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+class MinHashLSH:
+    """MinHash signatures of word shingles, indexed by LSH bands.
+
+    Args:
+        num_perm (int): number of hash functions of a signature.
+        bands (int): number of LSH bands; `num_perm` must be a multiple.
+        threshold (float): estimated Jaccard similarity above which a block
+            counts as a duplicate of an earlier one.
+        shingle_size (int): words per shingle.
+        seed (int): seed of the hash functions.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        threshold: float = DEFAULT_THRESHOLD,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        seed: int = 1,
+    ) -> None:
+        """Initialize with parameters."""
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = generator.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Get the MinHash signature of a text, None if it has no words."""
+        words = _normalize(text).split()
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {
+            " ".join(words[i : i + size]) for i in range(len(words) - size + 1)
+        }
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a * x + b) mod p for every hash function and shingle; the operands
+        # stay below 2**63, so uint64 doesn't overflow
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def seen(self, signature: np.ndarray) -> bool:
+        """Whether a near-duplicate of `signature` was added before."""
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in candidates:
+            agreement = np.mean(self._signatures[candidate] == signature)
+            if agreement >= self.threshold:
+                return True
+        return False
+
+    def add(self, signature: np.ndarray) -> None:
+        """Index a signature."""
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+def _default_tokenizer() -> Callable[[str], List]:
+    # the tokenizer the index uses to count tokens and split chunks
+    from llama_index.utils import globals_helper
+
+    return globals_helper.tokenizer
+
+
+def dedup_documents(
+    documents: Sequence[Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    block_words: int = DEFAULT_BLOCK_WORDS,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    tokenizer: Optional[Callable[[str], List]] = None,
+    within_documents: bool = True,
+) -> Tuple[List[Any], DedupReport]:
+    """Remove repeated sentences and near-duplicate blocks from documents.
+
+    Documents are processed in order, so the first occurrence of a block is
+    the one that is kept. Documents left without text are dropped.
+
+    Repeated phrases and sentences within a document are only removed with
+    `within_documents`, which suits scraped pages. Pass False for documents
+    whose text is data, such as `DatabaseReader` rows, so that their text is
+    kept verbatim and only whole near-duplicate blocks are dropped.
+
+    Args:
+        documents (Sequence[Document]): documents from a reader, e.g.
+            `BeautifulSoupWebReader.lazy_load_pages` or `DatabaseReader.load_data`.
+        threshold (float): estimated Jaccard similarity of the shingles above
+            which a block is a near-duplicate.
+        block_words (int): approximate size of the compared blocks in words.
+        shingle_size (int): words per shingle.
+        num_perm (int): MinHash hash functions per block.
+        bands (int): LSH bands.
+        tokenizer (Optional[Callable[[str], List]]): counts the tokens saved,
+            the index's tokenizer by default.
+        within_documents (bool): also collapse repeated phrases and drop
+            repeated sentences within each document.
+
+    Returns:
+        Tuple[List[Document], DedupReport]: new documents, with the same
+            doc_id and extra_info, and what was removed.
+    """
+    tokenizer = tokenizer or _default_tokenizer()
+    lsh = MinHashLSH(num_perm, bands, threshold, shingle_size)
+    report = DedupReport(documents=len(documents))
+    deduped = []
+    for document in documents:
+        text = document.text or ""
+        report.tokens_before += len(tokenizer(text))
+        if within_documents:
+            text, collapsed, removed = dedup_sentences(text)
+            report.repeats_collapsed += collapsed
+            report.sentences_removed += removed
+
+        blocks = []
+        for block in split_blocks(text, block_words):
+            signature = lsh.signature(block)
+            if signature is None:
+                continue
+            if lsh.seen(signature):
+                report.blocks_removed += 1
+                continue
+            lsh.add(signature)
+            blocks.append(block)
+        text = "".join(blocks).strip()
+        if not text:
+            report.documents_removed += 1
+            continue
+        report.tokens_after += len(tokenizer(text))
+        deduped.append(
+            type(document)(text, doc_id=document.doc_id, extra_info=document.extra_info)
+        )
+    logger.info(f"Deduplicated {report}")
+    return deduped, report
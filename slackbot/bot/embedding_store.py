@@ -0,0 +1,449 @@
+"""Memory-mapped binary storage for index embeddings.
+
+Embeddings are kept in a `.npy` file holding one contiguous float32 matrix
+(one row per node) and a small JSON sidecar with the node ids and their
+reference doc ids. Opening the matrix with `mmap_mode="r"` is O(1) and lets
+every worker process share the same page-cache copy of the vectors.
+
+Each save writes the matrix to a new generation file
+(`<name>.<generation>.npy`) and then replaces the sidecar, which names it.
+The sidecar replace is the only step that changes what readers see, so a
+crash never leaves a matrix paired with the wrong sidecar.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.constants import DATA_KEY, TYPE_KEY
+from llama_index.indices.vector_store.base import VECTOR_STORE_KEY
+from llama_index.vector_stores.registry import (
+    VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE,
+    VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS,
+)
+from llama_index.vector_stores.types import (
+    NodeEmbeddingResult,
+    VectorStoreQueryResult,
+)
+
+from ann_index import DEFAULT_NPROBE, IVFIndex
+from vector_search import VectorSearchEngine, doc_rows
+
+logger = logging.getLogger(__name__)
+
+MMAP_VECTOR_STORE_TYPE = "mmap"
+FORMAT_VERSION = 2
+# version 1 sidecars sit next to a single `.npy` file without a generation
+SUPPORTED_VERSIONS = (1, FORMAT_VERSION)
+
+
+def sidecar_path(vectors_path: str) -> str:
+    """Return the path of the sidecar belonging to a `.npy` vectors file."""
+    return os.path.splitext(vectors_path)[0] + ".json"
+
+
+def generation_path(vectors_path: str, generation: int) -> str:
+    """Return the path of one generation of a `.npy` vectors file."""
+    return os.path.splitext(vectors_path)[0] + f".{generation}.npy"
+
+
+def relative_vectors_path(vectors_path: str, index_path: str) -> str:
+    """Return `vectors_path` relative to the directory of `index_path`.
+
+    Index files store it this way so the index and its vectors can be moved
+    or mounted elsewhere together.
+    """
+    return os.path.relpath(
+        os.path.abspath(vectors_path), os.path.dirname(os.path.abspath(index_path))
+    )
+
+
+def resolve_vectors_path(path: str, index_path: str) -> str:
+    """Resolve a vectors path stored in `index_path` (absolute paths are kept)."""
+    return os.path.join(os.path.dirname(os.path.abspath(index_path)), path)
+
+
+def _remove_stale_generations(vectors_path: str, keep: str) -> None:
+    directory = os.path.dirname(os.path.abspath(vectors_path))
+    stem = os.path.basename(os.path.splitext(vectors_path)[0])
+    pattern = re.compile(re.escape(stem) + r"\.\d+\.npy")
+    stale = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if pattern.fullmatch(name) and name != os.path.basename(keep)
+    ]
+    if os.path.exists(vectors_path):
+        # the single file of a version 1 store
+        stale.append(vectors_path)
+    for path in stale:
+        try:
+            # processes that still map it keep their pages until they reopen
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def remove_embeddings(vectors_path: str) -> None:
+    """Remove every generation of a vectors file and its sidecar.
+
+    Processes that still map a generation keep reading it until they reopen.
+    """
+    _remove_stale_generations(vectors_path, keep="")
+    try:
+        os.remove(sidecar_path(vectors_path))
+    except OSError:
+        pass
+
+
+def save_embeddings(
+    vectors_path: str,
+    ids: List[str],
+    embeddings: Any,
+    text_id_to_doc_id: Dict[str, str],
+) -> None:
+    """Write embeddings and their sidecar to disk.
+
+    The matrix goes to a new generation file and the sidecar naming it is
+    then moved into place in one `os.replace`. Older generations are removed
+    afterwards; processes that still map one keep a valid file.
+
+    Args:
+        vectors_path (str): path of the vectors file; generations are written
+            next to it as `<name>.<generation>.npy`.
+        ids (List[str]): node id of each row.
+        embeddings (Any): matrix (or list of lists) of shape (len(ids), dim).
+        text_id_to_doc_id (Dict[str, str]): node id to reference doc id.
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        matrix = matrix.reshape(len(ids), -1)
+
+    generation = time.time_ns()
+    data_path = generation_path(vectors_path, generation)
+    sidecar = {
+        "version": FORMAT_VERSION,
+        "generation": generation,
+        "file": os.path.basename(data_path),
+        "dtype": "float32",
+        "dim": int(matrix.shape[1]),
+        "ids": list(ids),
+        "text_id_to_doc_id": {i: text_id_to_doc_id[i] for i in ids},
+    }
+    tmp_vectors = data_path + ".tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_vectors, data_path)
+    tmp_sidecar = sidecar_path(vectors_path) + ".tmp"
+    with open(tmp_sidecar, "w") as f:
+        json.dump(sidecar, f)
+    os.replace(tmp_sidecar, sidecar_path(vectors_path))
+    _remove_stale_generations(vectors_path, keep=data_path)
+
+
+def open_embeddings(
+    vectors_path: str,
+) -> Tuple[np.ndarray, List[str], Dict[str, str], Optional[int]]:
+    """Open embeddings written by `save_embeddings`.
+
+    Returns:
+        Tuple: the read-only memory-mapped matrix, the node ids of its rows,
+            the node id to reference doc id mapping and the generation of the
+            matrix (None for version 1 stores).
+    """
+    for attempt in range(3):
+        with open(sidecar_path(vectors_path), "r") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported embedding store version in {vectors_path}")
+        data_path = vectors_path
+        if "file" in sidecar:
+            data_path = os.path.join(os.path.dirname(vectors_path), sidecar["file"])
+
+        ids = sidecar["ids"]
+        try:
+            if ids:
+                matrix = np.load(data_path, mmap_mode="r")
+            else:
+                # numpy cannot map a zero-length file
+                matrix = np.load(data_path)
+            break
+        except FileNotFoundError:
+            # a newer generation replaced it after we read the sidecar
+            if attempt == 2:
+                raise
+    if matrix.shape != (len(ids), sidecar["dim"]):
+        raise ValueError(f"Embedding matrix {data_path} does not match its sidecar")
+    return matrix, ids, sidecar["text_id_to_doc_id"], sidecar.get("generation")
+
+
+class MmapVectorStore:
+    """Vector store backed by a memory-mapped `.npy` embedding matrix.
+
+    Nodes added after loading are kept in memory and deleted nodes are masked
+    out until the index is saved again, at which point the matrix is rewritten.
+
+    Args:
+        path (str): path of the `.npy` vectors file, as stored in the index.
+        root (Optional[str]): directory a relative `path` is resolved against,
+            normally the directory of the index file. Defaults to the
+            working directory.
+        similarity_cutoff (Optional[float]): drop results scoring at or below
+            this similarity before they reach the docstore.
+        ann (Optional[IVFIndex]): approximate index to search with.
+        nprobe (int): number of IVF lists searched per query.
+    """
+
+    stores_text: bool = False
+    is_embedding_query: bool = True
+
+    def __init__(
+        self,
+        path: str,
+        root: Optional[str] = None,
+        similarity_cutoff: Optional[float] = None,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize params."""
+        self.path = path
+        self.vectors_path = os.path.join(root, path) if root else path
+        self.similarity_cutoff = similarity_cutoff
+        self.ann = ann
+        self.nprobe = nprobe
+        self._engine: Optional[VectorSearchEngine] = None
+        self._added: Dict[str, List[float]] = {}
+        self._added_doc_ids: Dict[str, str] = {}
+        self._deleted: set = set()
+        self._generation: Optional[int] = None
+        if os.path.exists(sidecar_path(self.vectors_path)):
+            self._open()
+        else:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._ids: List[str] = []
+            self._text_id_to_doc_id: Dict[str, str] = {}
+            self._row: Dict[str, int] = {}
+
+    def _open(self) -> None:
+        self._engine = None
+        (
+            self._matrix,
+            self._ids,
+            self._text_id_to_doc_id,
+            self._generation,
+        ) = open_embeddings(self.vectors_path)
+        self._row = {text_id: i for i, text_id in enumerate(self._ids)}
+
+    @classmethod
+    def from_dict(cls, config_dict: Dict[str, Any]) -> "MmapVectorStore":
+        """Load the store an index file refers to.
+
+        Unlike a new store, the vectors must exist: a relative path that does
+        not resolve (e.g. `load_from_disk` run from another directory than
+        the index) would otherwise load as an empty index.
+        """
+        store = cls(**config_dict)
+        if not os.path.exists(sidecar_path(store.vectors_path)):
+            raise FileNotFoundError(
+                f"No vectors at {store.vectors_path}; relative paths are stored "
+                "relative to the index file, load it with vector_search.load_index"
+            )
+        return store
+
+    @property
+    def client(self) -> None:
+        """Get client."""
+        return None
+
+    @property
+    def config_dict(self) -> dict:
+        """Get config dict.
+
+        Pending additions and deletions are written to disk first, so saving
+        the index always leaves a matching vectors file next to it.
+        """
+        if (
+            self._added
+            or self._deleted
+            or not os.path.exists(sidecar_path(self.vectors_path))
+        ):
+            self.persist()
+        return {"path": self.path}
+
+    def get(self, text_id: str) -> List[float]:
+        """Get embedding."""
+        if text_id in self._added:
+            return self._added[text_id]
+        if text_id in self._deleted or text_id not in self._row:
+            raise KeyError(text_id)
+        return self._matrix[self._row[text_id]].tolist()
+
+    def add(
+        self,
+        embedding_results: List[NodeEmbeddingResult],
+    ) -> List[str]:
+        """Add embedding_results to index."""
+        self._engine = None
+        for result in embedding_results:
+            self._added[result.id] = result.embedding
+            self._added_doc_ids[result.id] = result.doc_id
+            self._deleted.discard(result.id)
+        return [result.id for result in embedding_results]
+
+    def delete(self, doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete a document."""
+        self._engine = None
+        for text_id, doc_id_ in self._text_id_to_doc_id.items():
+            if doc_id == doc_id_:
+                self._deleted.add(text_id)
+        for text_id, doc_id_ in list(self._added_doc_ids.items()):
+            if doc_id == doc_id_:
+                del self._added[text_id]
+                del self._added_doc_ids[text_id]
+
+    def _live(self) -> Tuple[List[str], np.ndarray, Dict[str, str]]:
+        """Return ids, embeddings and doc ids with pending changes applied."""
+        keep = [
+            i
+            for i, text_id in enumerate(self._ids)
+            if text_id not in self._deleted and text_id not in self._added
+        ]
+        ids = [self._ids[i] for i in keep]
+        matrix = np.asarray(self._matrix[keep], dtype=np.float32)
+        text_id_to_doc_id = {i: self._text_id_to_doc_id[i] for i in ids}
+        if self._added:
+            added = np.asarray(list(self._added.values()), dtype=np.float32)
+            matrix = np.vstack([matrix, added]) if ids else added
+            ids.extend(self._added)
+            text_id_to_doc_id.update(self._added_doc_ids)
+        return ids, matrix, text_id_to_doc_id
+
+    def persist(self) -> None:
+        """Write the current embeddings to `path` and map the new file."""
+        ids, matrix, text_id_to_doc_id = self._live()
+        save_embeddings(self.vectors_path, ids, matrix, text_id_to_doc_id)
+        self._added, self._added_doc_ids, self._deleted = {}, {}, set()
+        self._open()
+
+    @property
+    def engine(self) -> VectorSearchEngine:
+        """Get the search engine over the live embeddings, building it if needed."""
+        if self._engine is None:
+            if not self._added and not self._deleted:
+                # search the shared memory map directly, without a private copy
+                self._engine = VectorSearchEngine(
+                    self._matrix,
+                    self._ids,
+                    copy=False,
+                    ann=self.ann,
+                    nprobe=self.nprobe,
+                )
+            else:
+                # the IVF index no longer matches, fall back to exact search
+                ids, matrix, _ = self._live()
+                self._engine = VectorSearchEngine(matrix, ids)
+        return self._engine
+
+    def query(
+        self,
+        query_embedding: List[float],
+        similarity_top_k: int,
+        doc_ids: Optional[List[str]] = None,
+        query_str: Optional[str] = None,
+    ) -> VectorStoreQueryResult:
+        """Get nodes for response.
+
+        With `doc_ids` only the nodes of those documents are searched, exactly.
+        """
+        if doc_ids is not None:
+            if self._added or self._deleted:
+                ids, matrix, text_id_to_doc_id = self._live()
+            else:
+                ids, matrix = self._ids, self._matrix
+                text_id_to_doc_id = self._text_id_to_doc_id
+            rows = doc_rows(ids, text_id_to_doc_id, doc_ids)
+            similarities, ids = VectorSearchEngine(
+                matrix[rows], [ids[i] for i in rows]
+            ).search(query_embedding, similarity_top_k, self.similarity_cutoff)
+            return VectorStoreQueryResult(similarities=similarities, ids=ids)
+        return self.query_batch([query_embedding], similarity_top_k)[0]
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        similarity_top_k: int,
+    ) -> List[VectorStoreQueryResult]:
+        """Get nodes for several query embeddings at once."""
+        return [
+            VectorStoreQueryResult(similarities=similarities, ids=ids)
+            for similarities, ids in self.engine.search_batch(
+                query_embeddings, similarity_top_k, self.similarity_cutoff
+            )
+        ]
+
+
+VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS[MMAP_VECTOR_STORE_TYPE] = MmapVectorStore
+VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE[MmapVectorStore] = MMAP_VECTOR_STORE_TYPE
+
+
+def convert_index_file(
+    index_path: str,
+    output_path: Optional[str] = None,
+    vectors_path: Optional[str] = None,
+) -> str:
+    """Move the embeddings of a `save_to_disk` JSON file into an `.npy` store.
+
+    The `vector_store` section of the JSON is replaced by a reference to the
+    vectors file relative to the index, which `vector_search.load_index`
+    resolves against the directory of the index file.
+
+    Args:
+        index_path (str): path of the JSON written by `save_to_disk`.
+        output_path (Optional[str]): where to write the converted JSON.
+            Defaults to overwriting `index_path`.
+        vectors_path (Optional[str]): where to write the embeddings.
+            Defaults to `<index name>.vectors.npy` next to the index. The
+            index refers to it by a path relative to its own directory.
+
+    Returns:
+        str: The path of the vectors file.
+    """
+    output_path = output_path or index_path
+    vectors_path = vectors_path or os.path.splitext(output_path)[0] + ".vectors.npy"
+    with open(index_path, "r") as f:
+        result_dict = json.load(f)
+
+    vector_store = result_dict[VECTOR_STORE_KEY]
+    if vector_store[TYPE_KEY] == MMAP_VECTOR_STORE_TYPE:
+        raise ValueError(f"{index_path} already uses a memory-mapped vector store")
+    if vector_store[TYPE_KEY] != "simple":
+        raise ValueError(f"Cannot convert a {vector_store[TYPE_KEY]} vector store")
+
+    data = vector_store[DATA_KEY]["simple_vector_store_data_dict"]
+    ids = list(data["embedding_dict"])
+    save_embeddings(
+        vectors_path,
+        ids,
+        [data["embedding_dict"][i] for i in ids],
+        data["text_id_to_doc_id"],
+    )
+
+    result_dict[VECTOR_STORE_KEY] = {
+        TYPE_KEY: MMAP_VECTOR_STORE_TYPE,
+        DATA_KEY: {"path": relative_vectors_path(vectors_path, output_path)},
+    }
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result_dict, f)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote {len(ids)} embeddings from {index_path} to {vectors_path}")
+    return vectors_path
+
+
+if __name__ == "__main__":
+    # python embedding_store.py mdb.json [converted.json]
+    convert_index_file(*sys.argv[1:3])
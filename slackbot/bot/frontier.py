@@ -0,0 +1,224 @@
+"""Persistent, resumable crawl frontier backed by SQLite.
+
+Every URL the crawl discovers is stored once, normalized, with its depth and
+status (pending, in progress, done or failed), the HTTP status and the
+extracted page. Pages are handed out breadth-first. If the process dies, the
+URLs that were in progress go back to pending when the frontier is opened
+again, and the crawl carries on from there instead of starting over.
+"""
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from http_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    depth INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    parent TEXT,
+    http_status INTEGER,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    page TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS frontier_queue ON frontier (status, depth, id);
+"""
+
+
+def canonicalize(href: str, base_url: str) -> Optional[str]:
+    """Resolve a link against the page it is on and normalize it.
+
+    Returns:
+        Optional[str]: the absolute URL, or None if it isn't http(s).
+    """
+    url = urljoin(base_url, href.strip())
+    if urlsplit(url).scheme not in ("http", "https"):
+        return None
+    return normalize_url(url)
+
+
+class CrawlFrontier:
+    """Queue of the URLs of a crawl, stored in a SQLite file.
+
+    Args:
+        path (str): path of the SQLite file; created if needed.
+        max_depth (Optional[int]): don't queue links more than this many
+            hops from the seeds.
+        max_pages (Optional[int]): don't queue more than this many URLs.
+        max_attempts (int): how often a failed URL is retried on resume.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        max_attempts: int = 3,
+    ) -> None:
+        """Initialize with parameters."""
+        self.path = path
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_attempts = max_attempts
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        # URLs claimed by a crawl that died, and failures worth retrying
+        resumed = self._connection.execute(
+            "UPDATE frontier SET status = ? WHERE status = ? "
+            "OR (status = ? AND attempts < ?)",
+            (PENDING, IN_PROGRESS, FAILED, max_attempts),
+        ).rowcount
+        self._connection.commit()
+        self._count = self._connection.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+        if resumed:
+            logger.info(f"Resuming {path}: {resumed} URLs back in the queue")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(
+        self, urls: Iterable[str], depth: int = 0, parent: Optional[str] = None
+    ) -> int:
+        """Queue URLs that were not seen before.
+
+        Args:
+            urls (Iterable[str]): absolute or, with `parent`, relative URLs.
+            depth (int): hops from the seeds.
+            parent (Optional[str]): page the links were found on.
+
+        Returns:
+            int: the number of new URLs.
+        """
+        if self.max_depth is not None and depth > self.max_depth:
+            return 0
+        added = 0
+        with self._connection:
+            for url in urls:
+                if self.max_pages is not None and self._count >= self.max_pages:
+                    break
+                url = canonicalize(url, parent or url)
+                if url is None:
+                    continue
+                inserted = self._connection.execute(
+                    "INSERT OR IGNORE INTO frontier (url, depth, status, parent, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (url, depth, PENDING, parent, time.time()),
+                ).rowcount
+                added += inserted
+                self._count += inserted
+        return added
+
+    def claim(self, limit: int) -> List[Tuple[str, int]]:
+        """Take the next pending URLs, shallowest first, and mark them in progress.
+
+        Returns:
+            List[Tuple[str, int]]: the URLs and their depths.
+        """
+        with self._connection:
+            rows = self._connection.execute(
+                "SELECT id, url, depth FROM frontier WHERE status = ? "
+                "ORDER BY depth, id LIMIT ?",
+                (PENDING, limit),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE frontier SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                [(IN_PROGRESS, time.time(), row[0]) for row in rows],
+            )
+        return [(url, depth) for _, url, depth in rows]
+
+    def done(self, url: str, http_status: Optional[int], page: Any = None) -> None:
+        """Record a crawled URL and its extracted page (JSON serializable)."""
+        self._set(url, DONE, http_status, None, json.dumps(page))
+
+    def failed(self, url: str, http_status: Optional[int], error: Optional[str]) -> None:
+        """Record a URL that could not be crawled."""
+        self._set(url, FAILED, http_status, error, None)
+
+    def _set(
+        self,
+        url: str,
+        status: str,
+        http_status: Optional[int],
+        error: Optional[str],
+        page: Optional[str],
+    ) -> None:
+        with self._connection:
+            self._connection.execute(
+                "UPDATE frontier SET status = ?, http_status = ?, error = ?, page = ?, "
+                "updated_at = ? WHERE url = ?",
+                (status, http_status, error, page, time.time(), normalize_url(url)),
+            )
+
+    def pages(self) -> List[Tuple[str, Any]]:
+        """Get the crawled URLs and their pages, in crawl order."""
+        rows = self._connection.execute(
+            "SELECT url, page FROM frontier WHERE status = ? ORDER BY depth, id", (DONE,)
+        )
+        return [(url, json.loads(page)) for url, page in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Count the URLs per status."""
+        rows = self._connection.execute(
+            "SELECT status, COUNT(*) FROM frontier GROUP BY status"
+        )
+        return dict(rows.fetchall())
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def crawl_frontier(
+    frontier: CrawlFrontier,
+    fetch: Callable[[List[str]], List[Any]],
+    process: Callable[[Any], Tuple[Any, List[str]]],
+    batch_size: int = 64,
+) -> None:
+    """Crawl breadth-first until the frontier is empty.
+
+    Each batch is fetched together and its results are committed before the
+    next batch is claimed, so an interrupted crawl loses at most one batch.
+
+    Args:
+        frontier (CrawlFrontier): the queue, seeded with `add`.
+        fetch (Callable[[List[str]], List[FetchResult]]): fetches a batch of
+            URLs, e.g. `crawler.crawl`.
+        process (Callable[[FetchResult], Tuple[Any, List[str]]]): extracts
+            the page and the links to follow from a successful fetch.
+        batch_size (int): URLs fetched at once.
+    """
+    start = time.perf_counter()
+    while True:
+        batch = frontier.claim(batch_size)
+        if not batch:
+            break
+        depths = dict(batch)
+        for result in fetch(list(depths)):
+            if not result.ok:
+                frontier.failed(result.url, result.status, result.error)
+                continue
+            try:
+                page, links = process(result)
+            except Exception as e:
+                logger.error(f"Could not extract text from {result.url}: {e}")
+                frontier.failed(result.url, result.status, repr(e))
+                continue
+            frontier.add(links, depths[result.url] + 1, parent=result.url)
+            frontier.done(result.url, result.status, page)
+    logger.info(
+        f"Crawled {frontier.path} in {time.perf_counter() - start:.2f}s: {frontier.stats()}"
+    )
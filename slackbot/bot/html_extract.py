@@ -0,0 +1,198 @@
+"""Fast page text extraction with lxml.
+
+The BeautifulSoup extractors in `custom_reader` build a soup of the whole
+page and walk every descendant. `HtmlExtractor` parses the page with lxml,
+keeps only its content container and collects the text fragments in a list,
+dropping repeated long fragments with a set and keeping code blocks as fenced
+markdown. Extractors are plain, picklable objects taking the page bytes, so
+they can also run in worker processes.
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def _has_classes(*classes: str) -> str:
+    return " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+        for name in classes
+    )
+
+
+# XPath of the content container of the sites we crawl
+README_MAIN = f"//main[{_has_classes('layout__main')}]"
+READTHEDOCS_MAIN = "//*[@role='main']"
+MINDSDB_MAIN = f"//div[{_has_classes('flex', 'flex-row', 'pt-9', 'gap-12', 'items-stretch')}]"
+
+SKIPPED_TAGS = frozenset(["script", "style", "noscript", "template", "svg"])
+CODE_BLOCK_CLASSES = frozenset(["gray-frame"])
+LANGUAGE_CLASS = re.compile(r"^(?:lang(?:uage)?-)?([\w+#-]+)$")
+WHITESPACE = re.compile(r"\s+")
+# repeated fragments this long (navigation, banners) are dropped; shorter ones,
+# like table cells, are kept every time
+DEFAULT_MIN_REPEAT_LENGTH = 40
+
+
+def _code_language(element: Any) -> str:
+    for node in [element, *element.iterdescendants("code")]:
+        for name in (node.get("class") or "").split():
+            match = LANGUAGE_CLASS.match(name)
+            if match and name not in CODE_BLOCK_CLASSES:
+                return match.group(1)
+    return ""
+
+
+def _is_code_block(element: Any) -> bool:
+    if element.tag == "pre":
+        return True
+    classes = set((element.get("class") or "").split())
+    return bool(classes & CODE_BLOCK_CLASSES) and element.find(".//code") is not None
+
+
+class HtmlExtractor:
+    """Extract the title and the text of a page's content container.
+
+    Args:
+        container (str): XPath of the content container; every match is
+            extracted, the whole body if there is none.
+        references (bool): append `(Reference url: ...)` to the text of
+            relative and anchor links and list them under `source_links`,
+            like the MindsDB scraper does.
+        strings (bool): return the text only, instead of a dict with the
+            doc_link and title, like the ReadTheDocs extractor does.
+        min_repeat_length (int): fragments at least this long are kept only
+            the first time they appear on a page.
+    """
+
+    def __init__(
+        self,
+        container: str,
+        references: bool = False,
+        strings: bool = False,
+        min_repeat_length: int = DEFAULT_MIN_REPEAT_LENGTH,
+    ) -> None:
+        """Initialize with parameters."""
+        self.container = container
+        self.references = references
+        self.strings = strings
+        self.min_repeat_length = min_repeat_length
+
+    def fragments(
+        self, root: Any, doc_link: str = "", source_links: Optional[List[str]] = None
+    ) -> List[str]:
+        """Collect the text fragments under `root`, long ones only once.
+
+        Args:
+            root (HtmlElement): element to extract.
+            doc_link (str): URL of the page, prefixed to referenced links.
+            source_links (Optional[List[str]]): list the referenced links
+                are appended to.
+
+        Returns:
+            List[str]: the fragments in document order.
+        """
+        fragments: List[str] = []
+        seen: Set[str] = set()
+
+        def append(fragment: str) -> None:
+            if len(fragment) >= self.min_repeat_length:
+                if fragment in seen:
+                    return
+                seen.add(fragment)
+            fragments.append(fragment)
+
+        def add(text: Optional[str]) -> None:
+            if not text:
+                return
+            text = WHITESPACE.sub(" ", text).strip()
+            if text:
+                append(text)
+
+        # iterative walk, the element is revisited once its children are done
+        # to pick up its tail
+        stack = [(root, False)]
+        while stack:
+            element, done = stack.pop()
+            if done:
+                if element is not root:
+                    add(element.tail)
+                continue
+            stack.append((element, True))
+            tag = element.tag if isinstance(element.tag, str) else None
+            if tag is None or tag in SKIPPED_TAGS:
+                continue
+            if _is_code_block(element):
+                code = element.text_content().strip("\n")
+                if code.strip():
+                    append(f"```{_code_language(element)}\n{code}\n```")
+                continue
+            if tag == "a":
+                href = element.get("href") or ""
+                text = element.text_content()
+                if self.references and (href.startswith("/") or "#" in href):
+                    add(f"{text.strip()} (Reference url: {doc_link}{href})")
+                    if source_links is not None:
+                        source_links.append(href)
+                else:
+                    add(text)
+                continue
+            add(element.text)
+            stack.extend((child, False) for child in reversed(element))
+        return fragments
+
+    def __call__(
+        self,
+        html: bytes,
+        doc_link: str = "",
+        url: str = "",
+        include_url_in_text: Optional[bool] = True,
+    ) -> Any:
+        """Extract a page, with the signature of the `custom_reader` page extractors.
+
+        Args:
+            html (bytes): the page.
+            doc_link (str): URL of the page.
+            url (str): URL of the site the page belongs to.
+            include_url_in_text (Optional[bool]): unused, link references
+                are set by `references`.
+
+        Returns:
+            Union[Dict[str, Any], str]: the doc_link, title and text of the
+                page (and its source_links with `references`), or only its
+                text if `strings` is set.
+        """
+        import lxml.html
+
+        document = lxml.html.document_fromstring(html)
+        roots = document.xpath(self.container) or document.xpath("//body") or [document]
+        # containers may be nested, extract only the outermost ones
+        roots = [
+            root
+            for root in roots
+            if not any(ancestor in roots for ancestor in root.iterancestors())
+        ]
+        source_links: List[str] = []
+        text = " ".join(
+            fragment
+            for root in roots
+            for fragment in self.fragments(root, doc_link, source_links)
+        )
+        if self.strings:
+            return text
+        title = document.findtext(".//title")
+        title = title.strip() if title and title.strip() else "No title available"
+        page = {"doc_link": doc_link, "title": title, "text": text}
+        if self.references:
+            page["source_links"] = list(dict.fromkeys(source_links))
+        return page
+
+
+# hostname -> extractor, drop-in replacements of the page extractors of
+# `custom_reader.DEFAULT_SITE_CRAWLER` that work on the page bytes
+DEFAULT_HTML_EXTRACTOR: Dict[str, HtmlExtractor] = {
+    "readme.com": HtmlExtractor(README_MAIN),
+    "readthedocs.io": HtmlExtractor(READTHEDOCS_MAIN, strings=True),
+    "docs.mindsdb.com": HtmlExtractor(MINDSDB_MAIN, references=True),
+}
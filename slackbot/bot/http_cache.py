@@ -0,0 +1,189 @@
+"""On-disk HTTP cache with conditional requests (ETag / Last-Modified).
+
+Every fetched page is stored under a hash of its normalized URL: the body in
+`<key>.body` and the validators and a body digest in `<key>.json`. The next
+request for the URL sends `If-None-Match` / `If-Modified-Since`; a 304 answer
+is served from disk. The cache records which URLs changed since the previous
+crawl, so indexing can skip the rest.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so equivalent spellings share one cache entry.
+
+    Lowercases the scheme and host, drops default ports, empty paths and
+    fragments. The query string is kept as is.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+@dataclass
+class CachedPage:
+    """A page stored in the cache."""
+
+    url: str
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+
+
+class HttpCache:
+    """Persistent cache of page bodies and their validators.
+
+    Args:
+        directory (str): where the cache files are kept; created if needed.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initialize with parameters."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.changed: Set[str] = set()
+        self.unchanged: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(normalize_url(url).encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def _meta(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._paths(url)
+        if not os.path.exists(meta_path) or not os.path.exists(body_path):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Get the cached page of `url`, if any."""
+        meta = self._meta(url)
+        if meta is None:
+            return None
+        with open(self._paths(url)[1], "rb") as f:
+            body = f.read()
+        return CachedPage(
+            url=meta["url"],
+            body=body,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            fetched_at=meta.get("fetched_at", 0.0),
+        )
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Get the conditional request headers for `url`."""
+        meta = self._meta(url)
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url: str, headers: Any, body: bytes) -> bool:
+        """Store a 200 response and return whether its body changed.
+
+        Args:
+            url (str): requested URL.
+            headers (Any): response headers (any case-insensitive mapping).
+            body (bytes): response body.
+
+        Returns:
+            bool: True if the URL was not cached or its body differs.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        previous = self._meta(url)
+        changed = previous is None or previous.get("digest") != digest
+        meta = {
+            "url": normalize_url(url),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "digest": digest,
+            "fetched_at": time.time(),
+        }
+        meta_path, body_path = self._paths(url)
+        if changed:
+            with open(body_path + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(body_path + ".tmp", body_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._record(url, changed)
+        return changed
+
+    def not_modified(self, url: str) -> Optional[bytes]:
+        """Handle a 304 response, returning the cached body."""
+        page = self.get(url)
+        if page is not None:
+            self._record(url, False)
+            return page.body
+        return None
+
+    def _record(self, url: str, changed: bool) -> None:
+        with self._lock:
+            (self.changed if changed else self.unchanged).add(normalize_url(url))
+
+    def reset_report(self) -> None:
+        """Forget which URLs changed, e.g. before the next crawl."""
+        with self._lock:
+            self.changed, self.unchanged = set(), set()
+
+    def is_changed(self, url: str) -> bool:
+        """Whether `url` changed (or was new) during this crawl."""
+        return normalize_url(url) not in self.unchanged
+
+
+def cached_get(
+    url: str,
+    cache: Optional[HttpCache] = None,
+    session: Optional[Any] = None,
+    **kwargs: Any,
+) -> bytes:
+    """GET `url` with `requests`, revalidating against `cache` when given.
+
+    Args:
+        url (str): URL to fetch.
+        cache (Optional[HttpCache]): cache to revalidate against and update.
+        session (Optional[Any]): anything with the `get` of a
+            `requests.Session`, e.g. a `scheduler.PoliteScheduler`.
+        kwargs: passed on to `get`.
+
+    Returns:
+        bytes: The page body.
+    """
+    import requests
+
+    get = (session or requests).get
+    headers = dict(kwargs.pop("headers", None) or {})
+    conditional = cache.request_headers(url) if cache is not None else {}
+    response = get(url, headers={**headers, **conditional}, **kwargs)
+    if cache is not None:
+        if response.status_code == 304:
+            body = cache.not_modified(url)
+            if body is not None:
+                return body
+            # the cache entry vanished, fetch it unconditionally
+            response = get(url, headers=headers, **kwargs)
+        if response.status_code == 200:
+            cache.store(url, response.headers, response.content)
+    return response.content
@@ -0,0 +1,248 @@
+"""Process-wide registry of loaded indices."""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _default_loader(path: str) -> Any:
+    """Load a persisted GPTSimpleVectorIndex."""
+    from vector_search import load_index
+
+    return load_index(path)
+
+
+def _default_size(path: str, index: Any) -> int:
+    """Estimate the memory held by a loaded index from its persisted file.
+
+    Quantized codes live outside the JSON file and are counted separately;
+    memory-mapped float32 vectors are shared page cache and are not counted.
+    """
+    size = os.path.getsize(path)
+    codes = getattr(getattr(index, "_vector_store", None), "_codes", None)
+    return size + getattr(codes, "nbytes", 0)
+
+
+def _file_hash(path: str) -> str:
+    """Return the sha256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class _Entry:
+    index: Any
+    stat: Tuple[int, int]
+    digest: Optional[str]
+    checked_at: float
+    size: int
+    reloading: bool = False
+
+
+class IndexRegistry:
+    """Loads each persisted index once per process and serves it from memory.
+
+    Indices are cached per path and loader, so the same file loaded by two
+    different loaders (e.g. with different similarity cutoffs) gives two
+    separate indices. The first request loads the index synchronously. Later requests
+    get the cached index straight away; at most every `check_interval` seconds
+    the file is stat'ed, and when its mtime or size changed (and, with
+    `verify_hash`, its contents) a background thread loads the new version
+    and swaps it in. Requests keep being served from the old index until the
+    swap, and a failed reload keeps the old index in place.
+
+    With `max_bytes` set, the least recently used indices are evicted once
+    the estimated size of all loaded indices exceeds the budget.
+
+    Args:
+        loader (Optional[Callable]): function taking a path and returning an
+            index. Defaults to vector_search.load_index.
+        check_interval (float): minimum number of seconds between two checks
+            of the same file.
+        verify_hash (bool): only reload when the sha256 of the file changed,
+            so touching a file without changing it does not trigger a reload.
+        max_bytes (Optional[int]): memory budget for all loaded indices.
+        sizer (Optional[Callable]): function taking a path and the loaded
+            index and returning its estimated size in bytes.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[str], Any]] = None,
+        check_interval: float = 2.0,
+        verify_hash: bool = True,
+        max_bytes: Optional[int] = None,
+        sizer: Optional[Callable[[str, Any], int]] = None,
+    ) -> None:
+        """Initialize with parameters."""
+        self.loader = loader or _default_loader
+        self.check_interval = check_interval
+        self.verify_hash = verify_hash
+        self.max_bytes = max_bytes
+        self.sizer = sizer or _default_size
+        self._entries: "OrderedDict[Tuple[str, Any], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, Any], threading.Lock] = {}
+
+    def get(self, path: str, loader: Optional[Callable[[str], Any]] = None) -> Any:
+        """Return the index stored at `path`, loading it on first use.
+
+        Args:
+            path (str): path of the persisted index.
+            loader (Optional[Callable]): loader overriding the registry default.
+
+        Returns:
+            Any: The loaded index.
+        """
+        loader = loader or self.loader
+        key = self._key(path, loader)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return self._load(key, loader)
+
+        now = time.monotonic()
+        if not entry.reloading and now - entry.checked_at >= self.check_interval:
+            self._check(key, entry, loader, now)
+        return entry.index
+
+    @staticmethod
+    def _key(path: str, loader: Callable[[str], Any]) -> Tuple[str, Any]:
+        # partials compare by identity, key them by what they call
+        if isinstance(loader, partial):
+            return os.path.abspath(path), (
+                loader.func,
+                loader.args,
+                tuple(sorted(loader.keywords.items())),
+            )
+        return os.path.abspath(path), loader
+
+    def invalidate(self, path: str) -> None:
+        """Drop the cached indices for `path`; the next `get` reloads them."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self._entries.pop(key)
+                self._load_locks.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every cached index."""
+        with self._lock:
+            self._entries.clear()
+            self._load_locks.clear()
+
+    @property
+    def total_bytes(self) -> int:
+        """Get the estimated size of all loaded indices."""
+        return sum(entry.size for entry in list(self._entries.values()))
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used indices until the budget is met.
+
+        Must be called with the lock held. `keep` is never evicted.
+        """
+        if self.max_bytes is None:
+            return
+        total = sum(entry.size for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            self._load_locks.pop(key, None)
+            total -= entry.size
+            logger.info(
+                f"Evicted index {key[0]} ({entry.size / 2**20:.1f} MiB), "
+                f"{total / 2**20:.1f} MiB of indices loaded"
+            )
+
+    def _load(self, key: Tuple[str, Any], loader: Callable[[str], Any]) -> Any:
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # another thread may have finished loading while we waited
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry.index
+            entry = self._read(key, loader)
+            with self._lock:
+                self._entries[key] = entry
+                self._evict(keep=key)
+            return entry.index
+
+    def _read(self, key: Tuple[str, Any], loader: Callable[[str], Any]) -> _Entry:
+        path = key[0]
+        st = os.stat(path)
+        digest = _file_hash(path) if self.verify_hash else None
+        start = time.perf_counter()
+        index = loader(path)
+        size = self.sizer(path, index)
+        logger.info(
+            f"Loaded index {path} ({size / 2**20:.1f} MiB) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return _Entry(
+            index=index,
+            stat=(st.st_mtime_ns, st.st_size),
+            digest=digest,
+            checked_at=time.monotonic(),
+            size=size,
+        )
+
+    def _check(
+        self, key: Tuple[str, Any], entry: _Entry, loader: Callable[[str], Any], now: float
+    ) -> None:
+        with self._lock:
+            if entry.reloading:
+                return
+            entry.checked_at = now
+            try:
+                st = os.stat(key[0])
+            except OSError:
+                # keep serving the cached index if the file is briefly missing
+                return
+            if (st.st_mtime_ns, st.st_size) == entry.stat:
+                return
+            entry.reloading = True
+
+        thread = threading.Thread(
+            target=self._reload, args=(key, entry, loader), daemon=True
+        )
+        thread.start()
+
+    def _reload(
+        self, key: Tuple[str, Any], entry: _Entry, loader: Callable[[str], Any]
+    ) -> None:
+        try:
+            if self.verify_hash:
+                st = os.stat(key[0])
+                if _file_hash(key[0]) == entry.digest:
+                    entry.stat = (st.st_mtime_ns, st.st_size)
+                    return
+            new_entry = self._read(key, loader)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._entries[key] = new_entry
+                    self._evict(keep=key)
+        except Exception as e:
+            logger.error(f"Could not reload index {key[0]}: {e}")
+        finally:
+            entry.reloading = False
+
+
+index_registry = IndexRegistry(
+    max_bytes=int(os.getenv("INDEX_CACHE_MAX_MB", "0")) * 2**20 or None
+)
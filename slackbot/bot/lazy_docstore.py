@@ -0,0 +1,331 @@
+"""Docstore that keeps node text on disk and reads it only when retrieved.
+
+Node text makes up most of a persisted index, yet a query only needs the text
+of its top-k hits. The text of every node is written to a file of records;
+the index JSON keeps the nodes without their text plus the offset and length
+of each node's record. Records can be compressed with zlib or, when the
+`zstandard` package is installed, zstd.
+"""
+import dataclasses
+import json
+import logging
+import os
+import sys
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from llama_index.constants import DOCSTORE_KEY, TYPE_KEY
+from llama_index.data_structs.node_v2 import Node
+from llama_index.docstore import DocumentStore
+from llama_index.schema import BaseDocument
+
+logger = logging.getLogger(__name__)
+
+TEXT_STORE_KEY = "text_store"
+COMPRESSIONS = (None, "zlib", "zstd")
+# rewrite the text file once less than this fraction of it is still referenced
+DEFAULT_MIN_LIVE_FRACTION = 0.5
+
+
+def text_path(index_path: str) -> str:
+    """Return the path of the text file stored alongside a persisted index."""
+    return os.path.splitext(index_path)[0] + ".text.bin"
+
+
+def _codec(compression: Optional[str]) -> Tuple[Any, Any]:
+    """Return the (compress, decompress) functions of a compression mode."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression {compression}, use one of {COMPRESSIONS}"
+        )
+    if compression == "zlib":
+        return zlib.compress, zlib.decompress
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstd compression requires the zstandard package: "
+                "`pip install zstandard`"
+            )
+        return (
+            zstandard.ZstdCompressor().compress,
+            zstandard.ZstdDecompressor().decompress,
+        )
+    return (lambda data: data), (lambda data: data)
+
+
+class TextStore:
+    """File of text records addressed by offset and length.
+
+    Records are appended, and a node whose record is already stored is not
+    written again. Processes reading an older offset index therefore keep
+    reading valid records while a newer version of the index is being
+    written. Once most of the file belongs to nodes that no longer exist,
+    `compact` rewrites it to a temporary file and moves that into place. The
+    file is opened on construction, so a loaded store keeps reading the
+    version it was loaded with.
+
+    Args:
+        path (str): path of the text file, as stored in the index.
+        compression (Optional[str]): None, "zlib" or "zstd".
+        offsets (Optional[Dict[str, List[int]]]): node id to (offset, length)
+            of its record.
+        root (Optional[str]): directory a relative `path` is resolved against,
+            normally the directory of the index file. Defaults to the
+            working directory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compression: Optional[str] = None,
+        offsets: Optional[Dict[str, List[int]]] = None,
+        root: Optional[str] = None,
+    ) -> None:
+        """Initialize params."""
+        self._compress, self._decompress = _codec(compression)
+        self.path = path
+        self.file_path = os.path.join(root, path) if root else path
+        self.compression = compression
+        self.offsets: Dict[str, List[int]] = dict(offsets or {})
+        self._lock = threading.Lock()
+        self._file: Optional[Any] = None
+        if os.path.exists(self.file_path):
+            self._file = open(self.file_path, "rb")
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.offsets
+
+    def read(self, node_id: str) -> str:
+        """Read the text of a node."""
+        offset, length = self.offsets[node_id]
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.file_path, "rb")
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return self._decompress(data).decode("utf-8")
+
+    def append(self, texts: Dict[str, str]) -> None:
+        """Append the texts of nodes not stored yet and record their offsets."""
+        texts = {
+            node_id: text
+            for node_id, text in texts.items()
+            if node_id not in self.offsets
+        }
+        if not texts:
+            return
+        with self._lock, open(self.file_path, "ab") as f:
+            offset = f.tell()
+            for node_id, text in texts.items():
+                data = self._compress(text.encode("utf-8"))
+                f.write(data)
+                self.offsets[node_id] = [offset, len(data)]
+                offset += len(data)
+
+    def live_fraction(self, node_ids: Iterable[str]) -> float:
+        """Return the fraction of the file taken up by the records of `node_ids`."""
+        if not os.path.exists(self.file_path):
+            return 1.0
+        size = os.path.getsize(self.file_path)
+        if size == 0:
+            return 1.0
+        live = sum(self.offsets[i][1] for i in set(node_ids) if i in self.offsets)
+        return live / size
+
+    def compact(self, node_ids: Iterable[str]) -> None:
+        """Rewrite the file with only the records of `node_ids`.
+
+        Records are copied as stored, without recompressing them.
+        """
+        keep = [i for i in dict.fromkeys(node_ids) if i in self.offsets]
+        offsets: Dict[str, List[int]] = {}
+        tmp_path = self.file_path + ".tmp"
+        with self._lock:
+            with open(self.file_path, "rb") as src, open(tmp_path, "wb") as dst:
+                position = 0
+                for node_id in keep:
+                    offset, length = self.offsets[node_id]
+                    src.seek(offset)
+                    dst.write(src.read(length))
+                    offsets[node_id] = [position, length]
+                    position += length
+            os.replace(tmp_path, self.file_path)
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.file_path, "rb")
+            self.offsets = offsets
+        logger.info(f"Compacted {self.file_path} to {len(offsets)} records")
+
+    def compact_if_needed(
+        self,
+        node_ids: Iterable[str],
+        min_live_fraction: float = DEFAULT_MIN_LIVE_FRACTION,
+    ) -> None:
+        """Compact once less than `min_live_fraction` of the file is live."""
+        node_ids = list(node_ids)
+        if self.live_fraction(node_ids) < min_live_fraction:
+            self.compact(node_ids)
+
+    @property
+    def config_dict(self) -> dict:
+        """Get config dict."""
+        return {
+            "path": self.path,
+            "compression": self.compression,
+            "offsets": self.offsets,
+        }
+
+
+@dataclass
+class LazyDocumentStore(DocumentStore):
+    """DocumentStore whose nodes hold no text until they are retrieved.
+
+    Nodes in `docs` carry an empty text; `get_document` returns a copy with
+    the text read from the text store. Nodes added after loading keep their
+    text in memory until the index is saved, which appends it to the file
+    and compacts the file once it is mostly unreferenced records.
+
+    Args:
+        text_store (Optional[TextStore]): where the node text is kept.
+        see DocumentStore for the other arguments.
+    """
+
+    text_store: Optional[TextStore] = None
+
+    def serialize_to_dict(self) -> Dict[str, Any]:
+        """Serialize to dict, moving node text into the text store."""
+        pending = {
+            doc_id: doc.text
+            for doc_id, doc in self.docs.items()
+            if isinstance(doc, Node) and doc.text
+        }
+        if pending:
+            self.text_store.append(pending)
+            for doc_id in pending:
+                self.docs[doc_id] = dataclasses.replace(self.docs[doc_id], text="")
+        self.text_store.compact_if_needed(self.docs)
+
+        result = super().serialize_to_dict()
+        config = self.text_store.config_dict
+        config["offsets"] = {
+            doc_id: offset
+            for doc_id, offset in config["offsets"].items()
+            if doc_id in self.docs
+        }
+        result[TEXT_STORE_KEY] = config
+        return result
+
+    @classmethod
+    def load_from_dict(
+        cls, docs_dict: Dict[str, Any], root: Optional[str] = None
+    ) -> "LazyDocumentStore":
+        """Load from dict.
+
+        Args:
+            docs_dict (Dict[str, Any]): the docstore section of an index.
+            root (Optional[str]): directory of the index file, which the path
+                of the text store is relative to.
+        """
+        docstore = DocumentStore.load_from_dict(docs_dict)
+        text_store = TextStore(**docs_dict[TEXT_STORE_KEY], root=root)
+        if text_store.offsets and not os.path.exists(text_store.file_path):
+            raise FileNotFoundError(f"No node text at {text_store.file_path}")
+        return cls(
+            docs=docstore.docs,
+            ref_doc_info=docstore.ref_doc_info,
+            text_store=text_store,
+        )
+
+    def get_document(
+        self, doc_id: str, raise_error: bool = True
+    ) -> Optional[BaseDocument]:
+        """Get a document from the store, reading its text if needed."""
+        doc = super().get_document(doc_id, raise_error=raise_error)
+        if isinstance(doc, Node) and doc.text == "" and doc_id in self.text_store:
+            doc = dataclasses.replace(doc, text=self.text_store.read(doc_id))
+        return doc
+
+
+def load_docstore(
+    docs_dict: Dict[str, Any], root: Optional[str] = None
+) -> DocumentStore:
+    """Load a docstore section, lazily if it refers to a text store.
+
+    `root` is the directory of the index file; see
+    `LazyDocumentStore.load_from_dict`.
+    """
+    if TEXT_STORE_KEY in docs_dict:
+        return LazyDocumentStore.load_from_dict(docs_dict, root=root)
+    return DocumentStore.load_from_dict(docs_dict)
+
+
+def convert_docstore_file(
+    index_path: str,
+    output_path: Optional[str] = None,
+    path: Optional[str] = None,
+    compression: Optional[str] = "zlib",
+    offsets: Optional[Dict[str, List[int]]] = None,
+) -> str:
+    """Move the node text of a `save_to_disk` JSON file into a text store.
+
+    Only `vector_search.load_index` reads converted files;
+    `GPTSimpleVectorIndex.load_from_disk` would load nodes without text.
+
+    Args:
+        index_path (str): path of the JSON written by `save_to_disk`.
+        output_path (Optional[str]): where to write the converted JSON.
+            Defaults to overwriting `index_path`.
+        path (Optional[str]): where to write the text.
+            Defaults to `<index name>.text.bin` next to the index. The index
+            refers to it by a path relative to its own directory.
+        compression (Optional[str]): None, "zlib" or "zstd".
+        offsets (Optional[Dict[str, List[int]]]): records already in `path`,
+            e.g. the text store of the previous version of the index. Nodes
+            listed there are not written again.
+
+    Returns:
+        str: The path of the text file.
+    """
+    output_path = output_path or index_path
+    path = path or text_path(output_path)
+    with open(index_path, "r") as f:
+        result_dict = json.load(f)
+
+    docs_dict = result_dict[DOCSTORE_KEY]
+    if TEXT_STORE_KEY in docs_dict:
+        raise ValueError(f"{index_path} already keeps its node text in a text store")
+
+    # records are appended to an existing file, so processes still using the
+    # previous version of the index keep reading valid offsets
+    text_store = TextStore(path, compression, offsets if os.path.exists(path) else None)
+    texts = {
+        doc_id: doc_dict["text"]
+        for doc_id, doc_dict in docs_dict["docs"].items()
+        if doc_dict.get(TYPE_KEY) == Node.get_type() and doc_dict.get("text")
+    }
+    text_store.append(texts)
+    text_store.compact_if_needed(texts)
+    for doc_id in texts:
+        docs_dict["docs"][doc_id]["text"] = ""
+    config = text_store.config_dict
+    config["path"] = os.path.relpath(
+        os.path.abspath(path), os.path.dirname(os.path.abspath(output_path))
+    )
+    config["offsets"] = {i: config["offsets"][i] for i in texts}
+    docs_dict[TEXT_STORE_KEY] = config
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result_dict, f)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote the text of {len(texts)} nodes from {index_path} to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    # python lazy_docstore.py mdb.json [converted.json]
+    convert_docstore_file(*sys.argv[1:3])
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_uploadedfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('team_id', models.CharField(help_text='Slack workspace id, as in SlackInstallation.team_id', max_length=32, unique=True)),
+                ('index_path', models.TextField()),
+                ('source_url', models.TextField(null=True)),
+                ('custom_hostname', models.CharField(max_length=64, null=True)),
+                ('structured_output', models.BooleanField(default=False)),
+                ('similarity_cutoff', models.FloatField(null=True)),
+                ('response_mode', models.CharField(default='default', max_length=32)),
+                ('fallback_url', models.TextField(null=True)),
+            ],
+        ),
+    ]
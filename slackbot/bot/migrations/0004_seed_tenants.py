@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+from django.db import migrations
+
+
+def add_existing_tenants(apps, schema_editor):
+    """Carry over the workspaces that used to be hard-coded in mand."""
+    TenantIndex = apps.get_model('bot', 'TenantIndex')
+    TenantIndex.objects.get_or_create(
+        team_id='T01LRR9V3J6',
+        defaults={
+            'index_path': 'paystack.json',
+            'source_url': 'https://paystack.com/docs',
+            'custom_hostname': 'readme.com',
+        },
+    )
+    TenantIndex.objects.get_or_create(
+        team_id='T01RZQL72N9',
+        defaults={
+            'index_path': 'mdb.json',
+            'structured_output': True,
+            'similarity_cutoff': 0.8,
+            'response_mode': 'compact',
+            'fallback_url': 'https://docs.mindsdb.com/',
+        },
+    )
+
+
+def remove_existing_tenants(apps, schema_editor):
+    TenantIndex = apps.get_model('bot', 'TenantIndex')
+    TenantIndex.objects.filter(team_id__in=['T01LRR9V3J6', 'T01RZQL72N9']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_tenantindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_existing_tenants, remove_existing_tenants),
+    ]
@@ -75,6 +75,34 @@ class SlackInstallation(models.Model):
         return self.team_name + " - " + self.team_id
 
 
+class TenantIndex(models.Model):
+    """Index and query configuration of the workspace with this team_id.
+
+    team_id is the Slack workspace id, the same value as
+    SlackInstallation.team_id. It is not a foreign key because a workspace has
+    one SlackInstallation row per installing user, so SlackInstallation.team_id
+    is not unique; a TenantIndex may also be created before the app is
+    installed.
+    """
+
+    team_id = models.CharField(
+        null=False,
+        max_length=32,
+        unique=True,
+        help_text="Slack workspace id, as in SlackInstallation.team_id",
+    )
+    index_path = models.TextField(null=False)
+    source_url = models.TextField(null=True)
+    custom_hostname = models.CharField(null=True, max_length=64)
+    structured_output = models.BooleanField(default=False)
+    similarity_cutoff = models.FloatField(null=True)
+    response_mode = models.CharField(max_length=32, default="default")
+    fallback_url = models.TextField(null=True)
+
+    def __str__(self):
+        return self.team_id + " - " + self.index_path
+
+
 class SlackOAuthState(models.Model):
     state = models.CharField(null=False, max_length=64)
     expire_at = models.DateTimeField(null=False)
@@ -0,0 +1,406 @@
+"""Quantized (int8 / float16) embedding storage with exact rescoring.
+
+Only the quantized codes of the normalized embeddings are loaded into memory:
+int8 codes with one scale per dimension take a quarter of the float32 size,
+float16 codes half of it. A query first scores the codes, then rescores the
+best `rescore * top_k` candidates exactly with the float32 rows read from the
+memory-mapped vectors file (see embedding_store).
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.constants import DATA_KEY, TYPE_KEY
+from llama_index.indices.vector_store.base import VECTOR_STORE_KEY
+from llama_index.vector_stores.registry import (
+    VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE,
+    VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS,
+)
+
+from ann_index import DEFAULT_NPROBE, IVFIndex, recall_at_k
+from embedding_store import (
+    MMAP_VECTOR_STORE_TYPE,
+    MmapVectorStore,
+    convert_index_file,
+    relative_vectors_path,
+    resolve_vectors_path,
+)
+from vector_search import VectorSearchEngine
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_VECTOR_STORE_TYPE = "quantized"
+QUANTIZATION_MODES = ("int8", "float16")
+DEFAULT_RESCORE = 4
+
+
+def codes_path(vectors_path: str, mode: str) -> str:
+    """Return the path of the quantized codes belonging to a vectors file."""
+    return os.path.splitext(vectors_path)[0] + f".{mode}.npz"
+
+
+def quantize(
+    embeddings: Any, mode: str = "int8", chunk_size: int = 16384
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize normalized copies of `embeddings`.
+
+    Args:
+        embeddings (Any): matrix of shape (n, dim); may be a memory map.
+        mode (str): "int8" (symmetric, one scale per dimension) or "float16".
+        chunk_size (int): number of rows converted at a time.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the codes and the per-dimension scale
+            (all ones for float16).
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(
+            f"Unknown quantization mode {mode}, use one of {QUANTIZATION_MODES}"
+        )
+
+    n, dim = embeddings.shape
+
+    def chunks() -> Any:
+        for start in range(0, n, chunk_size):
+            chunk = np.asarray(embeddings[start : start + chunk_size], dtype=np.float32)
+            norms = np.linalg.norm(chunk, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            yield start, chunk / norms
+
+    if mode == "float16":
+        codes = np.empty((n, dim), dtype=np.float16)
+        for start, chunk in chunks():
+            codes[start : start + len(chunk)] = chunk
+        return codes, np.ones(dim, dtype=np.float32)
+
+    max_abs = np.zeros(dim, dtype=np.float32)
+    for _, chunk in chunks():
+        np.maximum(max_abs, np.abs(chunk).max(axis=0), out=max_abs)
+    scale = np.where(max_abs == 0, 1.0, max_abs / 127.0).astype(np.float32)
+    codes = np.empty((n, dim), dtype=np.int8)
+    for start, chunk in chunks():
+        codes[start : start + len(chunk)] = np.rint(chunk / scale)
+    return codes, scale
+
+
+class QuantizedSearchEngine:
+    """Two-pass search: quantized first pass, exact float32 rescoring.
+
+    With an IVF index attached the first pass only scores the codes of the
+    candidate rows it returns, instead of every code.
+
+    Args:
+        codes (np.ndarray): quantized normalized embeddings.
+        scale (np.ndarray): per-dimension scale of the codes.
+        matrix (np.ndarray): float32 embeddings (usually a memory map), only
+            read for the rescored candidates.
+        ids (Sequence[str]): id of each row.
+        rescore (int): number of candidates rescored per result.
+        chunk_size (int): number of code rows scored at a time.
+        ann (Optional[IVFIndex]): approximate index over the same rows.
+        nprobe (int): number of IVF lists searched per query.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        scale: np.ndarray,
+        matrix: np.ndarray,
+        ids: Sequence[str],
+        rescore: int = DEFAULT_RESCORE,
+        chunk_size: int = 16384,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> None:
+        """Initialize with parameters."""
+        self.codes = codes
+        self.scale = scale
+        self.ids = list(ids)
+        self.rescore = rescore
+        self.chunk_size = chunk_size
+        self._matrix = matrix
+        if ann is not None and ann.ids != self.ids:
+            logger.warning("Ignoring an IVF index built for different embeddings")
+            ann = None
+        self.ann = ann
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Get the float32 embedding matrix."""
+        return self._matrix
+
+    @property
+    def nbytes(self) -> int:
+        """Get the resident size of the codes."""
+        return self.codes.nbytes + self.scale.nbytes
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Score normalized `queries` against the codes, shape (n, n_queries)."""
+        scaled = (queries * self.scale).T
+        scores = np.empty((len(self.codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_size):
+            chunk = self.codes[start : start + self.chunk_size].astype(np.float32)
+            scores[start : start + len(chunk)] = chunk @ scaled
+        return scores
+
+    def search_batch(
+        self,
+        queries: Any,
+        top_k: int,
+        similarity_cutoff: Optional[float] = None,
+    ) -> List[Tuple[List[float], List[str]]]:
+        """Find the `top_k` most similar embeddings for each query.
+
+        See VectorSearchEngine.search_batch.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self.ids) == 0 or top_k <= 0:
+            return [([], []) for _ in range(len(queries))]
+        q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        q_norms[q_norms == 0] = 1.0
+        queries = queries / q_norms
+
+        approximate = None if self.ann is not None else self.approximate_scores(queries)
+        results = []
+        for i, query in enumerate(queries):
+            if approximate is not None:
+                pool, column = None, approximate[:, i]
+            else:
+                pool = self.ann.candidates(query, self.nprobe)
+                if len(pool) == 0:
+                    results.append(([], []))
+                    continue
+                column = self.codes[pool].astype(np.float32) @ (query * self.scale)
+            n_candidates = min(len(column), top_k * self.rescore)
+            if n_candidates < len(column):
+                rows = np.argpartition(-column, n_candidates - 1)[:n_candidates]
+            else:
+                rows = np.arange(len(column))
+            if pool is not None:
+                rows = pool[rows]
+            rows.sort()
+            candidates = np.asarray(self._matrix[rows], dtype=np.float32)
+            norms = np.linalg.norm(candidates, axis=1)
+            norms[norms == 0] = 1.0
+            scores = (candidates @ query) / norms
+            if similarity_cutoff is not None:
+                keep = scores > similarity_cutoff
+                rows, scores = rows[keep], scores[keep]
+            best = np.argsort(-scores)[:top_k]
+            results.append((scores[best].tolist(), [self.ids[j] for j in rows[best]]))
+        return results
+
+    def search(
+        self,
+        query: Any,
+        top_k: int,
+        similarity_cutoff: Optional[float] = None,
+    ) -> Tuple[List[float], List[str]]:
+        """Find the `top_k` most similar embeddings for a single query."""
+        return self.search_batch([query], top_k, similarity_cutoff)[0]
+
+
+class QuantizedVectorStore(MmapVectorStore):
+    """MmapVectorStore that searches quantized codes held in memory.
+
+    The codes are written next to the vectors file whenever it is persisted
+    (see also `quantize_index_file`), never while loading: missing or stale
+    codes make queries search the float32 vectors instead.
+    An IVF index (see `ann_index.build_ann_index`) limits the quantized pass
+    to the rows of the lists it probes. While nodes added or deleted since
+    loading are pending, queries fall back to exact search.
+
+    Args:
+        path (str): path of the `.npy` vectors file.
+        mode (str): "int8" or "float16".
+        rescore (int): number of candidates rescored exactly per result.
+        kwargs: see MmapVectorStore.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "int8",
+        rescore: int = DEFAULT_RESCORE,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize params."""
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(
+                f"Unknown quantization mode {mode}, use one of {QUANTIZATION_MODES}"
+            )
+        self.mode = mode
+        self.rescore = rescore
+        self._codes: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        super().__init__(path, **kwargs)
+
+    def _open(self) -> None:
+        super()._open()
+        self._codes, self._scale = None, None
+        path = codes_path(self.vectors_path, self.mode)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                # codes are only used for the generation of the matrix they encode
+                if (
+                    "generation" in data
+                    and data["generation"] == self._codes_generation
+                    and data["codes"].shape == self._matrix.shape
+                ):
+                    self._codes, self._scale = data["codes"], data["scale"]
+
+    @property
+    def _codes_generation(self) -> int:
+        return -1 if self._generation is None else self._generation
+
+    @classmethod
+    def from_dict(cls, config_dict: Dict[str, Any]) -> "QuantizedVectorStore":
+        store = super().from_dict(config_dict)
+        if store._codes is None:
+            # loading never writes: workers may race and the directory may be
+            # read-only, so search the float32 vectors until the codes are redone
+            logger.warning(
+                f"{codes_path(store.vectors_path, store.mode)} is missing or stale, "
+                "searching the float32 vectors; rerun quantize_index_file"
+            )
+        return store
+
+    def write_codes(self) -> str:
+        """Quantize the persisted embeddings and write the codes next to them.
+
+        Returns:
+            str: The path of the codes.
+        """
+        self._codes, self._scale = quantize(self._matrix, self.mode)
+        path = codes_path(self.vectors_path, self.mode)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            codes=self._codes,
+            scale=self._scale,
+            generation=np.int64(self._codes_generation),
+        )
+        os.replace(tmp_path, path)
+        self._engine = None
+        return path
+
+    def persist(self) -> None:
+        """Write the current embeddings and their codes to disk."""
+        super().persist()
+        self.write_codes()
+
+    @property
+    def config_dict(self) -> dict:
+        """Get config dict."""
+        config = super().config_dict
+        config.update({"mode": self.mode, "rescore": self.rescore})
+        return config
+
+    @property
+    def engine(self) -> Any:
+        """Get the search engine, building it if needed."""
+        if self._added or self._deleted or self._codes is None:
+            return super().engine
+        if self._engine is None:
+            self._engine = QuantizedSearchEngine(
+                self._codes,
+                self._scale,
+                self._matrix,
+                self._ids,
+                self.rescore,
+                ann=self.ann,
+                nprobe=self.nprobe,
+            )
+        return self._engine
+
+
+VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS[
+    QUANTIZED_VECTOR_STORE_TYPE
+] = QuantizedVectorStore
+VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE[
+    QuantizedVectorStore
+] = QUANTIZED_VECTOR_STORE_TYPE
+
+
+def quantize_index_file(
+    index_path: str,
+    mode: str = "int8",
+    rescore: int = DEFAULT_RESCORE,
+    output_path: Optional[str] = None,
+) -> str:
+    """Switch a persisted index to a QuantizedVectorStore.
+
+    "simple" vector stores are first converted with
+    `embedding_store.convert_index_file`.
+
+    Args:
+        index_path (str): path of the JSON written by `save_to_disk`.
+        mode (str): "int8" or "float16".
+        rescore (int): number of candidates rescored exactly per result.
+        output_path (Optional[str]): where to write the converted JSON.
+            Defaults to overwriting `index_path`.
+
+    Returns:
+        str: The path of the quantized codes.
+    """
+    output_path = output_path or index_path
+    with open(index_path, "r") as f:
+        result_dict = json.load(f)
+    if result_dict[VECTOR_STORE_KEY][TYPE_KEY] == "simple":
+        convert_index_file(index_path, output_path)
+        with open(output_path, "r") as f:
+            result_dict = json.load(f)
+
+    vector_store = result_dict[VECTOR_STORE_KEY]
+    if vector_store[TYPE_KEY] not in (
+        MMAP_VECTOR_STORE_TYPE,
+        QUANTIZED_VECTOR_STORE_TYPE,
+    ):
+        raise ValueError(f"Cannot quantize a {vector_store[TYPE_KEY]} vector store")
+    vectors_path = resolve_vectors_path(vector_store[DATA_KEY]["path"], index_path)
+    store = QuantizedVectorStore(vectors_path, mode=mode, rescore=rescore)
+    if store._codes is None:
+        store.write_codes()
+    result_dict[VECTOR_STORE_KEY] = {
+        TYPE_KEY: QUANTIZED_VECTOR_STORE_TYPE,
+        DATA_KEY: {
+            **store.config_dict,
+            "path": relative_vectors_path(vectors_path, output_path),
+        },
+    }
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result_dict, f)
+    os.replace(tmp_path, output_path)
+    return codes_path(vectors_path, mode)
+
+
+def measure_recall(
+    engine: QuantizedSearchEngine, queries: Any, top_k: int
+) -> Dict[str, float]:
+    """Compare a quantized engine with exact search over the same embeddings.
+
+    Args:
+        engine (QuantizedSearchEngine): engine to evaluate.
+        queries (Any): query embeddings, shape (n_queries, dim).
+        top_k (int): number of results per query.
+
+    Returns:
+        Dict[str, float]: recall@k of the quantized search, its recall loss
+            and the resident memory of the codes relative to float32.
+    """
+    exact = VectorSearchEngine(engine.matrix, engine.ids, copy=False)
+    truth = [ids for _, ids in exact.search_batch(queries, top_k)]
+    found = [ids for _, ids in engine.search_batch(queries, top_k)]
+    recall = recall_at_k(truth, found)
+    return {
+        "recall": recall,
+        "recall_loss": 1.0 - recall,
+        "memory_ratio": engine.nbytes / (len(engine.ids) * engine.matrix.shape[1] * 4),
+    }
@@ -0,0 +1,226 @@
+"""Incremental re-indexing: only new or changed chunks are embedded again.
+
+Every node carries a `doc_hash` (sha256 of its text and extra info). When an
+index is refreshed with freshly loaded documents, the documents are chunked
+again and every chunk whose hash is already in the index reuses the stored
+node id and embedding. Only the remaining chunks are sent to the embedding
+model, and stored chunks that no longer appear are dropped.
+
+By default the documents are the complete new content of the index. With
+`partial=True` they are only the documents that changed (e.g. from
+`DatabaseReader.load_incremental`): the nodes of every other document are
+kept as they are, and only `deleted_doc_ids` are removed.
+"""
+import dataclasses
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RefreshStats:
+    """What a refresh did to the index."""
+
+    reused: int
+    embedded: int
+    deleted: int
+
+
+def refresh_index(
+    index: Any,
+    documents: Sequence[Any],
+    partial: bool = False,
+    deleted_doc_ids: Iterable[str] = (),
+    **kwargs: Any,
+) -> Tuple[Any, RefreshStats]:
+    """Build a new version of `index` from `documents`, reusing embeddings.
+
+    Args:
+        index (GPTSimpleVectorIndex): the current index.
+        documents (Sequence[Document]): freshly loaded documents, e.g. from
+            `DatabaseReader.load_data` or `BeautifulSoupWebReader.load_data`.
+        partial (bool): `documents` only holds new or changed documents;
+            documents missing from it are kept instead of deleted. Their
+            doc ids must be stable across loads (e.g. `doc_id_column`).
+        deleted_doc_ids (Iterable[str]): documents to remove when `partial`,
+            e.g. the tombstones returned by `DatabaseReader.load_incremental`.
+        kwargs: passed on to the constructor of the new index
+            (e.g. vector_store).
+
+    Returns:
+        Tuple[GPTSimpleVectorIndex, RefreshStats]: the new index and what
+            changed.
+    """
+    from llama_index.docstore import DocumentStore
+
+    vector_store = index.query_context["vector_store"]
+    service_context = index.service_context
+    deleted_doc_ids = list(deleted_doc_ids)
+    if not partial and deleted_doc_ids:
+        raise ValueError("deleted_doc_ids only applies to a partial refresh")
+    changed = {document.get_doc_id() for document in documents}
+    changed.update(deleted_doc_ids)
+
+    # identical chunks (a repeated footer, say) each keep their own node
+    existing: Dict[str, List[Tuple[str, List[float]]]] = {}
+    kept = []
+    for node_id, node in index.docstore.docs.items():
+        try:
+            embedding = vector_store.get(node_id)
+        except KeyError:
+            continue
+        if partial and node.ref_doc_id not in changed:
+            # get_document reads the text back if the docstore is lazy
+            node = index.docstore.get_document(node_id)
+            kept.append(dataclasses.replace(node, embedding=list(embedding)))
+            continue
+        existing.setdefault(node.get_doc_hash(), []).append((node_id, list(embedding)))
+    n_existing = sum(len(matches) for matches in existing.values())
+
+    nodes = service_context.node_parser.get_nodes_from_documents(documents)
+    reused = 0
+    for node in nodes:
+        matches = existing.get(node.get_doc_hash())
+        if matches:
+            node.doc_id, node.embedding = matches.pop(0)
+            reused += 1
+
+    docstore = DocumentStore()
+    for node in kept:
+        doc_hash = index.docstore.get_document_hash(node.ref_doc_id)
+        if doc_hash is not None:
+            docstore.set_document_hash(node.ref_doc_id, doc_hash)
+    for document in documents:
+        docstore.set_document_hash(document.get_doc_id(), document.get_doc_hash())
+    new_index = type(index)(
+        nodes=kept + nodes,
+        docstore=docstore,
+        service_context=service_context,
+        **kwargs,
+    )
+    # the embeddings now live in the vector store, don't save them twice
+    for node in kept + nodes:
+        node.embedding = None
+
+    stats = RefreshStats(
+        reused=len(kept) + reused,
+        embedded=len(nodes) - reused,
+        deleted=n_existing - reused,
+    )
+    logger.info(
+        f"Refreshed index: {stats.reused} chunks reused, {stats.embedded} "
+        f"embedded, {stats.deleted} deleted"
+    )
+    return new_index, stats
+
+
+def refresh_index_file(
+    index_path: str,
+    documents: Sequence[Any],
+    partial: bool = False,
+    deleted_doc_ids: Iterable[str] = (),
+    **kwargs: Any,
+) -> RefreshStats:
+    """Refresh a persisted index in place.
+
+    Memory-mapped and quantized vector stores and text stores are converted
+    back to their format after saving, and an IVF index next to the file is
+    rebuilt with the same number of lists and nprobe.
+
+    The new vectors, codes and text are written to new files, so replacing
+    the index JSON is the only step that changes what readers see; the
+    files of the previous version are removed afterwards.
+
+    Args:
+        index_path (str): path of the JSON written by `save_to_disk`.
+        documents (Sequence[Document]): freshly loaded documents.
+        partial (bool): see `refresh_index`.
+        deleted_doc_ids (Iterable[str]): see `refresh_index`.
+        kwargs: passed on to `vector_search.load_index`.
+
+    Returns:
+        RefreshStats: what changed.
+    """
+    from llama_index.constants import DATA_KEY, DOCSTORE_KEY, TYPE_KEY
+    from llama_index.indices.vector_store.base import VECTOR_STORE_KEY
+
+    from ann_index import IVFIndex, ann_path, build_ann_index
+    from embedding_store import (
+        MMAP_VECTOR_STORE_TYPE,
+        convert_index_file,
+        remove_embeddings,
+        resolve_vectors_path,
+    )
+    from lazy_docstore import TEXT_STORE_KEY, convert_docstore_file
+    from quantization import (
+        QUANTIZATION_MODES,
+        QUANTIZED_VECTOR_STORE_TYPE,
+        codes_path,
+        quantize_index_file,
+    )
+    from vector_search import load_index
+
+    with open(index_path, "r") as f:
+        result_dict = json.load(f)
+    vector_store_dict = result_dict[VECTOR_STORE_KEY]
+    text_store_dict = result_dict[DOCSTORE_KEY].get(TEXT_STORE_KEY)
+
+    index = load_index(index_path, **kwargs)
+    new_index, stats = refresh_index(
+        index, documents, partial=partial, deleted_doc_ids=deleted_doc_ids
+    )
+    if stats.embedded == 0 and stats.deleted == 0:
+        return stats
+
+    tmp_path = index_path + ".tmp"
+    new_index.save_to_disk(tmp_path)
+    # files of the new version, named apart from the ones readers may open
+    version_stem = f"{os.path.splitext(index_path)[0]}.{time.time_ns()}"
+    old_vectors_path = None
+    if vector_store_dict[TYPE_KEY] in (
+        MMAP_VECTOR_STORE_TYPE,
+        QUANTIZED_VECTOR_STORE_TYPE,
+    ):
+        old_vectors_path = resolve_vectors_path(
+            vector_store_dict[DATA_KEY]["path"], index_path
+        )
+        convert_index_file(tmp_path, vectors_path=version_stem + ".vectors.npy")
+    if vector_store_dict[TYPE_KEY] == QUANTIZED_VECTOR_STORE_TYPE:
+        quantize_index_file(
+            tmp_path,
+            mode=vector_store_dict[DATA_KEY]["mode"],
+            rescore=vector_store_dict[DATA_KEY]["rescore"],
+        )
+    if text_store_dict is not None:
+        convert_docstore_file(
+            tmp_path,
+            path=version_stem + ".text.bin",
+            compression=text_store_dict["compression"],
+        )
+    os.replace(tmp_path, index_path)
+
+    if old_vectors_path is not None:
+        remove_embeddings(old_vectors_path)
+        _remove(*(codes_path(old_vectors_path, mode) for mode in QUANTIZATION_MODES))
+    if text_store_dict is not None:
+        index_dir = os.path.dirname(os.path.abspath(index_path))
+        _remove(os.path.join(index_dir, text_store_dict["path"]))
+
+    if os.path.exists(ann_path(index_path)):
+        old = IVFIndex.load(ann_path(index_path))
+        build_ann_index(index_path, n_lists=old.n_lists, nprobe=old.nprobe)
+    return stats
+
+
+def _remove(*paths: str) -> None:
+    # processes that still have a removed file open keep reading it
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
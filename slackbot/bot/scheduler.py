@@ -0,0 +1,310 @@
+"""Polite, per-host crawl scheduling over pooled `requests` sessions.
+
+Every host gets one `requests.Session` whose connection pool is sized to the
+host's concurrency, so connections are kept alive instead of paying a new
+TCP/TLS handshake per page. Requests to a host are spaced to its
+requests-per-second budget and limited to its concurrency. A 429 or 503
+response pauses the whole host for its Retry-After (or an exponential
+backoff) before the request is retried, since the other in-flight requests
+would be throttled too.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from crawler import FetchResult, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPS = 4.0
+DEFAULT_HOST_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+THROTTLE_STATUSES = frozenset([429, 503])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def _hostname(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+@dataclass
+class HostPolicy:
+    """Politeness limits of one host.
+
+    Args:
+        rps (float): maximum requests per second.
+        concurrency (int): maximum requests in flight.
+    """
+
+    rps: float = DEFAULT_RPS
+    concurrency: int = DEFAULT_HOST_CONCURRENCY
+
+
+@dataclass
+class HostStats:
+    """Throughput of the requests to one host."""
+
+    requests: int = 0
+    pages: int = 0
+    errors: int = 0
+    throttled: int = 0
+    retries: int = 0
+    bytes: int = 0
+    waited: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.pages} pages in {self.seconds:.2f}s "
+            f"({self.pages_per_second:.1f} pages/s, "
+            f"{self.bytes_per_second / 1024:.0f} KiB/s), {self.requests} requests, "
+            f"{self.throttled} throttled, {self.retries} retries, "
+            f"{self.errors} errors, {self.waited:.2f}s spent waiting for a turn"
+        )
+
+
+@dataclass
+class _Host:
+    policy: HostPolicy
+    session: Any
+    slots: threading.Semaphore
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    next_request: float = 0.0
+    paused_until: float = 0.0
+    stats: HostStats = field(default_factory=HostStats)
+
+
+class PoliteScheduler:
+    """Fetch pages within per-host rate and concurrency limits.
+
+    The scheduler can stand in for a `requests.Session`: `get` has the same
+    signature, so it can be passed to `http_cache.cached_get`.
+
+    Args:
+        policies (Optional[Dict[str, HostPolicy]]): limits per hostname.
+        default_policy (Optional[HostPolicy]): limits of the other hosts.
+        retries (int): retries after a failed request or a 429/5xx response.
+        backoff (float): base delay in seconds, doubled on every retry, when
+            the response has no Retry-After.
+        timeout (float): seconds allowed per request.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, HostPolicy]] = None,
+        default_policy: Optional[HostPolicy] = None,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """Initialize with parameters."""
+        self.policies = policies or {}
+        self.default_policy = default_policy or HostPolicy()
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str) -> _Host:
+        hostname = _hostname(url)
+        with self._lock:
+            if hostname not in self._hosts:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                policy = self.policies.get(hostname, self.default_policy)
+                if policy.rps <= 0 or policy.concurrency < 1:
+                    raise ValueError(f"Invalid policy for {hostname}: {policy}")
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.concurrency)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._hosts[hostname] = _Host(
+                    policy, session, threading.Semaphore(policy.concurrency)
+                )
+            return self._hosts[hostname]
+
+    def _wait_turn(self, host: _Host) -> None:
+        """Sleep until the host's rate limit allows the next request."""
+        start = time.monotonic()
+        with host.lock:
+            turn = max(start, host.next_request, host.paused_until)
+            host.next_request = turn + 1 / host.policy.rps
+        time.sleep(turn - start)
+        # a throttled response may have paused the host in the meantime
+        while True:
+            with host.lock:
+                remaining = host.paused_until - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+        with host.lock:
+            host.stats.waited += time.monotonic() - start
+
+    def _pause(self, host: _Host, seconds: float) -> None:
+        """Hold back every request to the host for `seconds`."""
+        with host.lock:
+            paused_until = time.monotonic() + seconds
+            host.paused_until = max(host.paused_until, paused_until)
+            host.next_request = max(host.next_request, paused_until)
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        """GET `url` within the host's limits, retrying throttled requests.
+
+        Args:
+            url (str): URL to fetch.
+            kwargs: passed on to `requests.Session.get`.
+
+        Returns:
+            requests.Response: the last response.
+        """
+        import requests
+
+        host = self._host(url)
+        kwargs.setdefault("timeout", self.timeout)
+        with host.slots:
+            for attempt in range(self.retries + 1):
+                self._wait_turn(host)
+                start = time.perf_counter()
+                backoff = random.uniform(0.5, 1.0) * self.backoff * 2**attempt
+                try:
+                    response = host.session.get(url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    self._record(host, start, None, error=True)
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(backoff)
+                else:
+                    self._record(host, start, response)
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        return response
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    delay = backoff if retry_after is None else retry_after
+                    if response.status_code in THROTTLE_STATUSES:
+                        # the host is telling us to slow down, not just this
+                        # request; `_wait_turn` does the waiting
+                        self._pause(host, delay)
+                    else:
+                        time.sleep(delay)
+                with host.lock:
+                    host.stats.retries += 1
+        raise AssertionError("unreachable")
+
+    def _record(
+        self, host: _Host, start: float, response: Optional[Any], error: bool = False
+    ) -> None:
+        end = time.perf_counter()
+        with host.lock:
+            stats = host.stats
+            stats.started = start if stats.started is None else min(stats.started, start)
+            stats.finished = end if stats.finished is None else max(stats.finished, end)
+            stats.requests += 1
+            if error:
+                stats.errors += 1
+                return
+            stats.bytes += len(response.content)
+            if response.status_code in THROTTLE_STATUSES:
+                stats.throttled += 1
+            elif response.ok or response.status_code == 304:
+                stats.pages += 1
+            else:
+                stats.errors += 1
+
+    def fetch(self, url: str, cache: Optional[Any] = None) -> FetchResult:
+        """Fetch one page, revalidating it against `cache` when given."""
+        start = time.perf_counter()
+        result = FetchResult(url)
+        try:
+            headers = cache.request_headers(url) if cache is not None else {}
+            response = self.get(url, headers=headers)
+            result.status = response.status_code
+            if response.status_code == 304 and cache is not None:
+                result.body = cache.not_modified(url)
+                if result.body is None:
+                    # the cache entry vanished, fetch it unconditionally
+                    response = self.get(url)
+                    result.status = response.status_code
+            if result.body is None:
+                result.body = response.content
+                if cache is not None and response.status_code == 200:
+                    result.changed = cache.store(url, response.headers, response.content)
+            else:
+                result.changed = False
+            if not result.ok:
+                result.error = f"HTTP {result.status}"
+        except Exception as e:
+            result.error = repr(e)
+        if result.error is not None:
+            logger.error(f"Could not fetch {url}: {result.error}")
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def fetch_all(self, urls: Sequence[str], cache: Optional[Any] = None) -> List[FetchResult]:
+        """Fetch `urls` concurrently within every host's limits.
+
+        Every host has its own queue of URLs and as many worker threads as it
+        allows concurrent requests, so a slow or throttled host never holds up
+        the others.
+
+        Returns:
+            List[FetchResult]: one result per URL, in the order of `urls`.
+        """
+        queues: Dict[str, Deque[Tuple[int, str]]] = {}
+        for i, url in enumerate(urls):
+            queues.setdefault(_hostname(url), deque()).append((i, url))
+        results: List[Optional[FetchResult]] = [None] * len(urls)
+
+        def drain(pending: Deque[Tuple[int, str]]) -> None:
+            while True:
+                try:
+                    i, url = pending.popleft()
+                except IndexError:
+                    return
+                results[i] = self.fetch(url, cache)
+
+        workers: List[Deque[Tuple[int, str]]] = []
+        for host, pending in queues.items():
+            concurrency = self.policies.get(host, self.default_policy).concurrency
+            workers += [pending] * min(concurrency, len(pending))
+        with ThreadPoolExecutor(max_workers=max(len(workers), 1)) as executor:
+            for future in [executor.submit(drain, pending) for pending in workers]:
+                future.result()
+        for host in sorted(queues):
+            logger.info(f"{host}: {self.stats()[host]}")
+        return results  # type: ignore
+
+    def stats(self) -> Dict[str, HostStats]:
+        """Get the throughput statistics per host."""
+        with self._lock:
+            return {hostname: host.stats for hostname, host in self._hosts.items()}
+
+    def close(self) -> None:
+        """Close the sessions and their connections."""
+        with self._lock:
+            for host in self._hosts.values():
+                host.session.close()
+            self._hosts = {}
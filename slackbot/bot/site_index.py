@@ -0,0 +1,55 @@
+"""Build the vector index of a documentation site from scratch.
+
+The site is crawled with one Document per page, so chunks never span two
+pages, and repeated navigation and paragraphs are dropped before they are
+embedded. All the chunks are parsed before the first one is embedded, so an
+embedding model like `batch_embedding.BatchedOpenAIEmbedding` gets them all
+in one go.
+"""
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def build_site_index(
+    url: str,
+    index_path: str,
+    custom_hostname: Optional[str] = None,
+    service_context: Optional[Any] = None,
+    reader: Optional[Any] = None,
+) -> Any:
+    """Crawl the site of `url`, index its pages and save the index.
+
+    Args:
+        url (str): URL of the page linking to the pages of the site.
+        index_path (str): where the index is saved.
+        custom_hostname (Optional[str]): hostname whose crawler is used, see
+            `BeautifulSoupWebReader.lazy_load_pages`.
+        service_context (Optional[ServiceContext]): chunking and embedding
+            settings; embeds with `BatchedOpenAIEmbedding` by default.
+        reader (Optional[BeautifulSoupWebReader]): reader crawling the site.
+
+    Returns:
+        GPTSimpleVectorIndex: the saved index.
+    """
+    from llama_index import GPTSimpleVectorIndex, ServiceContext
+
+    from batch_embedding import BatchedOpenAIEmbedding
+    from custom_reader import BeautifulSoupWebReader
+    from dedup import dedup_documents
+
+    reader = reader or BeautifulSoupWebReader()
+    documents = list(reader.lazy_load_pages(urls=[url], custom_hostname=custom_hostname))
+    # don't pay to embed the repeated navigation and paragraphs
+    documents, _ = dedup_documents(documents)
+    if service_context is None:
+        service_context = ServiceContext.from_defaults(
+            embed_model=BatchedOpenAIEmbedding()
+        )
+    index = GPTSimpleVectorIndex.from_documents(
+        documents, service_context=service_context
+    )
+    index.save_to_disk(index_path)
+    logger.info(f"{index_path}: indexed {len(documents)} pages of {url}")
+    return index
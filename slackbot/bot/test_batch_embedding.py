@@ -0,0 +1,105 @@
+import time
+import unittest
+
+from aiohttp import web
+
+from batch_embedding import BatchedOpenAIEmbedding, RateBudget, embed_texts, pack_batches
+from testing import serve_in_thread, use_whitespace_tokenizer, vector
+
+MODEL = "text-embedding-ada-002"
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+class Stub:
+    """OpenAI compatible embeddings endpoint rejecting inputs with POISON."""
+
+    def __init__(self):
+        self.throttle = 0
+        self.requests = []
+
+    async def embeddings(self, request):
+        texts = (await request.json())["input"]
+        self.requests.append((time.monotonic(), len(texts)))
+        if self.throttle:
+            self.throttle -= 1
+            return web.json_response({}, status=429, headers={"Retry-After": "1"})
+        if any("POISON" in text for text in texts):
+            return web.json_response({"error": "too long"}, status=400)
+        data = [
+            {"index": i, "embedding": vector(text)} for i, text in enumerate(texts)
+        ]
+        return web.json_response({"data": data})
+
+
+class PackBatchesTest(unittest.TestCase):
+    def test_batches_stay_within_both_limits(self):
+        batches = pack_batches([3, 3, 3, 10, 1], max_tokens=6, max_items=2)
+        self.assertEqual(batches, [[0, 1], [2], [3], [4]])
+
+    def test_limits_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            pack_batches([1], max_tokens=0, max_items=1)
+
+
+class EmbedTextsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = Stub()
+        cls.api_base = serve_in_thread([web.post("/v1/embeddings", cls.stub.embeddings)])
+        cls.api_base += "/v1"
+
+    def setUp(self):
+        self.stub.throttle = 0
+        self.stub.requests.clear()
+        self.kwargs = dict(
+            model=MODEL,
+            count_tokens=count_tokens,
+            api_base=self.api_base,
+            budget=RateBudget(tokens_per_minute=10**9, requests_per_minute=10**6),
+            backoff=0.01,
+        )
+
+    def test_429_pauses_for_its_retry_after(self):
+        self.stub.throttle = 1
+        texts = ["first text", "second text"]
+        embeddings, stats = embed_texts(texts, **self.kwargs)
+
+        self.assertEqual(embeddings, [vector(text) for text in texts])
+        self.assertEqual((stats.throttled, stats.requests, stats.failed), (1, 2, 0))
+        (throttled, _), (retried, _) = self.stub.requests
+        self.assertGreaterEqual(retried - throttled, 0.9)
+
+    def test_failed_batch_is_retried_item_by_item(self):
+        texts = [f"text {i}" for i in range(5)]
+        texts[2] = "POISON text"
+        embeddings, stats = embed_texts(texts, max_batch_items=5, **self.kwargs)
+
+        self.assertIsNone(embeddings[2])
+        for i in (0, 1, 3, 4):
+            self.assertEqual(embeddings[i], vector(texts[i]))
+        self.assertEqual((stats.split, stats.failed), (1, 1))
+        self.assertEqual([size for _, size in self.stub.requests], [5, 1, 1, 1, 1, 1])
+
+    def test_failed_chunks_are_left_out_of_the_index(self):
+        use_whitespace_tokenizer(self)
+        embed_model = BatchedOpenAIEmbedding(
+            api_base=self.api_base,
+            api_key="stub",
+            count_tokens=count_tokens,
+            budget=self.kwargs["budget"],
+            embed_kwargs={"backoff": 0.01},
+        )
+        for node_id, text in [("a", "text a"), ("b", "POISON b"), ("c", "text\nc")]:
+            embed_model.queue_text_for_embeddding(node_id, text)
+        ids, embeddings = embed_model.get_queued_text_embeddings()
+
+        self.assertEqual(ids, ["a", "c"])
+        self.assertEqual(embeddings, [vector("text a"), vector("text c")])
+        self.assertEqual(embed_model.failed_ids, ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from aiohttp import web
+
+from crawler import crawl, crawl_pages
+from http_cache import HttpCache
+from scheduler import HostPolicy, PoliteScheduler
+from testing import serve_in_thread
+
+LATENCY = 0.1
+
+
+def upper(body, url):
+    return body.decode().upper()
+
+
+class Server:
+    def __init__(self):
+        self.requests = Counter()
+
+    async def slow(self, request):
+        await asyncio.sleep(LATENCY)
+        return web.Response(text=request.path)
+
+    async def etag(self, request):
+        self.requests[request.path] += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text="version 1", headers={"ETag": '"v1"'})
+
+    async def flaky(self, request):
+        self.requests[request.path] += 1
+        if self.requests[request.path] == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.Response(text="recovered")
+
+
+class CrawlTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server()
+        cls.base = serve_in_thread(
+            [
+                web.get("/slow/{name}", cls.server.slow),
+                web.get("/etag/{name}", cls.server.etag),
+                web.get("/flaky/{name}", cls.server.flaky),
+            ]
+        )
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_queued_requests_do_not_time_out(self):
+        urls = [f"{self.base}/slow/page-{i}" for i in range(20)]
+        # 10 rounds of LATENCY, far longer than the timeout of each request
+        results = crawl(urls, concurrency=2, timeout=3 * LATENCY, retries=0)
+        self.assertEqual([result.error for result in results], [None] * 20)
+        bodies = [result.body.decode() for result in results]
+        self.assertEqual(bodies, [f"/slow/page-{i}" for i in range(20)])
+
+    def test_304_without_cached_body_is_refetched_in_the_same_attempt(self):
+        url = f"{self.base}/etag/page"
+        cache = HttpCache(self.tmp)
+        self.assertTrue(crawl([url], cache=cache)[0].changed)
+        for path in glob.glob(os.path.join(self.tmp, "*.body")):
+            os.remove(path)
+        # as if the body vanished between sending the ETag and the 304
+        cache.request_headers = lambda url: {"If-None-Match": '"v1"'}
+
+        (result,) = crawl([url], cache=cache, retries=0)
+        self.assertTrue(result.ok)
+        self.assertEqual((result.status, result.body), (200, b"version 1"))
+        self.assertEqual(self.server.requests["/etag/page"], 3)
+        self.assertIsNotNone(cache.get(url))
+
+    def test_unavailable_page_is_retried(self):
+        (result,) = crawl([f"{self.base}/flaky/page"], retries=1, backoff=0.0)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.body, b"recovered")
+        self.assertEqual(self.server.requests["/flaky/page"], 2)
+
+    def test_extraction_pool_fetches_through_the_scheduler(self):
+        scheduler = PoliteScheduler(default_policy=HostPolicy(rps=1000, concurrency=2))
+        self.addCleanup(scheduler.close)
+        urls = [f"{self.base}/slow/page-{i}" for i in range(6)]
+        records = crawl_pages(urls, upper, processes=2, scheduler=scheduler)
+        pages = [record.page for record in records]
+        self.assertEqual(pages, [f"/SLOW/PAGE-{i}" for i in range(6)])
+        self.assertEqual(scheduler.stats()["127.0.0.1"].requests, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+import unittest
+
+from custom_reader import BeautifulSoupWebReader
+from http_cache import HttpCache
+from testing import DocsSite
+
+N_PAGES = 40
+
+
+class LazyLoadPagesTest(unittest.TestCase):
+    def setUp(self):
+        self.site = DocsSite(N_PAGES, latency=0.01)
+        self.url = self.site.serve()
+        self.reader = BeautifulSoupWebReader()
+
+    def test_every_page_is_streamed_once(self):
+        for processes in (None, 2):
+            self.site.requests.clear()
+            documents = list(
+                self.reader.lazy_load_pages(
+                    [self.url], custom_hostname="readme.com", processes=processes
+                )
+            )
+            self.assertEqual(
+                sorted(document.doc_id for document in documents),
+                sorted(f"{self.url}docs/page-{i}" for i in range(N_PAGES)),
+            )
+            self.assertEqual(set(self.site.requests.values()), {1})
+
+    def test_closing_early_stops_the_crawl(self):
+        stream = self.reader.lazy_load_pages(
+            [self.url], custom_hostname="readme.com", batch_size=1, concurrency=2
+        )
+        next(stream)
+        stream.close()
+        # the pages waiting for the caller and the requests in flight
+        self.assertLess(sum(self.site.requests.values()), N_PAGES // 2)
+
+
+class LoadDataTest(unittest.TestCase):
+    def test_site_extractors_get_the_cache_by_keyword(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        site = DocsSite(3)
+        url = site.serve()
+        reader = BeautifulSoupWebReader(http_cache=HttpCache(tmp))
+
+        (readme,) = reader.load_data([url], custom_hostname="readme.com")
+        self.assertIn("Text of page-2.", readme.text)
+        # takes the cache but not include_url_in_text
+        (readthedocs,) = reader.load_data([url], custom_hostname="readthedocs.io")
+        self.assertEqual(readthedocs.text, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
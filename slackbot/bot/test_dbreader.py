@@ -0,0 +1,169 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from llama_index import GPTSimpleVectorIndex
+from sqlalchemy import create_engine
+
+from dbreader import DatabaseReader, WatermarkStore
+from embedding_store import convert_index_file
+from reindex import refresh_index, refresh_index_file
+from testing import StubEmbedding, service_context, use_whitespace_tokenizer
+from vector_search import load_index
+
+QUERY = "SELECT id, title, text, updated FROM pages"
+COLUMNS = dict(text_column="text", extra_info_columns=["title"], doc_id_column="id")
+
+
+class IncrementalRefreshTest(unittest.TestCase):
+    def setUp(self):
+        use_whitespace_tokenizer(self)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.db = sqlite3.connect(os.path.join(self.tmp, "pages.db"))
+        self.addCleanup(self.db.close)
+        self.db.execute(
+            "CREATE TABLE pages"
+            " (id INTEGER PRIMARY KEY, title TEXT, text TEXT, updated INTEGER)"
+        )
+        self.db.executemany(
+            "INSERT INTO pages VALUES (?, ?, ?, ?)",
+            [(i, f"Page {i}", f"Text of page {i}.", i) for i in range(1, 6)],
+        )
+        self.db.commit()
+        engine = create_engine(f"sqlite:///{os.path.join(self.tmp, 'pages.db')}")
+        self.addCleanup(engine.dispose)
+        self.reader = DatabaseReader(engine=engine)
+        self.watermarks = WatermarkStore(os.path.join(self.tmp, "watermarks.json"))
+        self.embed_model = StubEmbedding()
+        self.service_context = service_context(self.embed_model)
+
+    def load_incremental(self):
+        return self.reader.load_incremental(
+            QUERY,
+            self.watermarks,
+            watermark_column="updated",
+            id_column="id",
+            **COLUMNS,
+        )
+
+    def ref_doc_ids(self, index_path):
+        index = load_index(index_path, service_context=self.service_context)
+        return {node.ref_doc_id for node in index.docstore.docs.values()}
+
+    def test_partial_refresh_applies_only_the_delta(self):
+        documents, deleted = self.load_incremental()
+        self.assertEqual((len(documents), deleted), (5, []))
+        index_path = os.path.join(self.tmp, "index.json")
+        GPTSimpleVectorIndex.from_documents(
+            documents, service_context=self.service_context
+        ).save_to_disk(index_path)
+        convert_index_file(index_path)
+
+        self.db.execute(
+            "UPDATE pages SET text = 'Rewritten page 2.', updated = 6 WHERE id = 2"
+        )
+        self.db.execute("INSERT INTO pages VALUES (7, 'Page 7', 'Text of page 7.', 7)")
+        self.db.execute("DELETE FROM pages WHERE id = 4")
+        self.db.commit()
+        documents, deleted = self.load_incremental()
+        self.assertEqual(sorted(d.doc_id for d in documents), ["2", "7"])
+        self.assertEqual(deleted, ["4"])
+
+        self.embed_model.embedded.clear()
+        stats = refresh_index_file(
+            index_path,
+            documents,
+            partial=True,
+            deleted_doc_ids=deleted,
+            service_context=self.service_context,
+        )
+
+        self.assertEqual((stats.reused, stats.embedded, stats.deleted), (3, 2, 2))
+        self.assertEqual(self.ref_doc_ids(index_path), {"1", "2", "3", "5", "7"})
+        self.assertEqual(len(self.embed_model.embedded), 2)
+        self.assertTrue(self.embed_model.embedded[0].endswith("Rewritten page 2."))
+        index = load_index(index_path, service_context=self.service_context)
+        texts = {node.ref_doc_id: node.text for node in index.docstore.docs.values()}
+        self.assertEqual(texts["1"], "Text of page 1.")
+
+    def test_deleted_ids_need_a_partial_refresh(self):
+        documents, _ = self.load_incremental()
+        index = GPTSimpleVectorIndex.from_documents(
+            documents, service_context=self.service_context
+        )
+        with self.assertRaises(ValueError):
+            refresh_index(index, documents[1:], deleted_doc_ids=["1"])
+
+
+class LoadTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        path = os.path.join(self.tmp, "rows.db")
+        with sqlite3.connect(path) as db:
+            db.execute("CREATE TABLE rows (id INTEGER PRIMARY KEY, text TEXT)")
+            db.executemany(
+                "INSERT INTO rows VALUES (?, ?)",
+                [(i, f"row {i}") for i in range(1, 101)],
+            )
+        engine = create_engine(f"sqlite:///{path}")
+        self.addCleanup(engine.dispose)
+        self.reader = DatabaseReader(engine=engine)
+
+    def test_ranges_are_paged_and_yielded_in_id_order(self):
+        documents = self.reader.load_table(
+            "rows",
+            columns=["id", "text"],
+            page_size=3,
+            max_workers=2,
+            text_column="text",
+            doc_id_column="id",
+        )
+        self.assertEqual([d.doc_id for d in documents], [str(i) for i in range(1, 101)])
+
+    def test_consumer_can_stop_early(self):
+        documents = self.reader.lazy_load_table(
+            "rows", columns=["id", "text"], page_size=1, max_workers=2
+        )
+        self.assertEqual(next(documents).text, "1, row 1")
+        documents.close()
+
+
+class ColumnarTest(unittest.TestCase):
+    def test_columnar_documents_match_load_data(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "rows.db")
+        with sqlite3.connect(path) as db:
+            db.execute(
+                "CREATE TABLE rows (id INTEGER, score INTEGER, ratio REAL, text TEXT)"
+            )
+            db.executemany(
+                "INSERT INTO rows VALUES (?, ?, ?, ?)",
+                [(1, 10, 0.5, "one"), (2, None, None, None), (3, 0, 1.0, "")],
+            )
+        engine = create_engine(f"sqlite:///{path}")
+        self.addCleanup(engine.dispose)
+        reader = DatabaseReader(engine=engine)
+        query = "SELECT id, score, ratio, text FROM rows ORDER BY id"
+
+        def fields(documents):
+            return [(d.text, d.doc_id, d.extra_info) for d in documents]
+
+        columns = dict(
+            text_column="text", extra_info_columns=["score", "ratio"], doc_id_column="id"
+        )
+        self.assertEqual(
+            fields(reader.load_data_columnar(query, **columns)),
+            fields(reader.load_data(query, **columns)),
+        )
+        joined = [d.text for d in reader.load_data_columnar(query)]
+        self.assertEqual(joined, [d.text for d in reader.load_data(query)])
+        self.assertEqual(joined[1], "2, None, None, None")
+
+
+if __name__ == "__main__":
+    unittest.main()
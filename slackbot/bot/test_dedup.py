@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from llama_index import Document
+from sqlalchemy import create_engine
+
+from dbreader import DatabaseReader
+from dedup import dedup_documents, dedup_sentences
+
+MDB_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "mdb.py")
+
+ROW = "id: 1, score: 0 0 0 0, name: None None"
+
+
+class DedupTest(unittest.TestCase):
+    def test_repeated_navigation_is_collapsed(self):
+        text, collapsed, _ = dedup_sentences(
+            "Quickstart Quickstart Quickstart What is MindsDB? What is MindsDB? Intro"
+        )
+        self.assertEqual(text, "Quickstart What is MindsDB? Intro")
+        self.assertEqual(collapsed, 3)
+
+    def test_repeated_numbers_are_kept(self):
+        text, _, _ = dedup_sentences("scores: 0 0 0 0, ranks: 1 2 1 2")
+        self.assertEqual(text, "scores: 0 0 0 0, ranks: 1 2 1 2")
+
+    def test_rows_are_verbatim_without_within_documents(self):
+        rows = [
+            Document(ROW, doc_id="1"),
+            Document(ROW.replace("1", "2", 1), doc_id="2"),
+            Document(ROW, doc_id="3"),
+        ]
+        documents, report = dedup_documents(
+            rows, tokenizer=str.split, within_documents=False
+        )
+        self.assertEqual([document.text for document in documents], [ROW, rows[1].text])
+        self.assertEqual(report.blocks_removed, 1)
+        self.assertEqual(report.repeats_collapsed, 0)
+
+
+class MdbBuildTest(unittest.TestCase):
+    def test_duplicated_rows_are_dropped_and_the_rest_kept_verbatim(self):
+        spec = importlib.util.spec_from_file_location("mdb_build", MDB_PATH)
+        mdb = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mdb)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "files.db")
+            with sqlite3.connect(path) as db:
+                db.execute("CREATE TABLE mdb (id, title, page_link, text)")
+                db.executemany(
+                    "INSERT INTO mdb VALUES (?, ?, ?, ?)",
+                    [
+                        (1, "One", "/one", ROW),
+                        (2, "Two", "/two", ROW.replace("1", "2", 1)),
+                        (3, "Copy", "/copy", ROW),
+                    ],
+                )
+            engine = create_engine(f"sqlite:///{path}")
+            reader = DatabaseReader(engine=engine)
+            documents = mdb.load_documents(
+                reader, query="SELECT * FROM mdb ORDER BY id", tokenizer=str.split
+            )
+            engine.dispose()
+        self.assertEqual([d.doc_id for d in documents], ["1", "2"])
+        self.assertEqual(documents[0].text, ROW)
+        self.assertEqual(documents[1].extra_info["page_link"], "/two")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from llama_index import Document, GPTSimpleVectorIndex
+
+from embedding_store import (
+    MmapVectorStore,
+    convert_index_file,
+    open_embeddings,
+    save_embeddings,
+    sidecar_path,
+)
+from testing import StubEmbedding, service_context, use_whitespace_tokenizer, vector
+from vector_search import NumpyVectorStore, load_index, load_vector_store
+
+DIM = 8
+
+
+def simple_index(ids, doc_ids):
+    vectors = np.random.default_rng(0).standard_normal((len(ids), DIM))
+    return {
+        "vector_store": {
+            "__type__": "simple",
+            "__data__": {
+                "simple_vector_store_data_dict": {
+                    "embedding_dict": dict(zip(ids, vectors.tolist())),
+                    "text_id_to_doc_id": dict(zip(ids, doc_ids)),
+                }
+            },
+        }
+    }
+
+
+class EmbeddingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_sidecar_names_the_generation_it_describes(self):
+        path = os.path.join(self.tmp, "a.vectors.npy")
+        save_embeddings(path, ["n1"], [[1.0] * DIM], {"n1": "d1"})
+        first = open_embeddings(path)
+        save_embeddings(path, ["n1", "n2"], np.eye(2, DIM), {"n1": "d1", "n2": "d2"})
+        matrix, ids, _, generation = open_embeddings(path)
+
+        self.assertEqual(ids, ["n1", "n2"])
+        self.assertEqual(matrix.shape, (2, DIM))
+        self.assertGreater(generation, first[3])
+        # the previous generation is gone, the mapping opened before still reads
+        generations = glob.glob(os.path.join(self.tmp, "a.vectors.*.npy"))
+        self.assertEqual(len(generations), 1)
+        self.assertEqual(first[0][0].tolist(), [1.0] * DIM)
+        with open(sidecar_path(path)) as f:
+            current = json.load(f)["file"]
+        self.assertEqual(generations, [os.path.join(self.tmp, current)])
+
+    def test_index_finds_its_vectors_after_moving(self):
+        index_path = os.path.join(self.tmp, "index.json")
+        with open(index_path, "w") as f:
+            json.dump(simple_index(["n1", "n2"], ["d1", "d2"]), f)
+        convert_index_file(index_path)
+        with open(index_path) as f:
+            stored = json.load(f)["vector_store"]["__data__"]
+        self.assertEqual(stored["path"], "index.vectors.npy")
+
+        moved = os.path.join(self.tmp, "moved")
+        shutil.copytree(self.tmp, moved, ignore=shutil.ignore_patterns("moved"))
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        self.addCleanup(os.chdir, cwd)
+        store = load_vector_store(os.path.join(moved, "index.json"))
+        self.assertEqual(store.vectors_path, os.path.join(moved, "index.vectors.npy"))
+        self.assertEqual(store.config_dict, {"path": "index.vectors.npy"})
+        self.assertEqual(sorted(store.query([1.0] * DIM, 2).ids), ["n1", "n2"])
+
+    def test_index_loads_from_another_working_directory(self):
+        use_whitespace_tokenizer(self)
+        context = service_context(StubEmbedding())
+        documents = [Document(f"page {i}", doc_id=f"page-{i}") for i in range(3)]
+        index_path = os.path.join(self.tmp, "index.json")
+        GPTSimpleVectorIndex.from_documents(
+            documents, service_context=context
+        ).save_to_disk(index_path)
+        convert_index_file(index_path)
+
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        self.addCleanup(os.chdir, cwd)
+        index = load_index(index_path, service_context=context)
+        self.assertEqual(len(index._vector_store.query(vector("page 0"), 3).ids), 3)
+        # the relative path does not resolve, which must not load an empty index
+        with self.assertRaises(FileNotFoundError):
+            GPTSimpleVectorIndex.load_from_disk(index_path, service_context=context)
+
+    def test_query_honours_doc_ids(self):
+        ids, doc_ids = ["n1", "n2", "n3"], ["d1", "d2", "d2"]
+        path = os.path.join(self.tmp, "a.vectors.npy")
+        save_embeddings(path, ids, np.eye(3, DIM), dict(zip(ids, doc_ids)))
+        numpy_store = NumpyVectorStore(
+            simple_index(ids, doc_ids)["vector_store"]["__data__"][
+                "simple_vector_store_data_dict"
+            ]
+        )
+        query = [1.0] + [0.0] * (DIM - 1)
+        for store in (MmapVectorStore(path), numpy_store):
+            result = store.query(query, 3, doc_ids=["d2"])
+            self.assertEqual(sorted(result.ids), ["n2", "n3"])
+            self.assertEqual(store.query(query, 3, doc_ids=["missing"]).ids, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
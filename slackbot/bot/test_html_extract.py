@@ -0,0 +1,32 @@
+import unittest
+
+from html_extract import README_MAIN, HtmlExtractor
+
+BANNER = "Join our community Slack to ask questions about the docs"
+
+
+def page(body):
+    return (
+        "<html><head><title>Page</title></head><body>"
+        f'<main class="layout__main">{body}</main></body></html>'
+    ).encode()
+
+
+class HtmlExtractorTest(unittest.TestCase):
+    def test_repeated_table_cells_are_kept(self):
+        table = (
+            "<table><tr><th>name</th><th>score</th><th>rank</th></tr>"
+            "<tr><td>a</td><td>0</td><td>0</td></tr>"
+            "<tr><td>b</td><td>0</td><td>None</td></tr></table>"
+        )
+        text = HtmlExtractor(README_MAIN)(page(table))["text"]
+        self.assertEqual(text, "name score rank a 0 0 b 0 None")
+
+    def test_repeated_long_fragments_are_dropped(self):
+        body = f"<p>{BANNER}</p><p>Intro</p><div><p>{BANNER}</p><p>Intro</p></div>"
+        text = HtmlExtractor(README_MAIN)(page(body))["text"]
+        self.assertEqual(text, f"{BANNER} Intro Intro")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from llama_index.data_structs.node_v2 import Node
+from llama_index.docstore import DocumentStore
+
+from lazy_docstore import TextStore, convert_docstore_file, load_docstore
+
+
+def write_index(path, texts):
+    docstore = DocumentStore()
+    docstore.add_documents([Node(text, doc_id=node_id) for node_id, text in texts.items()])
+    with open(path, "w") as f:
+        json.dump({"docstore": docstore.serialize_to_dict()}, f)
+
+
+class TextStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = os.path.join(self.tmp, "index.text.bin")
+
+    def test_stored_records_are_not_written_again(self):
+        store = TextStore(self.path, "zlib")
+        store.append({"a": "alpha " * 50, "b": "beta " * 50})
+        size = os.path.getsize(self.path)
+
+        store.append({"a": "alpha " * 50, "c": "gamma"})
+
+        self.assertEqual(store.read("a"), "alpha " * 50)
+        self.assertEqual(store.read("c"), "gamma")
+        self.assertLess(os.path.getsize(self.path) - size, 50)
+
+    def test_compact_keeps_readers_of_the_previous_file(self):
+        writer = TextStore(self.path)
+        writer.append({"a": "alpha", "b": "beta" * 100})
+        reader = TextStore(self.path, offsets=writer.offsets)
+
+        writer.compact_if_needed(["a"])
+
+        self.assertEqual(os.path.getsize(self.path), len("alpha"))
+        self.assertEqual(writer.read("a"), "alpha")
+        self.assertEqual(reader.read("b"), "beta" * 100)
+        self.assertEqual(TextStore(self.path, offsets=writer.offsets).read("a"), "alpha")
+
+    def test_reconverting_an_index_reuses_its_records(self):
+        index_path = os.path.join(self.tmp, "index.json")
+        texts = {f"n{i}": f"node {i} " * 40 for i in range(10)}
+        write_index(index_path, texts)
+        convert_docstore_file(index_path)
+        size = os.path.getsize(self.path)
+        with open(index_path) as f:
+            offsets = json.load(f)["docstore"]["text_store"]["offsets"]
+
+        for _ in range(3):
+            write_index(index_path, texts)
+            convert_docstore_file(index_path, offsets=offsets)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+        # most records replaced: the file is compacted down to the live ones
+        texts = {"n0": texts["n0"], **{f"m{i}": f"new {i} " * 40 for i in range(9)}}
+        for _ in range(3):
+            write_index(index_path, texts)
+            convert_docstore_file(index_path, offsets=offsets)
+            with open(index_path) as f:
+                text_store = json.load(f)["docstore"]["text_store"]
+            offsets = text_store["offsets"]
+            live = sum(length for _, length in offsets.values())
+            self.assertLessEqual(os.path.getsize(self.path), 2 * live)
+        with open(index_path) as f:
+            docstore = load_docstore(json.load(f)["docstore"], root=self.tmp)
+        self.assertEqual(docstore.get_document("m3").text, texts["m3"])
+        self.assertEqual(docstore.get_document("n0").text, texts["n0"])
+
+    def test_text_path_is_relative_to_the_index(self):
+        index_path = os.path.join(self.tmp, "index.json")
+        write_index(index_path, {"a": "alpha"})
+        convert_docstore_file(index_path)
+        with open(index_path) as f:
+            docs_dict = json.load(f)["docstore"]
+        self.assertEqual(docs_dict["text_store"]["path"], "index.text.bin")
+
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        self.addCleanup(os.chdir, cwd)
+        docstore = load_docstore(docs_dict, root=self.tmp)
+        self.assertEqual(docstore.get_document("a").text, "alpha")
+        with self.assertRaises(FileNotFoundError):
+            load_docstore(docs_dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
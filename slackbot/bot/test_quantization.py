@@ -0,0 +1,74 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ann_index import IVFIndex
+from embedding_store import save_embeddings
+from quantization import QuantizedSearchEngine, QuantizedVectorStore, quantize
+from vector_search import VectorSearchEngine
+
+
+class QuantizedSearchEngineTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centres = rng.standard_normal((20, 16)).astype(np.float32)
+        self.matrix = centres[rng.integers(0, 20, 2000)]
+        self.matrix += rng.normal(0, 0.05, self.matrix.shape).astype(np.float32)
+        self.ids = [str(i) for i in range(len(self.matrix))]
+        self.queries = self.matrix[rng.integers(0, len(self.matrix), 20)]
+        self.codes, self.scale = quantize(self.matrix, "int8")
+
+    def test_ivf_limits_the_quantized_pass_to_its_candidates(self):
+        ivf = IVFIndex.build(self.matrix, self.ids, n_lists=20)
+        engine = QuantizedSearchEngine(
+            self.codes, self.scale, self.matrix, self.ids, ann=ivf, nprobe=2
+        )
+        exact = VectorSearchEngine(self.matrix, self.ids)
+        for query in self.queries:
+            candidates = {self.ids[i] for i in ivf.candidates(query, 2)}
+            similarities, ids = engine.search(query, 4)
+            self.assertTrue(set(ids) <= candidates)
+            # rescored exactly, so the best candidate is within int8 noise
+            self.assertAlmostEqual(similarities[0], exact.search(query, 1)[0][0], 2)
+
+    def test_ivf_for_other_embeddings_is_ignored(self):
+        ivf = IVFIndex.build(self.matrix[:100], self.ids[:100], n_lists=4)
+        with self.assertLogs("quantization", "WARNING"):
+            engine = QuantizedSearchEngine(
+                self.codes, self.scale, self.matrix, self.ids, ann=ivf
+            )
+        self.assertIsNone(engine.ann)
+
+
+class QuantizedVectorStoreTest(unittest.TestCase):
+    def test_loading_never_writes_codes(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "a.vectors.npy")
+        ids = ["n1", "n2"]
+        save_embeddings(path, ids, np.eye(2, 8), {"n1": "d1", "n2": "d2"})
+
+        with self.assertLogs("quantization", "WARNING"):
+            store = QuantizedVectorStore.from_dict({"path": path})
+        self.assertEqual(glob.glob(os.path.join(tmp, "*.npz")), [])
+        self.assertIsInstance(store.engine, VectorSearchEngine)
+        self.assertEqual(store.query([1.0] + [0.0] * 7, 1).ids, ["n1"])
+
+        store.write_codes()
+        self.assertIsInstance(
+            QuantizedVectorStore.from_dict({"path": path}).engine,
+            QuantizedSearchEngine,
+        )
+        # codes of an older generation are not used either
+        save_embeddings(path, ids, np.eye(2, 8)[::-1], {"n1": "d1", "n2": "d2"})
+        with self.assertLogs("quantization", "WARNING"):
+            store = QuantizedVectorStore.from_dict({"path": path})
+        self.assertEqual(store.query([1.0] + [0.0] * 7, 1).ids, ["n2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from llama_index import Document, GPTSimpleVectorIndex
+
+from ann_index import IVFIndex, ann_path, build_ann_index
+from embedding_store import convert_index_file
+from lazy_docstore import convert_docstore_file
+from quantization import quantize_index_file
+from reindex import refresh_index, refresh_index_file
+from vector_search import load_index
+from testing import StubEmbedding, service_context, use_whitespace_tokenizer
+
+FOOTER = "Was this page helpful? Edit this page on GitHub."
+
+
+def pages(n):
+    return [Document(f"Page {i} about topic {i}.", doc_id=f"page-{i}") for i in range(n)]
+
+
+class RefreshIndexTest(unittest.TestCase):
+    def setUp(self):
+        use_whitespace_tokenizer(self)
+        self.embed_model = StubEmbedding()
+        self.service_context = service_context(self.embed_model)
+
+    def build(self, documents):
+        index = GPTSimpleVectorIndex.from_documents(
+            documents, service_context=self.service_context
+        )
+        self.embed_model.embedded.clear()
+        return index
+
+    def test_identical_chunks_are_each_reused(self):
+        documents = [Document(FOOTER, doc_id="a"), Document(FOOTER, doc_id="b")]
+        index = self.build(documents)
+
+        new_index, stats = refresh_index(index, documents + pages(1))
+
+        self.assertEqual((stats.reused, stats.embedded, stats.deleted), (2, 1, 0))
+        self.assertEqual(self.embed_model.embedded, ["Page 0 about topic 0."])
+        self.assertEqual(len(new_index.docstore.docs), 3)
+
+    def test_dropped_duplicate_counts_as_deleted(self):
+        documents = [Document(FOOTER, doc_id="a"), Document(FOOTER, doc_id="b")]
+        index = self.build(documents)
+
+        _, stats = refresh_index(index, documents[:1])
+
+        self.assertEqual((stats.reused, stats.embedded, stats.deleted), (1, 0, 1))
+
+    def test_refresh_file_keeps_ivf_parameters(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        index_path = os.path.join(tmp, "index.json")
+        self.build(pages(40)).save_to_disk(index_path)
+        convert_index_file(index_path)
+        build_ann_index(index_path, n_lists=3, nprobe=2)
+
+        stats = refresh_index_file(
+            index_path, pages(50), service_context=self.service_context
+        )
+
+        self.assertEqual((stats.reused, stats.embedded), (40, 10))
+        ivf = IVFIndex.load(ann_path(index_path))
+        self.assertEqual((ivf.n_lists, ivf.nprobe, len(ivf.ids)), (3, 2, 50))
+
+    def test_refresh_file_writes_the_new_version_to_new_files(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        index_path = os.path.join(tmp, "index.json")
+        self.build(pages(10)).save_to_disk(index_path)
+        quantize_index_file(index_path)
+        convert_docstore_file(index_path)
+        old_files = set(os.listdir(tmp)) - {"index.json"}
+        reader = load_index(index_path, service_context=self.service_context)
+
+        refresh_index_file(index_path, pages(12), service_context=self.service_context)
+
+        self.assertEqual(set(os.listdir(tmp)) & old_files, set())
+        # readers of the previous version keep their open files
+        first = next(iter(reader.docstore.docs))
+        self.assertTrue(reader.docstore.get_document(first).text.startswith("Page "))
+        index = load_index(index_path, service_context=self.service_context)
+        self.assertEqual(len(index.docstore.docs), 12)
+        texts = {index.docstore.get_document(i).text for i in index.docstore.docs}
+        self.assertIn("Page 11 about topic 11.", texts)
+
+
+if __name__ == "__main__":
+    unittest.main()
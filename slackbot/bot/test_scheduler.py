@@ -0,0 +1,45 @@
+import asyncio
+import time
+import unittest
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from scheduler import HostPolicy, PoliteScheduler
+from testing import serve_in_thread
+
+LATENCY = 0.1
+
+
+async def page(request):
+    await asyncio.sleep(LATENCY)
+    return web.Response(text=request.path)
+
+
+class PoliteSchedulerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.port = urlsplit(serve_in_thread([web.get("/docs/{name}", page)])).port
+
+    def test_slow_host_does_not_hold_up_the_others(self):
+        # two hostnames for the same server: a slow one listed first
+        slow = [f"http://127.0.0.1:{self.port}/docs/slow-{i}" for i in range(6)]
+        fast = [f"http://localhost:{self.port}/docs/fast-{i}" for i in range(20)]
+        scheduler = PoliteScheduler(
+            policies={"127.0.0.1": HostPolicy(rps=2, concurrency=1)},
+            default_policy=HostPolicy(rps=1000, concurrency=4),
+        )
+        self.addCleanup(scheduler.close)
+
+        start = time.perf_counter()
+        results = scheduler.fetch_all(slow + fast)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(results[-1].body, b"/docs/fast-19")
+        stats = scheduler.stats()
+        # 20 pages over 4 connections, while the slow host takes 2.5 s
+        self.assertLess(stats["localhost"].finished - start, 10 * LATENCY)
+        self.assertGreater(stats["127.0.0.1"].finished - start, 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from llama_index import GPTSimpleVectorIndex
+
+from site_index import build_site_index
+from testing import DocsSite, StubEmbedding, service_context, use_whitespace_tokenizer
+
+N_PAGES = 5
+
+
+class BuildSiteIndexTest(unittest.TestCase):
+    def setUp(self):
+        use_whitespace_tokenizer(self)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.url = DocsSite(N_PAGES).serve()
+
+    def test_every_page_is_indexed(self):
+        embed_model = StubEmbedding()
+        path = os.path.join(self.tmp, "tenant.json")
+        index = build_site_index(
+            self.url,
+            path,
+            custom_hostname="readme.com",
+            service_context=service_context(embed_model),
+        )
+
+        pages = {f"{self.url}docs/page-{i}" for i in range(N_PAGES)}
+        nodes = index.docstore.docs.values()
+        self.assertEqual({node.ref_doc_id for node in nodes}, pages)
+        self.assertEqual(len(embed_model.embedded), len(nodes))
+        loaded = GPTSimpleVectorIndex.load_from_disk(
+            path, service_context=service_context(StubEmbedding())
+        )
+        self.assertEqual(
+            set(loaded.index_struct.nodes_dict.values()),
+            set(index.index_struct.nodes_dict.values()),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Helpers shared by the test_*.py modules and the experiments/ benchmarks.
+
+Nothing here talks to OpenAI or downloads tokenizer encodings, so the tests
+run offline.
+"""
+import asyncio
+import threading
+import unittest
+import zlib
+from collections import Counter
+from typing import Any, List, Sequence
+
+import numpy as np
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.utils import globals_helper
+
+DIM = 8
+
+
+def vector(text: str, dim: int = DIM) -> List[float]:
+    """Return a deterministic pseudo-random embedding of `text`."""
+    rng = np.random.default_rng(zlib.crc32(text.encode()))
+    return rng.standard_normal(dim).tolist()
+
+
+class StubEmbedding(BaseEmbedding):
+    """Embedding model returning `vector(text)`, counting the texts it embeds."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.embedded: List[str] = []
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.embedded.append(text)
+        return vector(text)
+
+
+def use_whitespace_tokenizer(test: unittest.TestCase) -> None:
+    """Count tokens as whitespace separated words for the duration of `test`.
+
+    llama_index's default tokenizer downloads its encodings on first use.
+    """
+    previous = globals_helper._tokenizer
+    globals_helper._tokenizer = str.split
+    test.addCleanup(setattr, globals_helper, "_tokenizer", previous)
+
+
+def service_context(embed_model: BaseEmbedding) -> Any:
+    """Return a ServiceContext using `embed_model` and no real LLM calls."""
+    from langchain.llms.fake import FakeListLLM
+    from llama_index import LLMPredictor, ServiceContext
+
+    return ServiceContext.from_defaults(
+        llm_predictor=LLMPredictor(llm=FakeListLLM(responses=["stub"])),
+        embed_model=embed_model,
+    )
+
+
+def serve_in_thread(routes: Sequence[Any], **app_kwargs: Any) -> str:
+    """Serve aiohttp `routes` on a free local port from a daemon thread.
+
+    Args:
+        routes (Sequence[RouteDef]): e.g. `[web.get("/", handler)]`.
+        app_kwargs: passed on to `web.Application`.
+
+    Returns:
+        str: the base URL of the server, e.g. "http://127.0.0.1:8123".
+    """
+    from aiohttp import web
+
+    ready, ports = threading.Event(), []
+
+    def serve() -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application(**app_kwargs)
+        app.add_routes(routes)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        ports.append(site._server.sockets[0].getsockname()[1])
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{ports[0]}"
+
+
+class DocsSite:
+    """A ReadMe-like documentation site of `n_pages` pages, counting requests.
+
+    Crawl it with `custom_hostname="readme.com"`.
+    """
+
+    def __init__(self, n_pages: int, latency: float = 0.0) -> None:
+        self.n_pages = n_pages
+        self.latency = latency
+        self.requests: Counter = Counter()
+
+    async def index(self, request: Any) -> Any:
+        from aiohttp import web
+
+        links = "".join(
+            f'<a href="/docs/page-{i}">Page {i}</a>' for i in range(self.n_pages)
+        )
+        return web.Response(
+            text=f"<html><body>{links}</body></html>", content_type="text/html"
+        )
+
+    async def page(self, request: Any) -> Any:
+        from aiohttp import web
+
+        self.requests[request.path] += 1
+        await asyncio.sleep(self.latency)
+        name = request.match_info["name"]
+        return web.Response(
+            text=(
+                f"<html><head><title>{name}</title></head><body>"
+                f'<main class="layout__main"><h1>{name}</h1>'
+                f"<p>Text of {name}.</p></main></body></html>"
+            ),
+            content_type="text/html",
+        )
+
+    def serve(self) -> str:
+        """Serve the site from a thread and return the URL of its index page."""
+        from aiohttp import web
+
+        routes = [web.get("/", self.index), web.get("/docs/{name}", self.page)]
+        return serve_in_thread(routes) + "/"
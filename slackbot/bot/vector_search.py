@@ -0,0 +1,390 @@
+"""Vectorized top-k similarity search over node embeddings."""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.vector_stores.registry import (
+    VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE,
+    VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS,
+    VectorStoreType,
+    load_vector_store_from_dict,
+)
+from llama_index.vector_stores.simple import SimpleVectorStore
+from llama_index.vector_stores.types import (
+    NodeEmbeddingResult,
+    VectorStoreQueryResult,
+)
+
+from ann_index import DEFAULT_NPROBE, IVFIndex, ann_path
+
+logger = logging.getLogger(__name__)
+
+
+def _select_top_k(
+    scores: np.ndarray, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the positions and scores of the `top_k` best columns of each row."""
+    n = scores.shape[1]
+    k = min(top_k, n)
+    if k < n:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n), (len(scores), n))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return (
+        np.take_along_axis(top, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1),
+    )
+
+
+class VectorSearchEngine:
+    """Cosine-similarity search over one embedding matrix.
+
+    A query is scored against every row with a single matrix product and the
+    best `top_k` rows are picked with `argpartition`, so only those are sorted.
+    A batch of queries is scored with one matrix-matrix product. With an IVF
+    index attached only the candidate rows it returns are scored.
+
+    Args:
+        embeddings (Any): matrix (or list of lists) of shape (n, dim).
+        ids (Sequence[str]): id of each row.
+        copy (bool): normalize the rows into a private copy. With False the
+            matrix is used as is (e.g. a shared memory map) and scores are
+            divided by the precomputed row norms instead.
+        ann (Optional[IVFIndex]): approximate index over the same rows. When
+            set, queries only score the candidates it returns.
+        nprobe (int): number of IVF lists searched per query; higher means
+            better recall and slower queries.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        ids: Sequence[str],
+        copy: bool = True,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> None:
+        """Initialize with parameters."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        if copy:
+            self._matrix = matrix / norms[:, None]
+            self._inv_norms: Optional[np.ndarray] = None
+        else:
+            self._matrix = matrix
+            self._inv_norms = (1.0 / norms).astype(np.float32)
+        self.ids = list(ids)
+        if ann is not None and ann.ids != self.ids:
+            logger.warning("Ignoring an IVF index built for different embeddings")
+            ann = None
+        self.ann = ann
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Get the embedding matrix (normalized unless built with copy=False)."""
+        return self._matrix
+
+    def scores(self, queries: Any) -> np.ndarray:
+        """Return the cosine similarity of each query (row) to each embedding."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        q_norms[q_norms == 0] = 1.0
+        scores = (queries / q_norms) @ self._matrix.T
+        if self._inv_norms is not None:
+            scores *= self._inv_norms
+        return scores
+
+    def search_batch(
+        self,
+        queries: Any,
+        top_k: int,
+        similarity_cutoff: Optional[float] = None,
+    ) -> List[Tuple[List[float], List[str]]]:
+        """Find the `top_k` most similar embeddings for each query.
+
+        Args:
+            queries (Any): matrix of shape (n_queries, dim).
+            top_k (int): number of results per query.
+            similarity_cutoff (Optional[float]): drop results scoring at or
+                below this similarity.
+
+        Returns:
+            List[Tuple[List[float], List[str]]]: similarities and ids for each
+                query, best first.
+        """
+        n_queries = len(np.atleast_2d(queries))
+        if len(self.ids) == 0 or top_k <= 0:
+            return [([], []) for _ in range(n_queries)]
+        if self.ann is not None:
+            return self._search_ann(queries, top_k, similarity_cutoff)
+
+        scores = self.scores(queries)
+        if similarity_cutoff is not None:
+            scores[scores <= similarity_cutoff] = -np.inf
+        top, top_scores = _select_top_k(scores, top_k)
+        return [
+            self._result(row_ids, row_scores)
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
+
+    def _search_ann(
+        self,
+        queries: Any,
+        top_k: int,
+        similarity_cutoff: Optional[float],
+    ) -> List[Tuple[List[float], List[str]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        q_norms[q_norms == 0] = 1.0
+        results = []
+        for query in queries / q_norms:
+            rows = self.ann.candidates(query, self.nprobe)
+            if len(rows) == 0:
+                results.append(([], []))
+                continue
+            rows.sort()
+            scores = self._matrix[rows] @ query
+            if self._inv_norms is not None:
+                scores *= self._inv_norms[rows]
+            if similarity_cutoff is not None:
+                scores[scores <= similarity_cutoff] = -np.inf
+            top, top_scores = _select_top_k(scores[None, :], top_k)
+            results.append(self._result(rows[top[0]], top_scores[0]))
+        return results
+
+    def _result(
+        self, rows: np.ndarray, scores: np.ndarray
+    ) -> Tuple[List[float], List[str]]:
+        keep = np.isfinite(scores)
+        return scores[keep].tolist(), [self.ids[i] for i in rows[keep]]
+
+    def search(
+        self,
+        query: Any,
+        top_k: int,
+        similarity_cutoff: Optional[float] = None,
+    ) -> Tuple[List[float], List[str]]:
+        """Find the `top_k` most similar embeddings for a single query."""
+        return self.search_batch([query], top_k, similarity_cutoff)[0]
+
+
+def doc_rows(
+    ids: Sequence[str], text_id_to_doc_id: Dict[str, str], doc_ids: Sequence[str]
+) -> List[int]:
+    """Return the rows of `ids` whose node belongs to one of `doc_ids`."""
+    wanted = set(doc_ids)
+    return [
+        i for i, text_id in enumerate(ids) if text_id_to_doc_id.get(text_id) in wanted
+    ]
+
+
+class NumpyVectorStore(SimpleVectorStore):
+    """SimpleVectorStore whose queries run on a VectorSearchEngine.
+
+    Storage and serialization are unchanged, so indices saved with it are
+    plain "simple" vector store files. The engine is built on first query
+    and rebuilt after nodes are added or deleted.
+
+    Args:
+        simple_vector_store_data_dict (Optional[dict]): see SimpleVectorStore.
+        similarity_cutoff (Optional[float]): drop results scoring at or below
+            this similarity before they reach the docstore.
+        ann (Optional[IVFIndex]): approximate index to search with.
+        nprobe (int): number of IVF lists searched per query.
+    """
+
+    def __init__(
+        self,
+        simple_vector_store_data_dict: Optional[dict] = None,
+        similarity_cutoff: Optional[float] = None,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize params."""
+        super().__init__(simple_vector_store_data_dict, **kwargs)
+        self.similarity_cutoff = similarity_cutoff
+        self.ann = ann
+        self.nprobe = nprobe
+        self._engine: Optional[VectorSearchEngine] = None
+
+    @property
+    def engine(self) -> VectorSearchEngine:
+        """Get the search engine, building it if needed."""
+        if self._engine is None:
+            ids = list(self._data.embedding_dict)
+            embeddings = [self._data.embedding_dict[i] for i in ids]
+            self._engine = VectorSearchEngine(
+                embeddings, ids, ann=self.ann, nprobe=self.nprobe
+            )
+        return self._engine
+
+    def add(
+        self,
+        embedding_results: List[NodeEmbeddingResult],
+    ) -> List[str]:
+        """Add embedding_results to index."""
+        self._engine = None
+        return super().add(embedding_results)
+
+    def delete(self, doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete a document."""
+        self._engine = None
+        super().delete(doc_id, **delete_kwargs)
+
+    def query(
+        self,
+        query_embedding: List[float],
+        similarity_top_k: int,
+        doc_ids: Optional[List[str]] = None,
+        query_str: Optional[str] = None,
+    ) -> VectorStoreQueryResult:
+        """Get nodes for response.
+
+        With `doc_ids` only the nodes of those documents are searched, exactly.
+        """
+        if doc_ids is not None:
+            ids = list(self._data.embedding_dict)
+            ids = [ids[i] for i in doc_rows(ids, self._data.text_id_to_doc_id, doc_ids)]
+            if not ids:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            similarities, ids = VectorSearchEngine(
+                [self._data.embedding_dict[i] for i in ids], ids
+            ).search(query_embedding, similarity_top_k, self.similarity_cutoff)
+            return VectorStoreQueryResult(similarities=similarities, ids=ids)
+        return self.query_batch([query_embedding], similarity_top_k)[0]
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        similarity_top_k: int,
+    ) -> List[VectorStoreQueryResult]:
+        """Get nodes for several query embeddings at once."""
+        return [
+            VectorStoreQueryResult(similarities=similarities, ids=ids)
+            for similarities, ids in self.engine.search_batch(
+                query_embeddings, similarity_top_k, self.similarity_cutoff
+            )
+        ]
+
+
+VECTOR_STORE_CLASS_TO_VECTOR_STORE_TYPE[NumpyVectorStore] = VectorStoreType.SIMPLE
+
+
+def _vector_store_from_dict(
+    save_path: str,
+    result_dict: Dict[str, Any],
+    similarity_cutoff: Optional[float] = None,
+    nprobe: Optional[int] = None,
+) -> Any:
+    from llama_index.indices.vector_store.base import VECTOR_STORE_KEY
+
+    # register the "mmap" and "quantized" vector stores
+    import embedding_store  # noqa: F401
+    import quantization  # noqa: F401
+
+    from llama_index.constants import DATA_KEY, TYPE_KEY
+
+    type_to_cls: Dict[Any, Any] = dict(VECTOR_STORE_TYPE_TO_VECTOR_STORE_CLASS)
+    type_to_cls[VectorStoreType.SIMPLE] = NumpyVectorStore
+    vector_store_dict = result_dict[VECTOR_STORE_KEY]
+    if issubclass(
+        type_to_cls.get(vector_store_dict[TYPE_KEY], object),
+        embedding_store.MmapVectorStore,
+    ):
+        # the vectors path is stored relative to the index file
+        vector_store_dict = {
+            TYPE_KEY: vector_store_dict[TYPE_KEY],
+            DATA_KEY: {
+                **vector_store_dict[DATA_KEY],
+                "root": os.path.dirname(os.path.abspath(save_path)),
+            },
+        }
+    vector_store = load_vector_store_from_dict(
+        vector_store_dict, type_to_cls=type_to_cls
+    )
+    if similarity_cutoff is not None:
+        vector_store.similarity_cutoff = similarity_cutoff
+    if os.path.exists(ann_path(save_path)):
+        vector_store.ann = IVFIndex.load(ann_path(save_path))
+        if vector_store.ann.nprobe is not None:
+            vector_store.nprobe = vector_store.ann.nprobe
+    if nprobe is not None:
+        vector_store.nprobe = nprobe
+    return vector_store
+
+
+def load_vector_store(save_path: str, **kwargs: Any) -> Any:
+    """Load only the vector store of an index saved with `save_to_disk`.
+
+    Args:
+        save_path (str): The save_path of the file.
+        kwargs: see `load_index`.
+
+    Returns:
+        NumpyVectorStore or MmapVectorStore: The loaded vector store.
+    """
+    with open(save_path, "r") as f:
+        result_dict = json.load(f)
+    return _vector_store_from_dict(save_path, result_dict, **kwargs)
+
+
+def load_index(
+    save_path: str,
+    similarity_cutoff: Optional[float] = None,
+    nprobe: Optional[int] = None,
+    **kwargs: Any,
+) -> Any:
+    """Load a GPTSimpleVectorIndex saved with `save_to_disk`.
+
+    Unlike `GPTSimpleVectorIndex.load_from_disk`, "simple" vector stores are
+    loaded as a NumpyVectorStore, memory-mapped and quantized stores are
+    supported, node text kept in a text store (see
+    `lazy_docstore.convert_docstore_file`) is read only for retrieved nodes,
+    and an IVF index saved alongside the file (see
+    `ann_index.build_ann_index`) is used for retrieval.
+
+    Args:
+        save_path (str): The save_path of the file.
+        similarity_cutoff (Optional[float]): cutoff applied inside the vector
+            store, as a mask over the similarity scores.
+        nprobe (Optional[int]): number of IVF lists searched per query.
+        kwargs: passed on to the GPTSimpleVectorIndex constructor
+            (e.g. service_context).
+
+    Returns:
+        GPTSimpleVectorIndex: The loaded index.
+    """
+    from llama_index import GPTSimpleVectorIndex
+    from llama_index.constants import DOCSTORE_KEY, INDEX_STRUCT_KEY
+    from llama_index.indices.registry import load_index_struct_from_dict
+
+    from lazy_docstore import load_docstore
+
+    with open(save_path, "r") as f:
+        result_dict = json.load(f)
+
+    vector_store = _vector_store_from_dict(
+        save_path, result_dict, similarity_cutoff=similarity_cutoff, nprobe=nprobe
+    )
+    index_struct = load_index_struct_from_dict(result_dict[INDEX_STRUCT_KEY])
+    docstore = load_docstore(
+        result_dict[DOCSTORE_KEY], root=os.path.dirname(os.path.abspath(save_path))
+    )
+    return GPTSimpleVectorIndex(
+        index_struct=index_struct,
+        docstore=docstore,
+        vector_store=vector_store,
+        **kwargs,
+    )
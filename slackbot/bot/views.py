@@ -1,5 +1,4 @@
 import os
-import openai
 from urllib.parse import urlparse
 from django.shortcuts import render
 from django.http import StreamingHttpResponse, HttpResponse, JsonResponse
@@ -16,9 +15,10 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from .serializers import UploadedFileSerializer, AskBotSerializer
-from gpt_index import GPTSimpleVectorIndex, LLMPredictor,download_loader
-from langchain.chat_models import ChatOpenAI
-from custom_reader import BeautifulSoupWebReader
+from index_registry import index_registry
+
+# llama_index, langchain and openai are imported by the views that use them,
+# so they don't slow down worker boot and manage.py commands
 
 def index(request):
     return render(request, "index.html")
@@ -41,26 +41,35 @@ def ask_bot(request):
     serializer.is_valid(raise_exception=True)
     prompt = serializer.validated_data["prompt"]
 
-    loader = BeautifulSoupWebReader()
+    from langchain.chat_models import ChatOpenAI
+    from llama_index import LLMPredictor, ServiceContext
+
+    from batch_embedding import BatchedOpenAIEmbedding
+    from site_index import build_site_index
+
     base_url = "https://paystack.com/docs"
     parsed_url = urlparse(base_url)
     filename = parsed_url.netloc.split(".")[1]
 
     # save to disk
     if not os.path.exists(os.path.join(os.getcwd(), filename + ".json")):
-        documents = loader.load_data(urls=[base_url], custom_hostname="readme.com")
-        print(documents)
-        index = GPTSimpleVectorIndex(documents, chunk_size_limit=512)
-        
-        index.save_to_disk(os.path.join(os.getcwd(), filename + ".json"))
+        # every chunk is parsed first, then all are embedded with concurrent,
+        # token-packed requests
+        service_context = ServiceContext.from_defaults(
+            embed_model=BatchedOpenAIEmbedding(), chunk_size_limit=512
+        )
+        build_site_index(
+            base_url,
+            os.path.join(os.getcwd(), filename + ".json"),
+            custom_hostname="readme.com",
+            service_context=service_context,
+        )
         print(f"{filename}.json saved successfully!")
     else:
         print(f"{filename}.json already exists.")
 
         # load from disk
-    index = GPTSimpleVectorIndex.load_from_disk(
-        os.path.join(os.getcwd(), filename + ".json")
-    )
+    index = index_registry.get(os.path.join(os.getcwd(), filename + ".json"))
     llm_predictor = LLMPredictor(llm=ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo"))
     response_content = index.query(
         f"{prompt},provide a link",
@@ -88,6 +97,8 @@ def generate_names(request):
         prompt = request.data.get('prompt')
         
         # Set up the OpenAI API client
+        import openai
+
         openai.api_key = OPENAI_API_KEY
         
         # Define a generator function to stream the response